@@ -17,12 +17,15 @@ from GRADUATION import GRADUATION
 from GROWTH import GROWTH
 from proficiency import Proficiency
 from TABLES import TABLES
+from TIMING import span, count_rows, run_summary
+from PUBLISHER import PUBLISHER
 
 # import third party libraries
 import pandas as pd
 import numpy as np
 import traceback
 import itertools
+from functools import partial
 from termcolor import colored
 
 """
@@ -97,12 +100,15 @@ class ADEConnect(COMPONENTS):
         self.csi_thresholds = {2022:21.99}
         self.tsi_thresholds = {2018:17.31471, 2019:18.9112147, 2022:11.27778105}
 
+        # background writer of the results when calculate_results(publish=True), None otherwise
+        self.publisher = None
+
 
     """
     Uses each component class to calculate results and save them to class attributes
     """ 
     def calculate_results(self, static_file:pd.DataFrame=None, schooltype_data:pd.DataFrame=None, 
-        dropout_data:pd.DataFrame=None, gradrates_data:pd.DataFrame=None, **kwargs):
+        dropout_data:pd.DataFrame=None, gradrates_data:pd.DataFrame=None, publish:bool=False, **kwargs):
         """
         Parameters:
         ----------
@@ -111,6 +117,9 @@ class ADEConnect(COMPONENTS):
 
         schooltype (pandas.DataFrame): a dataframe containing information about all schools for which Accountability & Research reports Federal identification
 
+        publish (bool): uploads each component's results to the archive Results schema on a background writer while the next component 
+            is calculated, instead of upload_results_to_db() after all of them. Default is False.
+
         """
         if static_file is None: # download static file from SQL server if not provided
             static_file = DATABASE(fiscal_year = self.fiscal_year, run = self.run, schema = 'Static', 
@@ -137,11 +146,22 @@ class ADEConnect(COMPONENTS):
             "EL":{"staticfile":static_file}
         }
 
+        # results of an earlier run finish uploading before this run starts publishing
+        if self.publisher is not None:
+            self.publisher.close()
+            self.publisher = None
+        if publish:
+            self.publisher = PUBLISHER()
+            results_db = DATABASE(fiscal_year=self.fiscal_year, run=self.run, schema="Results", database=self.archive_database)
+
         # calculate each component's results
         for component in self.components:
             print(f"Calculating Federal {component} Results...")
-            results = self.component_classes[component].calculate_component(**component_args[component]) # returns [csi summary, csi drilldown, atsi]
-            results = self.round_numeric_cols(*results) # round all results
+            rows_in = sum([len(x) for x in component_args[component].values() if x is not None])
+            with span(f'Federal {component}.calculate_component', rows_in=rows_in) as record: # log time, rows and memory of the component
+                results = self.component_classes[component].calculate_component(**component_args[component]) # returns [csi summary, csi drilldown, atsi]
+                results = self.round_numeric_cols(*results) # round all results
+                record['RowsOut'] = count_rows(results)
             self.csi_summary_results[component] = results[0] # save csi summary results to class
 
             # make some adjustments to the csi drilldown results
@@ -169,10 +189,21 @@ class ADEConnect(COMPONENTS):
             self.csi_drilldown_results[component] = drilldown_df # save re-ordered csi drilldown results to class
 
             self.atsi_results[component] = results[2] # save atsi results to class
+
+            # queue the component's results for upload while the next component is calculated (copies, so the writer thread never shares frames with the class)
+            if publish:
+                self.publisher.publish(f'Federal {component}', partial(self.upload_component_results, results_db, component, 
+                    self.csi_drilldown_results[component].copy(), self.csi_summary_results[component].copy(), self.atsi_results[component].copy(), raise_errors=True))
         
         # calculate csi-G results
         if "Graduation" in self.components: # ignore if component is being ignored
-            self.csi_G = self.component_classes["Graduation"].calculate_csi_G(gradrates_data, schooltype_data, **kwargs)
+            with span('Federal Graduation.calculate_csi_G', rows_in=len(gradrates_data)) as record:
+                self.csi_G = self.component_classes["Graduation"].calculate_csi_G(gradrates_data, schooltype_data, **kwargs)
+                record['RowsOut'] = count_rows(self.csi_G)
+            if publish:
+                self.publisher.publish('Federal csi-G', partial(self.upload_csi_G_results, results_db, self.csi_G.copy(), raise_errors=True))
+
+        run_summary() # print time, rows and memory of each stage
 
     """
     Uploads component results to the SQL archive database
@@ -187,6 +218,11 @@ class ADEConnect(COMPONENTS):
 
         run (str): A prefix for the SQL table names given to the results when uploaded. Default is the run attribute of the class.
         """
+        # results already published to the archive Results schema while they were calculated
+        if (self.publisher is not None) and (database is None) and (schema == "Results") and (run is None):
+            self.flush_results()
+            return
+
         # check if results have been assigned. If not, calculate them using tables in AccountabilityArchive database
         for x in self.components:
             if not all([False if y is None else True for y in [self.csi_drilldown_results[x], self.csi_summary_results[x], self.atsi_results[x]]]):
@@ -201,18 +237,37 @@ class ADEConnect(COMPONENTS):
 
         # upload component results
         for component in self.components:
-            # delete existing tables
-            db.drop_tables_in_run(self.archive_csi_drilldown_names[component], self.archive_csi_summary_names[component], self.archive_atsi_names[component], table_prefix=db.run)
-
-            # upload csi drilldown table, csi summary table, and atsi table
-            db.upload_table_to_db(df=self.csi_drilldown_results[component], table_name=self.archive_csi_drilldown_names[component], all_nvarchar=True)
-            db.upload_table_to_db(df=self.csi_summary_results[component], table_name=self.archive_csi_summary_names[component])
-            db.upload_table_to_db(df=self.atsi_results[component], table_name=self.archive_atsi_names[component])
+            self.upload_component_results(db, component, self.csi_drilldown_results[component], self.csi_summary_results[component], self.atsi_results[component])
             
         # upload csi-G results
         if "Graduation" in self.components: # ignore if component is being ignored
-            db.drop_tables_in_run(self.csi_G_table_name, table_prefix=db.run)
-            db.upload_table_to_db(df=self.csi_G, table_name=self.csi_G_table_name)
+            self.upload_csi_G_results(db, self.csi_G)
+
+    """
+    Replaces the csi drilldown, csi summary and atsi archive tables of one component
+    """
+    def upload_component_results(self, db:DATABASE, component:str, csi_drilldown:pd.DataFrame, csi_summary:pd.DataFrame, atsi:pd.DataFrame, raise_errors:bool=False):
+        # delete existing tables
+        db.drop_tables_in_run(self.archive_csi_drilldown_names[component], self.archive_csi_summary_names[component], self.archive_atsi_names[component], table_prefix=db.run)
+
+        # upload csi drilldown table, csi summary table, and atsi table
+        db.upload_table_to_db(df=csi_drilldown, table_name=self.archive_csi_drilldown_names[component], all_nvarchar=True, raise_errors=raise_errors)
+        db.upload_table_to_db(df=csi_summary, table_name=self.archive_csi_summary_names[component], raise_errors=raise_errors)
+        db.upload_table_to_db(df=atsi, table_name=self.archive_atsi_names[component], raise_errors=raise_errors)
+
+    """
+    Replaces the csi-G archive table
+    """
+    def upload_csi_G_results(self, db:DATABASE, csi_G:pd.DataFrame, raise_errors:bool=False):
+        db.drop_tables_in_run(self.csi_G_table_name, table_prefix=db.run)
+        db.upload_table_to_db(df=csi_G, table_name=self.csi_G_table_name, raise_errors=raise_errors)
+
+    """
+    Waits for the results published by calculate_results(publish=True) to be on the server. Called before summaries and GUI tables are produced
+    """
+    def flush_results(self):
+        if self.publisher is not None:
+            self.publisher.flush()
 
             
     """
@@ -301,6 +356,9 @@ class ADEConnect(COMPONENTS):
         pandas.DataFrame: a single dataframe containing all of the CSI summary results for each component and federal model. 
             May or may not contain total point values depending on the method parameters provided.
         """
+        # published results must be on the server before the summaries are produced from them
+        self.flush_results()
+
         # calculate component results if they are not stored
         for x in self.components:
             if self.csi_summary_results[x] is None:
@@ -451,7 +509,7 @@ class ADEConnect(COMPONENTS):
         """
         # establish connection to sql server
         if database is None: database = self.target_database
-        db = DATABASE(fiscal_year=self.previous_fiscal_year, run=run, schema=schema, database=database)
+        db = self.history.connection(fiscal_year=self.previous_fiscal_year, run=run, schema=schema, database=database)
 
         # read in the historical csi summary table for each Federal model
         historic_csi = []
@@ -529,6 +587,9 @@ class ADEConnect(COMPONENTS):
         pandas.DataFrame: The combined atsi results of each component, plus total points and/or historical results 
             depending on the method parameters provided.
         """
+        # published results must be on the server before the summaries are produced from them
+        self.flush_results()
+
         # calculate component results if they are not yet stored
         for x in self.components:
             if self.atsi_results[x] is None:
@@ -703,7 +764,7 @@ class ADEConnect(COMPONENTS):
         """
         # establish connection to sql server
         if database is None: database = self.archive_database
-        db = DATABASE(fiscal_year=self.previous_fiscal_year, run=run, schema=schema, database=database)
+        db = self.history.connection(fiscal_year=self.previous_fiscal_year, run=run, schema=schema, database=database)
         try: # combine historical ATSI tables
             historic_atsi = []
             for table_name in self.py_atsi_tables.values():
@@ -738,7 +799,7 @@ class ADEConnect(COMPONENTS):
         
         # temporary way to get 2019 points earned from excel file (wasn't previously tracked): 
         path_to_file = r"\\Asasprdvm01\acct\FED ACCOUNTABILITY\Results19\total_ATSI_TSI_2019_5year.xlsx"
-        atsi_history_2019 = pd.read_excel(path_to_file, sheet_name=None)
+        atsi_history_2019 = self.history.read_excel(path_to_file, sheet_name=None) # parsed once, then read from a checksummed local copy
         excel_to_subgroup = {"Asian":"Asian", "Black":"AfricanAmerican", "ELL":"ELFEP14", "FRL":"IE12", "Hispanic":"HispanicLatino", "Indian":"NativeAmerican", 
             "Pacific":"PacificIslander", "Multiple":"TwoorMoreRaces", "SPED":"SWD", "White":"White"}
         atsi_points_2019 = []
@@ -842,6 +903,9 @@ class ADEConnect(COMPONENTS):
 
         run (str): A prefix for the target SQL tables. Default value is "", so no prefix.
         """
+        # published results must be on the server before the summaries are produced from them
+        self.flush_results()
+
 
         # get results if not already done
         for x in self.components:
@@ -872,7 +936,7 @@ class ADEConnect(COMPONENTS):
     def get_identified(self, csi:bool=True, atsi:bool=True, database:str=None, schema:str="grading", run:str=""):
         # define database connection
         if database is None: database = self.target_database
-        db = DATABASE(fiscal_year=self.previous_fiscal_year, database=database, schema=schema, run=run)
+        db = self.history.connection(fiscal_year=self.previous_fiscal_year, database=database, schema=schema, run=run)
         df = db.read_table(table_name=f"AThruFEntityData{db.fiscal_year}")
         # get list of schools that were identified for csi last year
         if csi: csi_schools = df[(df["FiscalYear"]==self.previous_fiscal_year) & (df["CSI-LowAchievement"].notna())]["EntityID"].to_list()
@@ -0,0 +1,65 @@
+"""
+Authors: ADE Accountability & Research
+
+Last Updated: 06/26/2023
+
+Description: This Python module contains a class (BENCHMARK) which times the Federal component classes on the synthetic
+    Static File produced by StaticFile/BENCHMARK.py, with no connection to the SQL server.
+"""
+
+# import component modules
+from EL import EL
+from GROWTH import GROWTH
+from TIMING import span, count_rows, reset_run, set_run_log, run_summary
+
+# import third party libraries
+import pandas as pd
+import os
+
+
+class BENCHMARK:
+    """
+    CA, Dropout, Graduation and Proficiency read prior year results from the SQL server so they are not part of the offline benchmark
+    """
+    def __init__(self, fiscal_year:int=2023, run:str='Prelim', folder:str=None, run_log:str=None, **kwargs):
+        """
+        Parameters:
+        ----------
+        fiscal_year (int): fiscal year of the synthetic data
+
+        folder (str): folder holding StaticFile{fiscal_year}.pkl
+
+        run_log (str): path of the jsonl file to append component timings to
+        """
+        self.fiscal_year = fiscal_year
+        self.run = run
+        self.folder = folder
+        self.run_log = run_log
+        self.component_classes = {"Growth":GROWTH(fiscal_year=self.fiscal_year, run=self.run, **kwargs),
+            "EL":EL(fiscal_year=self.fiscal_year, run=self.run, **kwargs)}
+
+    """
+    Calculates each offline component once and returns the component timings
+    """
+    def run_benchmark(self, static_file:pd.DataFrame=None) -> pd.DataFrame:
+        reset_run()
+        if self.run_log is not None:
+            set_run_log(self.run_log)
+        if static_file is None:
+            static_file = pd.read_pickle(os.path.join(self.folder, f"StaticFile{self.fiscal_year}.pkl"))
+
+        # same keyword arguments as ADEConnect.calculate_results
+        component_args = {
+            "Growth":{"staticfile_raw":static_file},
+            "EL":{"staticfile":static_file}
+        }
+        self.results = {}
+        for component in self.component_classes.keys():
+            args = {key:value.copy() for key, value in component_args[component].items()} # components cannot alter each other's data
+            with span(f'Federal {component}.calculate_component', rows_in=len(static_file)) as record:
+                self.results[component] = self.component_classes[component].calculate_component(**args)
+                record['RowsOut'] = count_rows(self.results[component])
+        return run_summary()
+
+# bench = BENCHMARK(2023, folder=r'H:\ACCT\ACCOUNTABILITY\2023\Yassin\benchmark data')
+# timings = bench.run_benchmark()
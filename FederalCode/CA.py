@@ -26,25 +26,20 @@ class CA(COMPONENTS):
         # staticfile['SchoolTypeF'] = staticfile.SchoolTypeF.map(self.federal_school_type_map)
         
         ##---------------------------------- select relevant data for CA according to buissness rules
-        sf = pd.DataFrame()
         #make a list of relevant cols to keep (including cols needed for ATSI)
         relevant_cols = ['SAISID', 'SchoolCode', 'StudentGrade', 'ChronicAbsent', 'SchoolTypeF'] + self.subgroups
         ## select relevant files from staticfile
-        for model, grades in self.ca_grade_map.items():
-            #select the models that contain ca exclusivly
-            #select the grades relevant to the selected model make sure kids are enrolled during testing window
-            ## select Relevant columns only
-            ca_mask = (staticfile.SchoolTypeF == model) & (staticfile.StudentGrade.isin(grades)) & (staticfile.ADMIntegrity==1)
-            # ca_mask = ca_mask & (staticfile.ELAMathWindow==1)
-            sf_temp = staticfile.loc[ca_mask, relevant_cols].copy()
-            ## change SchoolCode to EntityID
-            sf_temp.rename({'SchoolCode':'EntityID'}, inplace=True, axis=1)
-            ## deduplicate to keep one record per student per school
-            sf_temp = sf_temp[~sf_temp.duplicated(['SAISID', 'EntityID'])]
-            #build up the filtered staticfile
-            sf = pd.concat([sf, sf_temp], axis=0)
-        #clean up cache
-        del sf_temp
+        #select the models that contain ca exclusivly
+        #select the grades relevant to each model (one lookup for all models)
+        ca_models = self.assign_models(staticfile.StudentGrade, {model:{model:grades} for model, grades in self.ca_grade_map.items()}, keys=staticfile.SchoolTypeF)
+        ca_mask = ca_models.notnull() & (staticfile.ADMIntegrity==1)
+        # ca_mask = ca_mask & (staticfile.ELAMathWindow==1)
+        ## select Relevant columns only
+        sf = staticfile.loc[ca_mask, relevant_cols].copy()
+        ## change SchoolCode to EntityID
+        sf.rename({'SchoolCode':'EntityID'}, inplace=True, axis=1)
+        ## deduplicate to keep one record per student per school
+        sf = sf[~sf.duplicated(['SAISID', 'EntityID'])]
         
         ## get growth weights for each model from component dict
         self.ca_weights_by_model = {}
@@ -130,7 +125,7 @@ class CA(COMPONENTS):
         
         
         ##connect to db
-        db = DATABASE(fiscal_year = self.previous_fiscal_year
+        db = self.history.connection(fiscal_year = self.previous_fiscal_year
                       ,run = 'Final'
                       ,schema = 'Results'
                       ,database = 'AccountabilityArchive')
@@ -232,7 +227,7 @@ class CA(COMPONENTS):
     def get_historic_csi_ca(self, sf):
         ##---------------------------------------------------------------- get historic data
         ##connect to db
-        db = DATABASE(fiscal_year = self.previous_fiscal_year
+        db = self.history.connection(fiscal_year = self.previous_fiscal_year
                       ,run = ''
                       ,schema = 'ssi'
                       ,database = 'REDATA_UAT')
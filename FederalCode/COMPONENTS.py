@@ -5,7 +5,13 @@ Created on Thu Feb 16 15:07:51 2023
 @author: yfahmy
 """
 from datetime import date
+from HISTORY import HISTORY
 import pandas as pd
+import numpy as np
+import json
+
+## lookup arrays of assign_models, built once per grade map
+_model_lookups = {}
 
 class COMPONENTS:
     def __init__(self
@@ -31,6 +37,9 @@ class COMPONENTS:
         self.run = run.capitalize()
         # print(F'Run Type set to----> {self.run}')
         
+        ## prior year tables are read once per run through the historical results store
+        self.history = HISTORY(fiscal_year=self.fiscal_year, run=self.run)
+        
         ##define server name
         self.server_name = 'AACTASTPDDBVM02'
         
@@ -175,6 +184,68 @@ class COMPONENTS:
     def calculate_component(self):
         pass
     
+    def get_model_lookup(self, key_grade_map):
+        '''
+        Builds (once per map) the lookup array used by assign_models.
+
+        Parameters
+        ----------
+        key_grade_map : dict
+            DESCRIPTION: {key: {model: [grades]}}, e.g. {0: trad grade map, 1: alt grade map} keyed by Alternative
+
+        Returns
+        -------
+        tuple of (keys index, lowest grade, models array (last item is missing), lookup array of shape (keys, grades) holding model positions)
+        '''
+        cache_key = json.dumps(key_grade_map, default=str)
+        if cache_key not in _model_lookups:
+            keys = pd.Index(list(key_grade_map.keys()))
+            models = list(dict.fromkeys([model for grade_map in key_grade_map.values() for model in grade_map.keys()]))
+            grades = [grade for grade_map in key_grade_map.values() for grade_list in grade_map.values() for grade in grade_list]
+            min_grade = int(min(grades))
+            lookup = np.full((len(keys), int(max(grades)) - min_grade + 1), -1, dtype=np.int16)
+            for key_position, grade_map in enumerate(key_grade_map.values()):
+                for model, grade_list in grade_map.items():
+                    positions = np.array(grade_list, dtype=int) - min_grade
+                    ## a grade can only belong to one model for the same key
+                    overlap = lookup[key_position, positions] >= 0
+                    if overlap.any():
+                        raise ValueError(f'Grades {list(np.array(grade_list)[overlap])} are assigned to more than one model in {key_grade_map}')
+                    lookup[key_position, positions] = models.index(model)
+            _model_lookups[cache_key] = (keys, min_grade, np.array(models + [np.nan], dtype=object), lookup)
+        return _model_lookups[cache_key]
+
+    def assign_models(self, grades, key_grade_map, keys=None):
+        '''
+        Assigns the model of every record with one integer-indexed gather on the (key, grade) lookup array instead of one scan per model.
+
+        Parameters
+        ----------
+        grades : pandas.Series
+            DESCRIPTION: student grades
+        key_grade_map : dict
+            DESCRIPTION: {key: {model: [grades]}}, or {model: [grades]} when keys is None
+        keys : pandas.Series, The default is None
+            DESCRIPTION: key of every record (Alternative, SchoolTypeF...), same index as grades
+
+        Returns
+        -------
+        pandas.Series of models, missing where the grade is not in the map of the record's key
+        '''
+        if keys is None:
+            key_grade_map = {0: key_grade_map}
+            key_positions = np.zeros(len(grades), dtype=int)
+        key_index, min_grade, models, lookup = self.get_model_lookup(key_grade_map)
+        if keys is not None:
+            key_positions = key_index.get_indexer(keys)
+
+        grade_values = pd.to_numeric(grades, errors='coerce').to_numpy(dtype=float)
+        grade_positions = grade_values - min_grade
+        valid = (key_positions >= 0) & (grade_positions >= 0) & (grade_positions < lookup.shape[1]) & (grade_values == np.floor(grade_values))
+        grade_positions = np.where(valid, grade_positions, 0).astype(int)
+        model_positions = np.where(valid, lookup[np.where(valid, key_positions, 0), grade_positions], -1)
+        return pd.Series(models[model_positions], index=grades.index)
+
     def columns_to_numeric(self, df, columns):
         ## confirm numeric cols are numeric
         t = ['float', 'int']
@@ -211,6 +282,49 @@ class COMPONENTS:
         return df
     
 
+    def build_wide_table(self, df, index, columns, names, column_order=None):
+        '''
+        Long to wide without a MultiIndex round trip: the values of every (index, columns) record are written straight into a
+        preallocated block of the wide table, and the columns are named from a spec instead of renaming MultiIndex tuples.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            DESCRIPTION: long data, one record per index and columns
+        index : list of str
+            DESCRIPTION: columns identifying a row of the wide table (sorted like pd.pivot)
+        columns : list of str
+            DESCRIPTION: columns whose values name the wide columns
+        names : dict
+            DESCRIPTION: {value column: name template}, templates use the columns, e.g. {'NumGraduates': '{Subgroup}NG'}
+        column_order : list, The default is None
+            DESCRIPTION: final order of the named columns (missing ones are added empty), value then sorted key order if None
+
+        Returns
+        -------
+        pandas.DataFrame with the index columns followed by the named columns
+        '''
+        index, columns = list(index), list(columns)
+        if df.duplicated(index + columns).any():
+            raise ValueError('Index contains duplicate entries, cannot reshape')
+        row_codes = df.groupby(index, sort=True, dropna=False).ngroup().to_numpy()
+        key_codes = df.groupby(columns, sort=True, dropna=False).ngroup().to_numpy()
+        rows = df[index].iloc[np.unique(row_codes, return_index=True)[1]]
+        keys = df[columns].iloc[np.unique(key_codes, return_index=True)[1]]
+        key_names = [dict(zip(columns, key)) for key in keys.itertuples(index=False, name=None)]
+
+        wide = {column: rows[column].to_numpy() for column in index}
+        for value, template in names.items():
+            dtype = float if pd.api.types.is_numeric_dtype(df[value]) and not pd.api.types.is_bool_dtype(df[value]) else object
+            block = np.full((len(rows), len(keys)), np.nan, dtype=dtype)
+            block[row_codes, key_codes] = df[value].to_numpy()
+            for position, key in enumerate(key_names):
+                wide[template.format(**key)] = block[:, position]
+        wide = pd.DataFrame(wide)
+        if column_order is not None:
+            wide = wide.reindex(columns=index + list(column_order))
+        return wide
+
     # converts any columns that have all integer values to integer dtype
     def count_cols_to_integer(self, *dfs):
         for df in dfs:
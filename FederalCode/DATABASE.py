@@ -5,13 +5,13 @@ Created on Thu Feb 16 15:55:55 2023
 @author: yfahmy
 """
 
-import pyodbc
 import pandas as pd
+from TIMING import timed, count_round_trip
 from termcolor import colored
 import traceback
 import numpy as np
-import math
 from datetime import date
+from UPLOAD import UPLOAD
 
 class DATABASE:
     
@@ -68,6 +68,8 @@ class DATABASE:
         return cnxn
     
     def  connect_with_pyodbc(self):
+        ## imported here so the module loads without the ODBC driver (offline benchmarks, worker processes)
+        import pyodbc
         # setup a connection using pyODBC
         cnxn_str = (f'''Driver=ODBC Driver 17 for SQL Server;
                     Server={self.server_name};
@@ -80,6 +82,15 @@ class DATABASE:
         sql_statment = F'DROP TABLE {table_name}'
         return sql_statment
 
+    def table_exists(self, cursor, table_name):
+        ## True if the table is on the server, also True if that can't be checked (its upload journal is then kept)
+        try:
+            cursor.execute(F"SELECT OBJECT_ID('{table_name}')")
+            count_round_trip()
+            return cursor.fetchone()[0] is not None
+        except Exception:
+            return True
+
     def drop_tables_in_run(self, *tables, table_prefix=None):
         if table_prefix is None:
             raise ValueError('Please provide Prefix of table name to "table_prefix" such as "Prelim" or "Final"')
@@ -94,11 +105,17 @@ class DATABASE:
             sql_statment = self.drop_tables_syntax(table_name)
             try:
                 cursor.execute(sql_statment)
+                count_round_trip()
                 cnxn.commit()
+                ## an unfinished upload to the dropped table can't be resumed any more
+                UPLOAD(server_name=self.server_name, sql_table_name=table_name).clear_journal()
                 print(F'{table_name} was successfully deleted')
             except Exception:
                 print(f'Table \"{table_name}\" not found or could not be deleted')
                 # traceback.print_exc() # this was printing too much for me to make sense of -Tobi
+                ## no table left to resume into, so an unfinished upload journal of it is stale
+                if not self.table_exists(cursor, table_name):
+                    UPLOAD(server_name=self.server_name, sql_table_name=table_name).clear_journal()
         cnxn.close()
         
     def create_new_table_syntax(self, df, new_table_name, all_nvarchar=False):
@@ -145,7 +162,8 @@ class DATABASE:
         
         return sql_create_table
     
-    def upload_table_to_db (self, df, table_name, all_nvarchar=False):
+    @timed(label='table_name')
+    def upload_table_to_db (self, df, table_name, all_nvarchar=False, raise_errors=False):
         '''
         This is the right method to use from outside of class
         Parameters
@@ -156,6 +174,8 @@ class DATABASE:
             DESCRIPTION: The table name in the server without prefix or suffix
         all_nvarchar : bool
             DESCRIPTION. The default is False.
+        raise_errors : bool, The default is False
+            DESCRIPTION: raise when the table can't be created or uploaded instead of only printing the error (background publishing)
 
         Returns
         -------
@@ -173,24 +193,33 @@ class DATABASE:
         # start an instance of cursor object
         cursor = cnxn.cursor()
         try:
-            # execute sql statment
-            cursor.execute(sql_create_table)
-            cnxn.commit()
-            print(colored(f'\n{new_table_name} Created Successfully', 'green'))
+            if UPLOAD(server_name=self.server_name, sql_table_name=new_table_name).is_unfinished():
+                ## the table was created by the upload being resumed
+                print(colored(f'\nResuming the unfinished upload to {new_table_name}', 'green'))
+            else:
+                # execute sql statment
+                cursor.execute(sql_create_table)
+                count_round_trip()
+                cnxn.commit()
+                print(colored(f'\n{new_table_name} Created Successfully', 'green'))
         except Exception:
             # print satus statment
             print(colored(f'\033[1mWARNING: \n{sql_create_table} FAILED\033[0m', 'red'))
             traceback.print_exc()
+            if raise_errors:
+                cnxn.close()
+                raise
         else:
             if all_nvarchar:
-                df.fillna('.', inplace=True)
+                df = df.fillna('.')
                 df = df.astype(str)
             else:
                 #convert nan to none (because sql server doesnt accept nan values)
                 df = df.replace({np.nan:None})
             # upload the new table
-            self.upload_to_server(df, new_table_name, cnxn)
+            self.upload_to_server(df, new_table_name, cnxn, raise_errors=raise_errors)
             
+    @timed(label='table_name')
     def fill_table(self, df:pd.DataFrame, table_name, clear_table=True, all_data=False, cols_to_ignore=None, 
         create_if_not_exist:bool=True, **kwargs):
         '''
@@ -218,6 +247,10 @@ class DATABASE:
         cursor = cnxn.cursor()
         #clear table if indicated
         full_table_name = f"{self.database}.{self.schema}.{self.run}{table_name}{self.fiscal_year}"
+        ## a resumed upload keeps the rows its committed chunks already inserted
+        if clear_table and UPLOAD(server_name=self.server_name, sql_table_name=full_table_name).is_unfinished():
+            print(colored(f'Resuming the unfinished upload to {full_table_name}, the table is not cleared', 'green'))
+            clear_table = False
         if clear_table:
             try:
                 if all_data is False:
@@ -226,6 +259,9 @@ class DATABASE:
                     delete_cy = ''
                 sql_clear = f'Delete {full_table_name} {delete_cy}'
                 cursor.execute(sql_clear)
+                count_round_trip()
+                ## committed before the chunks so a retried chunk on a new connection does not roll the delete back
+                cnxn.commit()
                 print(colored(f'"{sql_clear}" ==> Executed Successfully', 'green'))
             except Exception as ex:
                 print(ex)
@@ -235,6 +271,7 @@ class DATABASE:
             ## read empty table cols
             sql_read = f'SELECT top(1)* FROM {full_table_name}'
             target_table = pd.read_sql_query(sql_read, cnxn)
+            count_round_trip()
             print(colored(f'{full_table_name} ==> read Successfully', 'green'))
         except Exception as ex:
             print(colored(f'"{sql_read}" ==> Failed to read target table', 'red'))
@@ -271,18 +308,21 @@ class DATABASE:
             for col in integer_columns:
                 df[col] = df[col].astype("Int64")
             df = df.replace({pd.NA:"."})
-            df.fillna('.', inplace=True)
+            df = df.fillna('.')
             df = df.astype(str) # keep values rounded in SQL
             # upload the new table
             # table_name = f"{self.database}.{self.schema}.{self.run}{table_name}{self.fiscal_year}"
             self.upload_to_server(df, full_table_name, cnxn)
             
-    def read_table(self, table_name:str, where_clause:str=""):
+    @timed(label='table_name')
+    def read_table(self, table_name:str, where_clause:str="", columns:list=None):
         '''
         Parameters
         ----------
         table_name : str
             DESCRIPTION: The table name ithout prefix or suffix
+        columns : list, The default is None
+            DESCRIPTION: columns to select, all columns if None
 
         Returns
         -------
@@ -293,12 +333,14 @@ class DATABASE:
         new_table_name =F'{self.database}.{self.schema}.{self.run}{table_name}' + str(self.fiscal_year)
 
         if where_clause != "": where_clause = f"WHERE {where_clause}"
-        sql = F'SELECT * FROM {new_table_name} {where_clause}'
+        select = '*' if columns is None else ', '.join([f'[{column}]' for column in columns])
+        sql = F'SELECT {select} FROM {new_table_name} {where_clause}'
         try:
             # setup a connection to db
             cnxn =  self.connect_to_db()
             #read data
             df = pd.read_sql(sql,cnxn)
+            count_round_trip()
             # close Connection
             cnxn.close()
             # print satus statement
@@ -310,6 +352,7 @@ class DATABASE:
             traceback.print_exc()
         return df
     
+    @timed()
     def read_sql_query(self, sql):
 
         try:
@@ -317,6 +360,7 @@ class DATABASE:
             cnxn =  self.connect_to_db()
             #read data
             df = pd.read_sql(sql, cnxn)
+            count_round_trip()
             # close Connection
             cnxn.close()
             # print satus statement
@@ -328,9 +372,8 @@ class DATABASE:
             traceback.print_exc()
         return df
             
-    def upload_to_server(self, df, sql_table_name, cnxn):
-        cursor = cnxn.cursor()
-        cursor.fast_executemany = True
+    @timed(label='sql_table_name')
+    def upload_to_server(self, df, sql_table_name, cnxn, raise_errors=False):
         ### get the column names in the data frame
         ### also make a list of '?' with same len as column names
         names = ''
@@ -344,11 +387,9 @@ class DATABASE:
                 values = values+'?,'
         try:
             print(f'Uploading {sql_table_name} to {self.server_name}')
-            chunksize=100000
-            for n in range(0,math.ceil(df.shape[0]/chunksize)):
-                cursor.executemany(F'''INSERT INTO {sql_table_name} ({names}) values ({values})'''
-                                   , df.iloc[n*chunksize:(n+1)*chunksize, :].values.tolist())
-                print(f"Total cumulative rows uploaded up to: {(n+1)*chunksize:,}")
+            ## chunks are committed one at a time and journaled, a failed upload resumes from the first chunk not committed
+            upload = UPLOAD(server_name=self.server_name, sql_table_name=sql_table_name)
+            cnxn = upload.upload(df, cnxn, connect=self.connect_to_db, names=names, values=values)
                 
             # print satus statement
             print(colored(f'{sql_table_name} uploaded successfully', 'green'))
@@ -356,12 +397,13 @@ class DATABASE:
             ### insert our dataframe into the table with fast excution
             # df =list(df.itertuples(index=False))
             # cursor.executemany(f'''INSERT INTO {sql_table_name} ({names}) values ({values})''', df)
-            cnxn.commit()
             cnxn.close()
         except Exception as ex:
             print(colored(f'\033[1mWARNING: \n{sql_table_name} upload FAILED\033[0m', 'red'))
             print(ex)
             print('******************************************\n')
+            if raise_errors:
+                raise
             ## insert our dataframe into the table
             # for row in df.itertuples(index=False):
             #     cursor.execute(f'''INSERT INTO {sql_table_name} ({names}) values ({values})''', row)
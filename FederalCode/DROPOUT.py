@@ -165,7 +165,7 @@ class DROPOUT(COMPONENTS):
     def get_historic_csi_dd_data(self):
         ##---------------------------------------------------------------- get historic data
         ##connect to db
-        db = DATABASE(fiscal_year = self.previous_fiscal_year
+        db = self.history.connection(fiscal_year = self.previous_fiscal_year
                       ,run = ''
                       ,schema = 'ssi'
                       ,database = 'REDATA_UAT')
@@ -60,25 +60,19 @@ class EL(COMPONENTS):
 
         ##---------------------------------- select relevant grades for EL according to buissness rules
         # staticfile manipulation done in loop to avoid altering original file
-        sf = pd.DataFrame()
         ## EL point for k8 and 912 are calculated separetly
-        for model, grades in self.el_grade_map.items():
-            mask = (staticfile.StudentGrade.isin(grades)) & (staticfile.SchoolTypeF==model)
-            sf_temp = staticfile [mask].copy()
-            #rename cols
-            cols = {'SchoolCode':'EntityID'}
-            sf_temp.rename(cols, inplace=True, axis=1)
-            ## only keep el students who are ELFAY
-            mask = (sf_temp.EL==1) & (sf_temp.ELFAY==1) & (sf_temp.ADMIntegrity==1)
-            sf_temp = sf_temp[mask].copy()
-            ## since regardless of record subject, all EL score for same student should be same
-            ## we want to keep only one record per kid per school, giving priority to highest grade
-            sf_temp.sort_values(['SAISID', 'EntityID', 'StudentGrade', 'ELProf'], ascending =False, inplace=True)
-            sf_temp = sf_temp [~sf_temp.duplicated(['SAISID', 'EntityID'])].copy()
-            #add data to filtered staticfile
-            sf = pd.concat([sf, sf_temp], axis=0)
-        #clean up cached variables
-        del sf_temp
+        el_models = self.assign_models(staticfile.StudentGrade, {model:{model:grades} for model, grades in self.el_grade_map.items()}, keys=staticfile.SchoolTypeF)
+        sf = staticfile [el_models.notnull()].copy()
+        #rename cols
+        cols = {'SchoolCode':'EntityID'}
+        sf.rename(cols, inplace=True, axis=1)
+        ## only keep el students who are ELFAY
+        mask = (sf.EL==1) & (sf.ELFAY==1) & (sf.ADMIntegrity==1)
+        sf = sf[mask].copy()
+        ## since regardless of record subject, all EL score for same student should be same
+        ## we want to keep only one record per kid per school, giving priority to highest grade
+        sf.sort_values(['SAISID', 'EntityID', 'StudentGrade', 'ELProf'], ascending =False, inplace=True)
+        sf = sf [~sf.duplicated(['SAISID', 'EntityID'])].copy()
         
         ##---------------------------------------------- create indicators
         sf['ReClassified'] = sf.ELProf==4
@@ -89,8 +83,7 @@ class EL(COMPONENTS):
         #convert elgrowth to category type
         sf['ELGrowth'] = sf['ELGrowth'].astype('category')
         #create model column ('k-8'=2 and '9-12'=3)
-        sf.loc[sf.StudentGrade.isin(self.el_grade_map[2]), 'Model'] = 'k-8'
-        sf.loc[sf.StudentGrade.isin(self.el_grade_map[3]), 'Model'] = '9-12'
+        sf['Model'] = self.assign_models(sf.StudentGrade, {'k-8':self.el_grade_map[2], '9-12':self.el_grade_map[3]})
         
         
         ## make csi tables
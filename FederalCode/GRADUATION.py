@@ -155,7 +155,7 @@ class GRADUATION(COMPONENTS):
     def get_historic_csi_dd_data(self):
         ##---------------------------------------------------------------- get historic data
         ##connect to db
-        db = DATABASE(fiscal_year = self.previous_fiscal_year
+        db = self.history.connection(fiscal_year = self.previous_fiscal_year
                       ,run = ''
                       ,schema = 'ssi'
                       ,database = 'REDATA_UAT')
@@ -196,15 +196,16 @@ class GRADUATION(COMPONENTS):
         schools_included = schooltypes.query(f'SchoolTypeF in {models_being_used}')["SchoolCode"].copy()
         
 
-        # load in historical csiG data from REDATA_UAT
-        db = DATABASE(fiscal_year = self.previous_fiscal_year, run = '', schema = 'ssi', database = 'REDATA_UAT')
-        csi_G_history = db.read_table(table_name="SummaryCSIG")
-
         # define historical columns to get
+        db = DATABASE(fiscal_year = self.previous_fiscal_year, run = '', schema = 'ssi', database = 'REDATA_UAT')
         historical_columns = [f"AllStudentsCohort{db.fiscal_year-3}", f"AllStudentsCohort{db.fiscal_year-2}", f"AllStudentsCohort{db.fiscal_year-1}"]
 
-        # filter for relevant schools and columns 
-        csi_G_history = csi_G_history[csi_G_history["EntityID"].isin(schools_included)][["EntityID"] + historical_columns].set_index("EntityID")
+        # load in historical csiG data from REDATA_UAT (only the needed columns, pulled once per fiscal year and kept as local reference data)
+        csi_G_history = self.history.read_reference(f"SummaryCSIG{db.fiscal_year}", fiscal_year=self.fiscal_year
+                                                    , load=lambda: db.read_table(table_name="SummaryCSIG", columns=["EntityID"] + historical_columns))
+
+        # filter for relevant schools
+        csi_G_history = csi_G_history[csi_G_history["EntityID"].isin(schools_included)].set_index("EntityID")
 
 
         # load in 5-year grad rates for relevant schools
@@ -217,27 +218,17 @@ class GRADUATION(COMPONENTS):
         csi_G_grad_rates = gradrates[(gradrates["EntityID"].isin(schools_included)) & (gradrates["CohortYear"]==self.fiscal_year-1) & (gradrates["GradRateType"]==5) & (gradrates["Type"].isin(sql_subgroups))].rename(
             columns={"Type":"Subgroup"})[["EntityID", "Subgroup", "NumCohort", "NumGraduates", "GradRate"]].replace({"Subgroup":subgroup_mapping})
         
-        csi_G_grad_rates = pd.pivot(csi_G_grad_rates, index='EntityID', columns=['Subgroup'], values=['NumCohort', 'NumGraduates', 'GradRate'] ).reset_index(col_level=1)
-
-        column_names =[]
-        for i in csi_G_grad_rates.columns:
-            if 'NumGraduates' in i[0]:
-                column_names.append((i[1]+'NG'))
-            elif 'GradRate' in i[0]:
-                column_names.append((i[1]+f'Cohort{self.fiscal_year-1}'))
-            elif 'NumCohort' in i[0]:
-                column_names.append((i[1]+'NC'))
-            else:
-                column_names.append(i[1])
-        csi_G_grad_rates = csi_G_grad_rates.droplevel(0, axis=1)
-        csi_G_grad_rates.columns = column_names
+        csi_G_grad_rates = self.build_wide_table(csi_G_grad_rates, index=['EntityID'], columns=['Subgroup']
+                                                 , names={'NumCohort':'{Subgroup}NC', 'NumGraduates':'{Subgroup}NG', 'GradRate':f'{{Subgroup}}Cohort{self.fiscal_year-1}'})
         csi_G_grad_rates = csi_G_grad_rates.set_index("EntityID")
 
 
         # load in Oct 1 enrollment report
         if oct1_filepath is None: oct1_filepath = r"\\Asasprdvm01\acct\ACCOUNTABILITY\2022\Public files\1 - preliminary\Oct1Enrollment2023.xlsx"
         if oct1_sheetname is None: oct1_sheetname = "School by Ethnicity"
-        oct1_enroll = pd.read_excel(oct1_filepath, sheet_name=oct1_sheetname).rename(columns={"School Entity ID":"EntityID", "Total UR":"TotalEnrollmentOct1"})[["EntityID", "TotalEnrollmentOct1"]]
+        # only the needed columns are parsed, again whenever the workbook's checksum changes, otherwise read from its local copy
+        oct1_enroll = self.history.read_excel(oct1_filepath, sheet_name=oct1_sheetname, usecols=["School Entity ID", "Total UR"]).rename(
+            columns={"School Entity ID":"EntityID", "Total UR":"TotalEnrollmentOct1"})[["EntityID", "TotalEnrollmentOct1"]]
         # "Asian UR", "Black/African American UR":"African", "Hispanic/Latino UR", "American Indian/Alaskan Native UR", "Native Hawaiian/Pacific Islander UR", "Multiple Races UR", "White UR", "Total UR"
         oct1_enroll = oct1_enroll[(oct1_enroll["EntityID"].isin(schools_included))].set_index("EntityID")
 
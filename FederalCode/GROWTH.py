@@ -47,20 +47,17 @@ class GROWTH(COMPONENTS):
         # staticfile['FederalModel'] = staticfile.SchoolTypeF.map(self.federal_school_type_map)
         
         ##---------------------------------- select relevant data for Growth according to buissness rules
-        sf = pd.DataFrame()
         #make a list of relevant cols to keep (including cols needed for ATSI)
         relevant_cols = ['SAISID', 'SchoolCode', 'StudentGrade', 'Subject', 'SGP_CCR', 'FAY', 'SchoolTypeF'] + self.subgroups
         ## select relevant files from staticfile
-        for model, grades in self.growth_grade_map.items():
-            #select the models that contain growth only
-            #select the grades relevant to the selected model
-            ## select Relevant columns only
-            growth_mask = (staticfile.SchoolTypeF == model) & (staticfile.StudentGrade.isin(grades)) & (staticfile.ADMIntegrity==1)
-            sf_temp = staticfile.loc[growth_mask, relevant_cols].copy()
-            #build up the filtered staticfile
-            sf = pd.concat([sf, sf_temp], axis=0)
+        #select the models that contain growth only
+        #select the grades relevant to each model (one lookup for all models)
+        growth_models = self.assign_models(staticfile.StudentGrade, {model:{model:grades} for model, grades in self.growth_grade_map.items()}, keys=staticfile.SchoolTypeF)
+        growth_mask = growth_models.notnull() & (staticfile.ADMIntegrity==1)
+        ## select Relevant columns only
+        sf = staticfile.loc[growth_mask, relevant_cols].copy()
         #clean up cache
-        del sf_temp, staticfile
+        del staticfile
             
         ##replace names in relevant subgroups for consistency
         sf.replace(self.atsi_subgroups_name_changes, inplace=True)
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 09:12:40 2026
+
+@author: YFahmy
+Historical results store. Prior-year tables (archived results, ssi/grading tables, PY staticfile) are read from the server
+once per run and kept in memory and in a local columnar cache (HistoryCache/{fiscal_year}/{run}), so every component that
+needs the same history reads it from the store instead of issuing its own read_table. The local copy is keyed by the
+create/modify date and row count of the server table, so a table that is published again is read again.
+
+Usage:
+    history = HISTORY(fiscal_year=2023, run='Prelim')
+    df = history.read_table('SummaryCSIG', fiscal_year=2022, database='REDATA_UAT', schema='ssi', run='')
+    ## or as a drop-in for DATABASE(...) where only read_table is used
+    db = history.connection(fiscal_year=2022, database='REDATA_UAT', schema='ssi', run='')
+    ## workbooks on the network share are parsed once and read from a checksummed local copy afterwards
+    sheets = history.read_excel(r'\\\\server\\share\\workbook.xlsx', sheet_name=None)
+    ## reference data (external workbooks, historical tables) kept once per fiscal year with only the needed columns
+    df = history.read_reference('Oct1Enrollment', fiscal_year=2023, load=lambda: pd.read_excel(path, usecols=['School Entity ID', 'Total UR']))
+"""
+from DATABASE import DATABASE
+from datetime import datetime
+import pandas as pd
+import hashlib
+import json
+import os
+
+## tables loaded in this python session, shared by every component of the run
+_tables = {}
+
+
+class HISTORY:
+    '''
+    Parameters
+    ----------
+    fiscal_year : int
+        DESCRIPTION: fiscal year of the run (the store folder), not the year of the tables
+    run : str, The default is 'Prelim'
+        DESCRIPTION: run of the results being calculated (the store folder)
+    cache_dir : str, The default is None
+        DESCRIPTION: folder of the store, HistoryCache/{fiscal_year}/{run} next to this file if None
+    refresh : bool, The default is False
+        DESCRIPTION: if True, tables are read from the server again the first time this instance requests them,
+                     even if they were already loaded in this session
+    '''
+    def __init__(self, fiscal_year=None, run='Prelim', cache_dir=None, refresh=False):
+        self.fiscal_year = fiscal_year
+        self.run = run
+        self.refresh = refresh
+        ## keys read again from the server by this instance (refresh)
+        self.refreshed = set()
+        if cache_dir is None:
+            self.cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'HistoryCache', str(fiscal_year), str(run))
+        else:
+            self.cache_dir = cache_dir
+        self.manifest_file = os.path.join(self.cache_dir, 'manifest.csv')
+
+    def read_table(self, table_name, fiscal_year, database='AccountabilityArchive', schema='Static', run='Final', **read_kwargs):
+        '''
+        Same arguments as DATABASE(fiscal_year, database, schema, run).read_table(table_name, **read_kwargs).
+        Returns a copy so callers can alter it freely.
+        '''
+        key = '.'.join([str(database), str(schema), str(run), str(table_name), str(fiscal_year)] + [f'{k}={v}' for k, v in sorted(read_kwargs.items())])
+        refresh = self.refresh and (key not in self.refreshed)
+        if refresh or (key not in _tables):
+            db = DATABASE(fiscal_year=fiscal_year, database=database, schema=schema, run=run)
+            ## the local copy is only used if it was saved from the same version of the server table
+            version = self.get_table_version(db, table_name, fiscal_year, database, schema, run, **read_kwargs)
+            file_key = key if version is None else f'{key}.{version}'
+            file_path = self.get_file_path(file_key)
+            if (not refresh) and (file_path is not None):
+                _tables[key] = self.load(file_path)
+            else:
+                print(f'Adding {key} to the historical results store')
+                df = db.read_table(table_name=table_name, **read_kwargs)
+                _tables[key] = df
+                self.save(file_key, df)
+            self.refreshed.add(key)
+        return _tables[key].copy()
+
+    def get_table_version(self, db, table_name, fiscal_year, database, schema, run, **read_kwargs):
+        ## create/modify date and row count of the server table (metadata only), None if they can't be read
+        prefix = run if read_kwargs.get('prefix_run', True) else ''
+        suffix = str(fiscal_year) if read_kwargs.get('suffix_fy', True) else ''
+        sql = F"""SELECT CONVERT(varchar(30), t.create_date, 126) AS CreateDate, CONVERT(varchar(30), t.modify_date, 126) AS ModifyDate, SUM(p.rows) AS Records
+                  FROM [{database}].sys.tables t
+                  JOIN [{database}].sys.partitions p ON p.object_id = t.object_id AND p.index_id IN (0, 1)
+                  WHERE t.object_id = OBJECT_ID('[{database}].[{schema}].[{prefix}{table_name}{suffix}]')
+                  GROUP BY t.create_date, t.modify_date"""
+        try:
+            version = db.read_sql_query(sql)
+        except Exception:
+            return None
+        if (version is None) or (len(version) == 0):
+            return None
+        return hashlib.sha1(version.to_csv(index=False).encode()).hexdigest()[:12]
+
+    def connection(self, fiscal_year, database='AccountabilityArchive', schema='Static', run='Final'):
+        ## drop-in for DATABASE(fiscal_year, database, schema, run) for code that only reads tables
+        return HISTORY_CONNECTION(self, fiscal_year=fiscal_year, database=database, schema=schema, run=run)
+
+    def get_file_path(self, key):
+        ## path of the table in the local store, None if it is not there
+        for extension in ['.parquet', '.pkl']:
+            file_path = os.path.join(self.cache_dir, key + extension)
+            if os.path.exists(file_path):
+                return file_path
+        return None
+
+    def load(self, file_path):
+        if file_path.endswith('.parquet'):
+            return pd.read_parquet(file_path)
+        return pd.read_pickle(file_path)
+
+    def write_frame(self, df, file_path):
+        ## parquet when pyarrow is available and the columns are typed consistently, pickle otherwise. Returns the file written
+        try:
+            df.to_parquet(file_path + '.parquet', index=False)
+            return file_path + '.parquet'
+        except (ImportError, ValueError, TypeError):
+            if os.path.exists(file_path + '.parquet'):
+                os.remove(file_path + '.parquet')
+            df.to_pickle(file_path + '.pkl')
+            return file_path + '.pkl'
+
+    def save(self, key, df, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = self.cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.write_frame(df, os.path.join(cache_dir, key))
+        ## one row per table in the manifest
+        manifest_file = os.path.join(cache_dir, 'manifest.csv')
+        manifest = pd.DataFrame({'Key':[key], 'Rows':[len(df)], 'Columns':[df.shape[1]], 'LoadedAt':[datetime.now().isoformat(timespec='seconds')]})
+        if os.path.exists(manifest_file):
+            manifest = pd.concat([pd.read_csv(manifest_file).query('Key != @key'), manifest], axis=0)
+        manifest.to_csv(manifest_file, index=False)
+
+    def read_reference(self, name, fiscal_year, load, columns=None):
+        '''
+        Reference dataset of a fiscal year (external workbook, historical table) kept in HistoryCache/Reference/{fiscal_year}
+        as a typed columnar file. load() returns the dataset and is only called when there is no local copy (or refresh is True),
+        so the name should change with the source (file path, sheet, table year). Only columns are kept if given.
+        Returns a copy so callers can alter it freely.
+        '''
+        key = f'Reference.{fiscal_year}.{name}'
+        refresh = self.refresh and (key not in self.refreshed)
+        if refresh or (key not in _tables):
+            self.refreshed.add(key)
+            cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'HistoryCache', 'Reference', str(fiscal_year))
+            file_path = [os.path.join(cache_dir, name + extension) for extension in ['.parquet', '.pkl'] if os.path.exists(os.path.join(cache_dir, name + extension))]
+            if (not refresh) and (len(file_path) > 0):
+                _tables[key] = self.load(file_path[0])
+            else:
+                print(f'Adding {name} to the {fiscal_year} reference data')
+                df = load()
+                if columns is not None:
+                    df = df[columns]
+                df = self.type_columns(df)
+                _tables[key] = df
+                self.save(name, df, cache_dir=cache_dir)
+        return _tables[key].copy()
+
+    def type_columns(self, df):
+        ## text columns holding only numbers (workbooks, nvarchar tables) are stored as numbers
+        df = df.copy()
+        for column in df.columns[df.dtypes == object]:
+            try:
+                df[column] = pd.to_numeric(df[column])
+            except (ValueError, TypeError):
+                pass
+        return df
+
+    def read_excel(self, file_path, sheet_name=None, **excel_kwargs):
+        '''
+        pd.read_excel(file_path, sheet_name, **excel_kwargs) answered from a local columnar copy of the workbook (HistoryCache/Excel).
+        The workbook is parsed again only when its sha256 changes, and it is only hashed when its size or modified time change.
+        If the share is not reachable the local copy is used. A named sheet is parsed and kept on its own (excel_kwargs like usecols
+        only have to fit that sheet), sheet_name=None keeps every sheet.
+        '''
+        sheet_key = '' if sheet_name is None else f'|{sheet_name}'
+        folder_name = os.path.splitext(os.path.basename(file_path))[0] + '_' + hashlib.sha1((str(file_path) + sheet_key).lower().encode()).hexdigest()[:8]
+        folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'HistoryCache', 'Excel', folder_name)
+        manifest_file = os.path.join(folder, 'manifest.json')
+        manifest = None
+        if os.path.exists(manifest_file):
+            with open(manifest_file) as file:
+                manifest = json.load(file)
+            if manifest['ExcelArgs'] != json.dumps(excel_kwargs, sort_keys=True, default=str):
+                manifest = None
+
+        if not os.path.exists(file_path):
+            if manifest is None:
+                raise FileNotFoundError(f'{file_path} is not reachable and has no local copy')
+            print(f'{file_path} is not reachable, using the local copy from {manifest["LoadedAt"]}')
+        else:
+            stat = os.stat(file_path)
+            changed = (manifest is None) or (self.refresh) or (manifest['Size'], manifest['ModifiedTime']) != (stat.st_size, stat.st_mtime)
+            if changed:
+                checksum = self.get_checksum(file_path)
+                if (manifest is None) or (self.refresh) or (manifest['SHA256'] != checksum):
+                    print(f'Converting {file_path} to a local columnar copy')
+                    sheets = pd.read_excel(file_path, sheet_name=sheet_name, **excel_kwargs)
+                    if sheet_name is not None:
+                        sheets = {str(sheet_name): sheets}
+                    os.makedirs(folder, exist_ok=True)
+                    manifest = {'Source':file_path, 'ExcelArgs':json.dumps(excel_kwargs, sort_keys=True, default=str), 'Sheets':{}}
+                    for i, (name, df) in enumerate(sheets.items()):
+                        manifest['Sheets'][name] = os.path.basename(self.write_frame(df, os.path.join(folder, f'sheet{i}')))
+                manifest.update({'Size':stat.st_size, 'ModifiedTime':stat.st_mtime, 'SHA256':checksum, 'LoadedAt':datetime.now().isoformat(timespec='seconds')})
+                with open(manifest_file, 'w') as file:
+                    json.dump(manifest, file, indent=1)
+
+        if sheet_name is None:
+            return {name: self.load(os.path.join(folder, file)) for name, file in manifest['Sheets'].items()}
+        return self.load(os.path.join(folder, manifest['Sheets'][str(sheet_name)]))
+
+    def get_checksum(self, file_path):
+        sha = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024*1024), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def clear(self, remove_files=False):
+        ## forget the tables loaded in this session (and delete the local store)
+        _tables.clear()
+        if remove_files and os.path.exists(self.cache_dir):
+            for file in os.listdir(self.cache_dir):
+                os.remove(os.path.join(self.cache_dir, file))
+
+
+class HISTORY_CONNECTION:
+    ## read_table of a DATABASE instance answered by the historical results store
+    def __init__(self, history, fiscal_year, database, schema, run):
+        self.history = history
+        self.fiscal_year = fiscal_year
+        self.database = database
+        self.schema = schema
+        self.run = run
+
+    def read_table(self, table_name, **read_kwargs):
+        return self.history.read_table(table_name, fiscal_year=self.fiscal_year, database=self.database, schema=self.schema, run=self.run, **read_kwargs)
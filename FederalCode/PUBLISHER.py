@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 26 11:08:52 2026
+
+@author: YFahmy
+Asynchronous publishing of results. Each component's results are queued for upload as soon as they are calculated and
+a background writer uploads them while the next component calculates, so a full run takes about max(compute, upload)
+instead of their sum. flush() is the barrier before anything that needs the results on the server (summaries, GUI tables).
+
+Usage:
+    publisher = PUBLISHER()
+    for component in components:
+        results = calculate(component)
+        publisher.publish(component, partial(db.upload_table_to_db, df=results, table_name=component, raise_errors=True))
+    publisher.flush()
+"""
+from TIMING import span
+from termcolor import colored
+import traceback
+import threading
+import queue
+
+
+class PUBLISHER:
+    '''
+    Parameters
+    ----------
+    max_pending : int, The default is 2
+        DESCRIPTION: uploads waiting for the writer, publish() waits when the queue is full so finished results don't pile up in memory
+    '''
+    def __init__(self, max_pending=2):
+        self.uploads = queue.Queue(maxsize=max_pending)
+        self.published = []
+        self.errors = []
+        self.writer = threading.Thread(target=self.write, name='results publisher', daemon=True)
+        self.writer.start()
+
+    def publish(self, name, upload):
+        '''
+        Parameters
+        ----------
+        name : str
+            DESCRIPTION: name of the results (logged with the upload span)
+        upload : callable
+            DESCRIPTION: uploads the results, called with no arguments on the writer thread.
+                         It should hold its own reference to the frames so later changes to them are not uploaded,
+                         and raise when the upload fails (a failure it only prints is not reported by flush())
+        '''
+        self.uploads.put((name, upload))
+
+    def write(self):
+        ## runs on the writer thread until close()
+        while True:
+            item = self.uploads.get()
+            try:
+                if item is None:
+                    return
+                name, upload = item
+                with span(f'publish {name}'):
+                    upload()
+                self.published.append(name)
+            except Exception as ex:
+                print(colored(f'\033[1mWARNING: \npublishing {name} FAILED\033[0m', 'red'))
+                traceback.print_exc()
+                self.errors.append((name, ex))
+            finally:
+                self.uploads.task_done()
+
+    def flush(self):
+        ## barrier: waits until every published upload is done, raises if any of them failed
+        self.uploads.join()
+        if len(self.errors) > 0:
+            failed = [name for name, ex in self.errors]
+            self.errors = []
+            raise RuntimeError(f'Publishing {", ".join(failed)} failed, upload them again before producing summaries')
+
+    def close(self):
+        ## flush and stop the writer thread
+        try:
+            self.flush()
+        finally:
+            self.uploads.put(None)
+            self.writer.join()
+
+#%%
+# publisher = PUBLISHER()
+# publisher.publish('StateGrowth', partial(db.upload_table_to_db, df=growth, table_name='StateGrowth', raise_errors=True))
+# publisher.flush()
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:05:12 2026
+
+@author: YFahmy
+Stage timing and memory instrumentation. Every span records wall time (total and self, without its nested spans), rows in/out,
+the process peak RSS (and how much the stage raised it) and the DB round-trips made on its thread, and is written as one json line
+to the run log (if set). run_summary() prints a table of all spans in the run.
+
+Usage:
+    from TIMING import timed, span, set_run_log, run_summary
+    set_run_log(r'H:\\path\\to\\run_log.jsonl')
+
+    @timed()
+    def format_something(self, df): ...
+
+    with span('upload StaticFile', rows_in=len(df)) as record:
+        ...
+        record['RowsOut'] = n
+"""
+from contextlib import contextmanager
+from functools import wraps
+from datetime import datetime
+import pandas as pd
+import inspect
+import threading
+import json
+import time
+import sys
+import os
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+## spans recorded in this python session and the log file
+_spans = []
+_run_log = None
+## open spans and DB round-trips of each thread (publisher and upload threads nest their own spans and count their own trips)
+_open_spans = threading.local()
+_thread_round_trips = threading.local()
+
+def set_run_log(file_path=None):
+    ## set the json-lines file spans are appended to, None only keeps them in memory
+    global _run_log
+    _run_log = file_path
+
+def reset_run():
+    ## clear spans recorded so far (start of a new run in the same session), round-trips are counted per span so need no reset
+    _spans.clear()
+
+def get_round_trips():
+    ## round-trips made so far by the calling thread
+    return getattr(_thread_round_trips, 'count', 0)
+
+def count_round_trip(n=1):
+    ## called by DATABASE every time it goes to the server, counted on the calling thread so other threads' trips never land in its spans
+    _thread_round_trips.count = get_round_trips() + n
+
+def get_peak_rss():
+    ## peak resident memory of the process since it started in MB, not of a stage (None if it can't be measured on this platform)
+    ## peak_wset is only reported on windows
+    if psutil is not None:
+        peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)
+        if peak is not None:
+            return round(peak / 1024**2, 1)
+    if resource is not None:
+        ## ru_maxrss is KB on linux and bytes on mac
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024**2 if sys.platform == 'darwin' else 1024), 1)
+    ## current rss, a lower bound of the peak
+    if psutil is not None:
+        return round(psutil.Process().memory_info().rss / 1024**2, 1)
+    return None
+
+def count_rows(obj):
+    ## rows of a df or the total rows of a list/tuple/dict of dfs
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple)):
+        rows = [count_rows(i) for i in obj]
+        rows = [i for i in rows if i is not None]
+        if len(rows) > 0:
+            return sum(rows)
+    return None
+
+@contextmanager
+def span(name, rows_in=None, **info):
+    '''
+    Parameters
+    ----------
+    name : str
+        name of the stage
+    rows_in : int, optional
+        rows going into the stage
+    **info :
+        any extra fields to write to the log (table names, subject, etc.)
+
+    Yields
+    ------
+    record : dict
+        the span record, set record['RowsOut'] inside the block to log rows out
+
+    '''
+    record = {'Stage':name, 'RowsIn':rows_in, 'RowsOut':None}
+    record.update(info)
+    if not hasattr(_open_spans, 'stack'):
+        _open_spans.stack = []
+    ## seconds spent in the spans nested in this one
+    nested = {'Seconds':0.0}
+    _open_spans.stack.append(nested)
+    round_trips_start = get_round_trips()
+    peak_start = get_peak_rss()
+    start = time.perf_counter()
+    try:
+        yield record
+        record['Status'] = 'Success'
+    except Exception:
+        record['Status'] = 'Failed'
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        _open_spans.stack.pop()
+        if len(_open_spans.stack) > 0:
+            _open_spans.stack[-1]['Seconds'] += seconds
+        record['Seconds'] = round(seconds, 3)
+        record['SelfSeconds'] = round(seconds - nested['Seconds'], 3)
+        ## the process peak at the end of the span, and how far the span pushed it (0 if the stage stayed under an earlier peak)
+        record['ProcessPeakRSSMB'] = get_peak_rss()
+        record['PeakRSSIncreaseMB'] = round(max(record['ProcessPeakRSSMB'] - peak_start, 0), 1) if peak_start is not None else None
+        record['DBRoundTrips'] = get_round_trips() - round_trips_start
+        record['Depth'] = len(_open_spans.stack)
+        record['Finished'] = datetime.now().isoformat(timespec='seconds')
+        _spans.append(record)
+        if _run_log is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(_run_log)), exist_ok=True)
+            with open(_run_log, 'a') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+
+def timed(name=None, label=None):
+    ## decorator that wraps a function/method in a span, rows in are the dfs passed in, rows out the dfs returned
+    ## label is the name of an argument (like table_name) whose value is logged with the span
+    def decorator(func):
+        signature = inspect.signature(func)
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            stage = name if name is not None else func.__qualname__
+            info = {}
+            if label is not None:
+                bound = signature.bind_partial(*args, **kwargs)
+                info['Label'] = bound.arguments.get(label)
+            with span(stage, rows_in=count_rows(list(args) + list(kwargs.values())), **info) as record:
+                result = func(*args, **kwargs)
+                record['RowsOut'] = count_rows(result)
+            return result
+        return wrapper
+    return decorator
+
+def run_summary(print_summary=True):
+    ## one row per stage with calls, total and self time, rows and round-trips, slowest stage (by self time) first
+    ## Seconds of a stage includes its nested stages, so only SelfSeconds adds up to the run time. Nested marks stages run inside another
+    if len(_spans) == 0:
+        return pd.DataFrame()
+    spans = pd.DataFrame(_spans)
+    summary = spans.groupby('Stage').agg(Calls=('Seconds', 'size')
+                                         ,Seconds=('Seconds', 'sum')
+                                         ,SelfSeconds=('SelfSeconds', 'sum')
+                                         ,Nested=('Depth', lambda x: (x > 0).any())
+                                         ,RowsIn=('RowsIn', 'sum')
+                                         ,RowsOut=('RowsOut', 'sum')
+                                         ,ProcessPeakRSSMB=('ProcessPeakRSSMB', 'max')
+                                         ,PeakRSSIncreaseMB=('PeakRSSIncreaseMB', 'max')
+                                         ,DBRoundTrips=('DBRoundTrips', 'sum')
+                                         ,Failed=('Status', lambda x: (x=='Failed').sum()))
+    summary['RowsPerSecond'] = (summary[['RowsIn', 'RowsOut']].max(axis=1) / summary.Seconds).round(0)
+    summary = summary.sort_values('SelfSeconds', ascending=False).reset_index()
+    if print_summary:
+        print(summary.to_string(index=False))
+    return summary
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 23 10:31:47 2026
+
+@author: YFahmy
+Resumable chunked uploads. Every chunk is committed on its own and recorded in a journal (UploadJournal/, one file per server
+and target table, the table name holds the run and fiscal year). A chunk that fails is retried on a new connection with
+exponential backoff, and an upload that is started again with the same data resumes from the first chunk not committed.
+After a dropped connection the row count of the table tells whether the last chunk was committed, so no chunk is inserted twice.
+Chunks are converted to rows on a background thread while the previous chunk is being inserted (at most prefetch chunks are
+held in memory), so an upload takes about as long as the slower of the two instead of their sum.
+
+Usage:
+    upload = UPLOAD(server_name='AACTASTPDDBVM02', sql_table_name='AccountabilityArchive.Static.PrelimStaticFile2023')
+    if not upload.is_unfinished():
+        ## create or clear the target table
+    cnxn = upload.upload(df, cnxn, connect=lambda: DATABASE().connect_to_db())
+"""
+from TIMING import count_round_trip
+from termcolor import colored
+from contextlib import closing
+from datetime import datetime
+import pandas as pd
+import hashlib
+import json
+import threading
+import queue
+import math
+import time
+import os
+
+
+class UPLOAD:
+    '''
+    Parameters
+    ----------
+    server_name : str
+        DESCRIPTION: server the table is on (part of the journal name)
+    sql_table_name : str
+        DESCRIPTION: full name of the target table (database.schema.{run}{table}{fiscal_year})
+    chunksize : int, The default is 100000
+        DESCRIPTION: rows inserted and committed per executemany
+    max_retries : int, The default is 5
+        DESCRIPTION: retries of a failed chunk before the upload stops (it can be resumed later)
+    backoff : float, The default is 2
+        DESCRIPTION: seconds waited before the first retry, doubled on every retry of the same chunk
+    journal_folder : str, The default is None
+        DESCRIPTION: folder of the journals, UploadJournal next to this file if None
+    prefetch : int, The default is 2
+        DESCRIPTION: chunks converted ahead of the one being inserted, 0 converts each chunk right before inserting it
+    '''
+    def __init__(self, server_name, sql_table_name, chunksize=100000, max_retries=5, backoff=2, journal_folder=None, prefetch=2):
+        self.server_name = server_name
+        self.sql_table_name = sql_table_name
+        self.chunksize = chunksize
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.prefetch = prefetch
+        if journal_folder is None:
+            journal_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'UploadJournal')
+        self.journal_file = os.path.join(journal_folder, f'{server_name}.{sql_table_name}'.replace('[', '').replace(']', '') + '.json')
+
+    def read_journal(self):
+        if not os.path.exists(self.journal_file):
+            return None
+        with open(self.journal_file) as file:
+            return json.load(file)
+
+    def write_journal(self, journal):
+        ## written to a temporary file first so an interrupted write never leaves a partial journal
+        os.makedirs(os.path.dirname(self.journal_file), exist_ok=True)
+        with open(self.journal_file + '.tmp', 'w') as file:
+            json.dump(journal, file, indent=1)
+        os.replace(self.journal_file + '.tmp', self.journal_file)
+
+    def is_unfinished(self):
+        ## an earlier upload to the table stopped before its last chunk, the table should not be created or cleared again
+        journal = self.read_journal()
+        return (journal is not None) and (not journal['Finished'])
+
+    def clear_journal(self):
+        ## forget an unfinished upload (the rows it committed are still in the table)
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+
+    def get_fingerprint(self, df):
+        sha = hashlib.sha256(json.dumps([str(col) for col in df.columns]).encode())
+        sha.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        return sha.hexdigest()
+
+    def count_rows(self, cnxn):
+        cursor = cnxn.cursor()
+        cursor.execute(f'SELECT COUNT_BIG(*) FROM {self.sql_table_name}')
+        count_round_trip()
+        return cursor.fetchone()[0]
+
+    def upload(self, df, cnxn, connect, names=None, values=None):
+        '''
+        Parameters
+        ----------
+        df : pandas DF to upload (nan already replaced by None)
+        cnxn : pyodbc connection
+            DESCRIPTION: open connection to the server, replaced by a new one from connect() if it drops
+        connect : callable
+            DESCRIPTION: returns a new connection to the server
+        names, values : str, The default is None
+            DESCRIPTION: column list and placeholders of the INSERT statment, built from df.columns if None
+
+        Returns
+        -------
+        cnxn : the connection the upload finished on (the caller closes it)
+        '''
+        if names is None:
+            names = ', '.join(['"' + str(col) + '"' for col in df.columns])
+            values = ','.join(['?'] * df.shape[1])
+        insert_sql = F'''INSERT INTO {self.sql_table_name} ({names}) values ({values})'''
+        n_chunks = math.ceil(df.shape[0]/self.chunksize)
+        fingerprint = self.get_fingerprint(df)
+
+        journal = self.read_journal()
+        if (journal is not None) and (not journal['Finished']):
+            if (journal['Fingerprint'] != fingerprint) or (journal['ChunkSize'] != self.chunksize):
+                raise ValueError(f'{self.sql_table_name} has an unfinished upload of different data ({self.journal_file}).'
+                                 ' Remove the rows it committed and call clear_journal() before uploading again')
+            ## the last chunk may have been committed after its journal entry was lost (crash between commit and journal write)
+            committed = set(journal['Committed'])
+            chunks = [n for n in range(n_chunks) if n not in committed]
+            n_rows = self.count_rows(cnxn)
+            expected = journal['BaseRows'] + journal['RowsCommitted']
+            next_rows = min(self.chunksize, df.shape[0] - chunks[0]*self.chunksize) if len(chunks) > 0 else 0
+            if (next_rows > 0) and (n_rows == expected + next_rows):
+                journal['Committed'].append(chunks[0])
+                journal['RowsCommitted'] += next_rows
+                self.write_journal(journal)
+            elif n_rows != expected:
+                raise ValueError(f'{self.sql_table_name} has {n_rows:,} rows, the upload journal expected {expected:,}.'
+                                 ' The table was changed since the upload stopped, drop it before uploading again')
+            print(colored(f'Resuming upload of {self.sql_table_name}: {len(journal["Committed"])} of {n_chunks} chunks already committed', 'green'))
+        else:
+            ## rows already in the table (fill_table appends to tables holding other years) so commits can be checked by row count
+            journal = {'Server':self.server_name, 'Table':self.sql_table_name, 'Rows':df.shape[0], 'ChunkSize':self.chunksize
+                       , 'Fingerprint':fingerprint, 'BaseRows':self.count_rows(cnxn), 'RowsCommitted':0, 'Committed':[]
+                       , 'Finished':False, 'StartedAt':datetime.now().isoformat(timespec='seconds')}
+            self.write_journal(journal)
+
+        committed = set(journal['Committed'])
+        chunks = [n for n in range(n_chunks) if n not in committed]
+        ## closed on a failed chunk too, so the serializer thread stops right away instead of holding converted chunks
+        with closing(self.serialize_chunks(df, chunks)) as stream:
+            for n, rows in stream:
+                cnxn = self.insert_chunk(insert_sql, rows, n, journal, cnxn, connect)
+                journal['Committed'].append(n)
+                journal['RowsCommitted'] += len(rows)
+                self.write_journal(journal)
+                print(f"Total cumulative rows uploaded: {journal['RowsCommitted']:,}")
+
+        journal['Finished'] = True
+        journal['FinishedAt'] = datetime.now().isoformat(timespec='seconds')
+        self.write_journal(journal)
+        return cnxn
+
+    def get_rows(self, df, n):
+        return df.iloc[n*self.chunksize:(n+1)*self.chunksize, :].values.tolist()
+
+    def serialize_chunks(self, df, chunks):
+        '''
+        Yields (chunk number, rows) in order. With prefetch > 0 the rows are made on a background thread and handed over through
+        a queue of prefetch chunks, so the next chunk is converted while the current one is in flight.
+        '''
+        if self.prefetch <= 0:
+            for n in chunks:
+                yield n, self.get_rows(df, n)
+            return
+
+        chunk_queue = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        def hand_over(item):
+            ## the upload may stop (failed chunk) while the queue is full, then nothing is taken from it any more
+            while not stop.is_set():
+                try:
+                    chunk_queue.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        def produce():
+            try:
+                for n in chunks:
+                    if not hand_over((n, self.get_rows(df, n))):
+                        return
+                hand_over(None)
+            except Exception as ex:
+                hand_over(ex)
+        producer = threading.Thread(target=produce, name=f'serialize {self.sql_table_name}', daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = chunk_queue.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            ## drain so a producer blocked on a full queue sees stop
+            while producer.is_alive():
+                try:
+                    chunk_queue.get(timeout=1)
+                except queue.Empty:
+                    pass
+            producer.join()
+
+    def insert_chunk(self, insert_sql, rows, n, journal, cnxn, connect):
+        ## inserts and commits one chunk, retrying on a new connection. Returns the connection it was committed on
+        attempt = 0
+        while True:
+            try:
+                cursor = cnxn.cursor()
+                cursor.fast_executemany = True
+                cursor.executemany(insert_sql, rows)
+                count_round_trip()
+                cnxn.commit()
+                return cnxn
+            except Exception as ex:
+                attempt += 1
+                if attempt > self.max_retries:
+                    print(colored(f'Chunk {n} of {self.sql_table_name} failed {attempt} times, rerun the upload to resume from it', 'red'))
+                    raise
+                wait = self.backoff * 2**(attempt-1)
+                print(colored(f'Chunk {n} of {self.sql_table_name} failed ({ex}), retrying in {wait} seconds', 'red'))
+                try:
+                    cnxn.rollback()
+                    cnxn.close()
+                except Exception:
+                    pass
+                time.sleep(wait)
+                try:
+                    cnxn = connect()
+                    ## the commit may have reached the server before the connection dropped
+                    n_rows = self.count_rows(cnxn)
+                except Exception:
+                    continue
+                if n_rows == journal['BaseRows'] + journal['RowsCommitted'] + len(rows):
+                    return cnxn
+                elif n_rows != journal['BaseRows'] + journal['RowsCommitted']:
+                    raise ValueError(f'{self.sql_table_name} has {n_rows:,} rows, the upload journal expected '
+                                     f'{journal["BaseRows"] + journal["RowsCommitted"]:,}. The table was changed during the upload')
+
+#%%
+# upload = UPLOAD(server_name='AACTASTPDDBVM02', sql_table_name='AccountabilityArchive.Static.PrelimV6StaticFile2023')
+# upload.read_journal()
@@ -73,11 +73,9 @@ class Proficiency(COMPONENTS):
         filtered_static_file.replace({"TestType":{680:"", 685:"Alt"}}, inplace=True)
 
         # filter for grades used in proficiency calculations
-        masks = []
-        for model, grades in self.proficiency_grade_map.items():
-            masks.append((filtered_static_file["SchoolTypeF"]==model) & (filtered_static_file["Grade"].isin(grades)).values)
-        masks = np.stack(masks).any(0)
-        filtered_static_file = filtered_static_file[masks]
+        grade_models = self.assign_models(filtered_static_file["Grade"], {model:{model:grades} for model, grades in self.proficiency_grade_map.items()}, 
+            keys=filtered_static_file["SchoolTypeF"])
+        filtered_static_file = filtered_static_file[grade_models.notnull()]
 
         # convert 101 grades (3rd graders who were second grade last year) to 3
         filtered_static_file.loc[:, "Grade"] = filtered_static_file["Grade"].replace(self.grade_changes)
@@ -126,7 +124,7 @@ class Proficiency(COMPONENTS):
             csi_data.loc[csi_data["Grade"].isna(), "Grade"] = "All" # when all grades are combined, set grade to All
 
             # establish connection to SQL database that will be used to retrieve historical CSI data
-            sql_connection = DATABASE(fiscal_year=self.fiscal_year-1, database="REDATA_UAT", schema="ssi", run="")
+            sql_connection = self.history.connection(fiscal_year=self.fiscal_year-1, database="REDATA_UAT", schema="ssi", run="")
 
             # call method to create summary table:
             csi_summary = self._csi_summary(csi_data, csi_percent_tested_info, sql_connection)
@@ -315,14 +313,10 @@ class Proficiency(COMPONENTS):
         
         # convert Grade column to wide format (resulting in a column for each grade and value defined below)
         csi_summary["Grade"] = "Grade" + csi_summary["Grade"]
-        csi_summary_wide = csi_summary.pivot(index=["SchoolCode", "SchoolTypeF"], columns=["Grade"], values=["Number_Proficient", "Percent_Proficient", "Number_FAY_Tested"]).reset_index()
-
-        # rename columns to match previous year's results
-        columns = csi_summary_wide.columns.to_frame()
-        columns = columns.replace({"Number_FAY_Tested":"FayStud", "Number_Proficient":"NumProficient", "Percent_Proficient":"PctProficient"}, regex=True)
-        columns = columns.iloc[:,0] + columns.iloc[:,1]
-        columns = columns.replace({"FayStudGradeAll":"FayStudAllStudents", "NumProficientGradeAll":"NumProfAllStudents", "PctProficientGradeAll":"PctProfAllStudents"})
-        csi_summary_wide.columns = columns
+        # column names match previous year's results
+        csi_summary_wide = self.build_wide_table(csi_summary, index=["SchoolCode", "SchoolTypeF"], columns=["Grade"]
+                                                 , names={"Number_Proficient":"NumProficient{Grade}", "Percent_Proficient":"PctProficient{Grade}", "Number_FAY_Tested":"FayStud{Grade}"})
+        csi_summary_wide = csi_summary_wide.rename(columns={"FayStudGradeAll":"FayStudAllStudents", "NumProficientGradeAll":"NumProfAllStudents", "PctProficientGradeAll":"PctProfAllStudents"})
 
         # select for all the proficiency results of all grades (entire school)
         all_grades_summary = csi_summary[csi_summary["Grade"]=="GradeAll"]
@@ -364,14 +358,10 @@ class Proficiency(COMPONENTS):
         pd.DataFrame: A table containing all of the information (Percent Proficient, Number FAY Tested, etc.) that is present in the CSI drilldown GUI table on ADEConnect
         """
         # pivot to get drilldown columns (one column for every column and value below)
-        csi_drilldown = csi_data.pivot(index=["SchoolCode", "SchoolTypeF"], columns=["Grade", "Subject", "TestType"], 
-            values=["Number_1", "Number_2", "Number_3", "Number_4", "Number_FAY_Tested", "Percent_Proficient"]).reset_index()
-
-        # rename columns to match previous year's naming convention
-        columns = csi_drilldown.columns.to_frame()
-        columns = columns.iloc[:,3] + columns.iloc[:,2] + columns.iloc[:,1] + columns.iloc[:,0]
-        columns = columns.replace({"Number":"Num", "Percent":"Pct", "Proficient":"Prof", "_":""}, regex=True).replace({"Num1":"NumMP", "Num2":"NumPP", "Num3":"NumP", "Num4":"NumHP"}, regex=True)
-        csi_drilldown.columns = columns
+        # column names match previous year's naming convention
+        names = {"Number_1":"NumMP", "Number_2":"NumPP", "Number_3":"NumP", "Number_4":"NumHP", "Number_FAY_Tested":"NumFAYTested", "Percent_Proficient":"PctProf"}
+        csi_drilldown = self.build_wide_table(csi_data, index=["SchoolCode", "SchoolTypeF"], columns=["Grade", "Subject", "TestType"]
+                                              , names={value:"{TestType}{Subject}{Grade}"+name for value, name in names.items()})
 
         # obtain historical csi drilldown information (percent proficiencies) - also contains current fiscal_year results
         csi_historical_drilldown = self._csi_historical_drilldown(csi_data, sql_connection=sql_connection)
@@ -443,15 +433,8 @@ class Proficiency(COMPONENTS):
         atsi_summary.loc[atsi_summary["Number_FAY_Tested"]<(self.n_count*2), "Proficiency_Points"] = np.nan #"NR" # change point value if subgroup does not meet the N-count
 
         # convert to wide format (one column for each column and value defined below)
-        atsi_summary = atsi_summary.pivot(index=["SchoolCode", "SchoolTypeF"], columns=["Subgroup"], values=["Percent_Proficient", "Percent_Tested", "Proficiency_Points"]).reset_index()
-        # atsi_summary = atsi_summary.re
-
-        # change column names
-        columns = atsi_summary.columns.to_frame()
-        columns = columns.iloc[:,0] + columns.iloc[:,1]
-        columns = columns.replace({"Percent_Tested":"PercentTested", "Proficiency_Points":"Proficiency"}, regex=True)
-        columns.loc[columns.str.contains("Percent_Proficient")] = f"FY{self.fiscal_year}Pct" + columns.loc[columns.str.contains("Percent_Proficient")].replace({"Percent_Proficient":""}, regex=True)
-        atsi_summary.columns = columns
+        atsi_summary = self.build_wide_table(atsi_summary, index=["SchoolCode", "SchoolTypeF"], columns=["Subgroup"]
+                                             , names={"Percent_Proficient":f"FY{self.fiscal_year}Pct{{Subgroup}}", "Percent_Tested":"PercentTested{Subgroup}", "Proficiency_Points":"Proficiency{Subgroup}"})
         return atsi_summary
     
 
@@ -479,14 +462,9 @@ class Proficiency(COMPONENTS):
         atsi_drilldown["Percent_Proficient"] = (atsi_drilldown["Number_3"] + atsi_drilldown["Number_4"]) / atsi_drilldown["Number_FAY_Tested"] * 100 * atsi_drilldown["Percent_Multiplier"]
 
         # convert to wide format (one column for each column and value defined below)
-        atsi_drilldown = atsi_drilldown.pivot(index=["SchoolCode"], columns=["Subgroup", "Subject"], values=["Number_1", "Number_2", "Number_3", "Number_4",
-            "Number_FAY_Tested", "Percent_Proficient"]).reset_index()
-        
-        # change column names
-        columns = atsi_drilldown.columns.to_frame()
-        columns = columns.iloc[:,2] + columns.iloc[:,0] + columns.iloc[:,1]
-        columns = columns.replace({"Number":"Num", "Tested":"Tstd", "Percent":"Pct", "Proficient":"Prof", "_":""}, regex=True).replace({"Num1":"NumMP", "Num2":"NumPP", "Num3":"NumP", "Num4":"NumHP"}, regex=True)
-        atsi_drilldown.columns = columns
+        names = {"Number_1":"NumMP", "Number_2":"NumPP", "Number_3":"NumP", "Number_4":"NumHP", "Number_FAY_Tested":"NumFAYTstd", "Percent_Proficient":"PctProf"}
+        atsi_drilldown = self.build_wide_table(atsi_drilldown, index=["SchoolCode"], columns=["Subgroup", "Subject"]
+                                               , names={value:"{Subject}"+name+"{Subgroup}" for value, name in names.items()})
         return atsi_drilldown
     
 
@@ -607,7 +585,7 @@ class Proficiency(COMPONENTS):
         #     sql_connection = DATABASE(fiscal_year=self.fiscal_year, run = 'Final', schema = 'Results', database = 'AccountabilityArchive')
         # usual approach - reads from previous year's table
         # else:
-        sql_connection = DATABASE(fiscal_year = self.fiscal_year-1, run = 'Final', schema = 'Results', database = 'AccountabilityArchive')
+        sql_connection = self.history.connection(fiscal_year = self.fiscal_year-1, run = 'Final', schema = 'Results', database = 'AccountabilityArchive')
         atsi_historical_data = sql_connection.read_table(table_name=self.py_atsi_tables["atsi_1"]).rename({"EntityID":"SchoolCode"})
 
         # keep only the historical columns defined above, can drop the rest
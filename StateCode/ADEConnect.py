@@ -18,7 +18,12 @@ from AR import AR
 from COMPONENTS import COMPONENTS
 from GTG import GTG
 from bonus_points import Bonus_Points
+from BOOTSTRAP import BOOTSTRAP
+from TIMING import span, run_summary
+from PUBLISHER import PUBLISHER
 from functools import reduce, partial
+import hashlib
+import os
             
 class ADEConnect(COMPONENTS):
     def __init__(self,  fiscal_year=None, run='Prelim', null_components=None, **kwargs):
@@ -100,6 +105,10 @@ class ADEConnect(COMPONENTS):
         self.threshold = {'Alt 9-12':60
                           ,'9-12':50
                           ,'k-8':80}
+        ## bootstrap of letter grades uses the same cuts and threshold
+        self.bootstrap = BOOTSTRAP(fiscal_year=self.fiscal_year, run=self.run, cuts=self.cuts, threshold=self.threshold, **kwargs)
+        ## background writer of the results when calculate_results(publish=True), None otherwise
+        self.publisher = None
 
         
     def get_cy_staticfile(self, database = 'AccountabilityArchive', schema = 'Static', prefix=None, table_name ='StaticFile'):
@@ -136,11 +145,12 @@ class ADEConnect(COMPONENTS):
     #will need to be updated in 2024 to get data from AccountabilityArchive
     def get_py_staticfile(self, database = 'REDATA', schema = 'dbo', prefix='', table_name='StaticFileData'):
         print('Retrieving py_staticfile')
-        # bring in py staticfile
-        py_staticfile = DATABASE(fiscal_year = self.previous_fiscal_year
-                                ,run = prefix
-                                ,schema = schema
-                                ,database = database).read_table(table_name =table_name)
+        # bring in py staticfile (from the historical results store after the first read of the run)
+        py_staticfile = self.history.read_table(table_name
+                                                ,fiscal_year = self.previous_fiscal_year
+                                                ,run = prefix
+                                                ,schema = schema
+                                                ,database = database)
         return py_staticfile  
 
     def get_grad_rate(self, database = 'AccountabilityArchive', schema = 'Static', prefix=None, table_name ='GradRate'):
@@ -183,8 +193,19 @@ class ADEConnect(COMPONENTS):
         alt_ccri = db.read_table(table_name =alt_table_name, cy_data_only=True, suffix_fy=True)
         return trad_ccri, alt_ccri
         
-    def calculate_results (self):
-        
+    def calculate_results (self, use_cache=True, cache_dir=None, publish=False):
+        '''
+        Parameters
+        ----------
+        use_cache : bool
+            reuse a component's results when its inputs and configuration have not changed. The default is True.
+        cache_dir : str
+            folder that holds the cached results. The default is None (ResultsCache/{fiscal_year}/{run} next to this file).
+        publish : bool
+            upload each component's results to the Results schema on a background writer while the next component calculates
+            (instead of upload_results after all of them). The default is False.
+
+        '''
         staticfile = self.get_cy_staticfile()
         py_staticfile = self.get_py_staticfile()
         drop_out = self.get_dropout_rate()
@@ -202,24 +223,88 @@ class ADEConnect(COMPONENTS):
                             ,'StateSGI': [staticfile, py_staticfile, grad_rate, drop_out, schooltype]
                             ,'StateGTG': [staticfile]
                             ,'StateBonusPoints':[staticfile]}
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ResultsCache', str(self.fiscal_year), self.run)
+        os.makedirs(cache_dir, exist_ok=True)
+        ## hash every input once since most components share them
+        input_hashes = {}
+        for inputs in dependancies_dict.values():
+            for df in inputs:
+                if id(df) not in input_hashes:
+                    input_hashes[id(df)] = self.get_frame_fingerprint(df)
+        
+        ## late submissions read by an earlier run may be out of date, read them again for the fingerprints and calculations below
+        self.clear_late_submissions()
+        
+        ## results of an earlier run are finished uploading before this run starts publishing
+        if self.publisher is not None:
+            self.publisher.close()
+            self.publisher = None
+        if publish:
+            self.publisher = PUBLISHER()
+            db = self.get_results_db()
+        
         #fill results dictionary with calculated results
         self.results = {}
         for component in self.calculations.keys():
+            ## fingerprint is the content of the inputs and the configuration of the component
+            ## plus whatever the component reads from the server itself (late submissions), None if that can't be fingerprinted
+            server_fingerprint = self.results_modules[component].get_input_fingerprint()
+            fingerprint = hashlib.sha256((''.join([input_hashes[id(df)] for df in dependancies_dict[component]])
+                                          + self.results_modules[component].get_config_fingerprint()
+                                          + str(server_fingerprint)).encode()).hexdigest()
+            cache_file = os.path.join(cache_dir, f'{component}_{fingerprint[:16]}.pkl')
+            if use_cache and (server_fingerprint is not None) and os.path.exists(cache_file):
+                print(f'Inputs unchanged, reusing cached {component}')
+                self.results[component] = pd.read_pickle(cache_file)
+                if publish:
+                    self.publisher.publish(component, partial(self.upload_component_results, db, component, self.results[component].copy(), raise_errors=True))
+                continue
             print(f'Calculating {component}')
-            temp = self.results_modules[component].calculate_component(*dependancies_dict[component])
-            temp = self.round_numeric_cols(temp)[0]
+            rows_in = sum([len(df) for df in dependancies_dict[component]])
+            with span(f'{component}.calculate_component', rows_in=rows_in) as record:
+                temp = self.results_modules[component].calculate_component(*dependancies_dict[component])
+                temp = self.round_numeric_cols(temp)[0]
+                record['RowsOut'] = len(temp)
             self.results[component] = temp
             print(f'{component} shape: {self.results[component].shape}\n')
-        
+            ## remove stale cache of this component and save the new results
+            for file in os.listdir(cache_dir):
+                if file.startswith(f'{component}_') and file.endswith('.pkl'):
+                    os.remove(os.path.join(cache_dir, file))
+            temp.to_pickle(cache_file)
+            if publish:
+                ## a copy is uploaded so later changes to self.results don't reach the server
+                self.publisher.publish(component, partial(self.upload_component_results, db, component, temp.copy(), raise_errors=True))
+        ## print stage timings of the run
+        run_summary()
+    
+    def get_results_db(self):
+        return DATABASE(fiscal_year = self.fiscal_year
+                    ,run = self.run
+                    ,schema = 'Results'
+                    ,database = 'AccountabilityArchive')
+    
+    def upload_component_results(self, db, component, results, raise_errors=False):
+        ## replaces the results table of one component (upload_table_to_db creates the table, so the old one is dropped first)
+        db.drop_tables_in_run(component)
+        db.upload_table_to_db(df=results, table_name=component, raise_errors=raise_errors)
+    
+    def flush_results(self):
+        ## barrier: waits for the results published by calculate_results(publish=True) to be on the server
+        if self.publisher is not None:
+            self.publisher.flush()
+    
     def upload_results(self):
         #check to see if self.results is there (if not run the calculations)
         if not hasattr(self, 'results'):
             self.calculate_results()
+        ## results already published while they were calculated
+        if self.publisher is not None:
+            self.flush_results()
+            return
         #make instance of DB module
-        db = DATABASE(fiscal_year = self.fiscal_year
-                    ,run = self.run
-                    ,schema = 'Results'
-                    ,database = 'AccountabilityArchive')
+        db = self.get_results_db()
         #upload results
         for name, table in self.results.items():
             db.upload_table_to_db(df=table, table_name=name)
@@ -253,6 +338,7 @@ class ADEConnect(COMPONENTS):
         db.drop_tables_in_run(*list(self.calculations.keys()))
     
     def produce_drilldowns (self):
+        self.flush_results()
         ##==============================Put all drilldown tables in dict to get them ready to upload to db
         #pick the drill down cols from each of the results tables
         tables_map = {'StateGrowth':'Growth'
@@ -315,7 +401,7 @@ class ADEConnect(COMPONENTS):
             db.fill_table(dataframe=df, table_name=gui_table, all_data=True)
             
     
-    def produce_summaries(self, produce_grades=False):
+    def combine_summaries(self):
         ##==============================Put all summary tables in dict to get them ready to upload to db
         summary_only_modules = ['StateBonusPoints', 'StateCCRI', 'StateGradRate', 'StateGTG']
         summary_regex = ['_all', '_summary']
@@ -347,6 +433,14 @@ class ADEConnect(COMPONENTS):
         fixed_merge = partial(pd.merge, on=['FiscalYear', 'EntityID', 'Model'], how='outer')
         #use reduce to merge all df in summary_tables dict
         data = reduce(fixed_merge, summary_tables.values())
+        return data
+    
+    def produce_summaries(self, produce_grades=False):
+        ## published results must be on the server before the summaries and entity table are produced from them
+        self.flush_results()
+        
+        ## merge all summary tables into one df
+        data = self.combine_summaries()
         
         ## get schooltype file
         schooltype = self.get_schooltype_file()
@@ -408,11 +502,10 @@ class ADEConnect(COMPONENTS):
       index=['EntityID', 'FiscalYear' ]
       columns = 'Model'
       values = ['TotalPointsEligible', 'TotalPoints', 'TotalBonusPoints']
-      nontypical = pd.pivot(data=nontypical, index=index, columns=columns, values=values)
-      nontypical.columns = [i[0]+i[1]+'Model' for i in nontypical.columns]
+      nontypical = self.build_wide_table(nontypical, index=index, columns=[columns], names={value:value+'{Model}Model' for value in values})
       
       ## get enrolled counts from schooltype
-      nontypical = pd.merge(nontypical.reset_index(), schooltype, left_on='EntityID', right_on='SchoolCode', suffixes=('','_y'))
+      nontypical = pd.merge(nontypical, schooltype, left_on='EntityID', right_on='SchoolCode', suffixes=('','_y'))
       
       #calculate PercentOfStudents912 and PercentOfStudentsK8
       nontypical['PercentOfStudentsK8'] = (nontypical['EnrolledCountk-8']*100 / nontypical[['EnrolledCountk-8' , 'EnrolledCount9-12']].sum(axis=1, min_count=1)).round(2)
@@ -506,6 +599,20 @@ class ADEConnect(COMPONENTS):
         
         return data
         
+    def bootstrap_grades(self, n_replicates=1000, n_workers=1, seed=None):
+        ## n_workers > 1 splits the replicates on processes, the script then has to run under if __name__ == '__main__':
+        ## check to see if self.results is there (if not run the calculations)
+        if not hasattr(self, 'results'):
+            self.calculate_results()
+        ## total points as reported, then resample students to get grade probabilities
+        schooltype = self.get_schooltype_file()
+        data = self.calculate_total_points(self.combine_summaries(), schooltype, produce_grades=True)
+        staticfile = self.get_cy_staticfile()
+        grades = self.bootstrap.calculate_component(staticfile, data, n_replicates=n_replicates, n_workers=n_workers, seed=seed)
+        ## add the reported letter grade for comparison
+        grades = pd.merge(grades, data[['EntityID', 'Model', 'LetterGrade']], on=['EntityID', 'Model'], how='left')
+        return grades
+    
     def fill_summaries(self, produce_grades=False):
         summaries = self.produce_summaries(produce_grades=produce_grades)
             
@@ -610,10 +717,12 @@ class ADEConnect(COMPONENTS):
 # null_components=['StateEL']
 # self = ADEConnect(2022, null_components=['StateEL'], run='Prelim')
 
-self = ADEConnect(2023, run='PrelimV6')
+# self = ADEConnect(2023, run='PrelimV6')
 # self.drop_results()
 # self.upload_results()
-self.retrieve_results()
-self.fill_drilldowns()
+## or upload each component while the next one calculates (fill_* and produce_* wait for the uploads)
+# self.calculate_results(publish=True)
+# self.retrieve_results()
+# self.fill_drilldowns()
 
-self.fill_summaries(produce_grades=True)
+# self.fill_summaries(produce_grades=True)
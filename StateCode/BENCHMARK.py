@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Jun 26 13:40:18 2023
+
+@author: YFahmy
+"""
+import os
+import pandas as pd
+from GROWTH import GROWTH
+from proficiency import PROFICIENCY
+from SGI import SGI
+from GRADUATION import GRADUATION
+from EL import EL
+from AR import AR
+from TIMING import span, reset_run, set_run_log, run_summary
+
+
+class BENCHMARK:
+    '''
+    Times every state component on the synthetic staticfile produced by StaticFile/BENCHMARK.py, with no server access.
+    CCRI, GTG and Bonus Points read their own tables from the server so they are not part of the offline benchmark.
+
+    Parameters
+    ----------
+    fiscal_year : int
+        DESCRIPTION: fiscal year of the synthetic data
+    folder : str
+        DESCRIPTION: folder holding StaticFile{fy}.pkl, StaticFile{fy-1}.pkl, SchoolType{fy}.pkl, GradRate{fy}.pkl and DropOut{fy}.pkl
+    run_log : str, The default is None
+        DESCRIPTION: path of the jsonl file to append component timings to
+    '''
+    def __init__(self, fiscal_year=2023, run='Prelim', folder=None, run_log=None, **kwargs):
+        self.fiscal_year = fiscal_year
+        self.run = run
+        self.folder = folder
+        self.run_log = run_log
+        self.results_modules = {'StateGrowth':GROWTH(fiscal_year=self.fiscal_year, run=self.run, **kwargs)
+                                ,'StateProficiency':PROFICIENCY(fiscal_year=self.fiscal_year, run=self.run, **kwargs)
+                                ,'StateSGI':SGI(fiscal_year=self.fiscal_year, run=self.run, **kwargs)
+                                ,'StateGradRate':GRADUATION(fiscal_year=self.fiscal_year, run=self.run, **kwargs)
+                                ,'StateEL':EL(fiscal_year=self.fiscal_year, run=self.run, **kwargs)
+                                ,'StateAR':AR(fiscal_year=self.fiscal_year, run=self.run, **kwargs)}
+
+    def load_data(self):
+        read = lambda name, fy: pd.read_pickle(os.path.join(self.folder, f'{name}{fy}.pkl'))
+        staticfile = read('StaticFile', self.fiscal_year)
+        py_staticfile = read('StaticFile', self.fiscal_year-1)
+        schooltype = read('SchoolType', self.fiscal_year)
+        grad_rate = read('GradRate', self.fiscal_year)
+        drop_out = read('DropOut', self.fiscal_year)
+        ## same arguments as ADEConnect.calculate_results
+        self.dependancies_dict = {'StateGrowth':[staticfile]
+                                  ,'StateEL':[staticfile, schooltype]
+                                  ,'StateProficiency':[staticfile]
+                                  ,'StateAR':[staticfile, py_staticfile]
+                                  ,'StateGradRate': [grad_rate, schooltype]
+                                  ,'StateSGI': [staticfile, py_staticfile, grad_rate, drop_out, schooltype]}
+
+    def run_benchmark(self, components=None):
+        '''
+        Calculates each component once (inputs are copied so components cannot alter each other's data) and returns the timings.
+        '''
+        reset_run()
+        if self.run_log is not None:
+            set_run_log(self.run_log)
+        if not hasattr(self, 'dependancies_dict'):
+            self.load_data()
+        if components is None:
+            components = list(self.results_modules.keys())
+
+        self.results = {}
+        for component in components:
+            inputs = [df.copy() for df in self.dependancies_dict[component]]
+            with span(f'{component}.calculate_component', rows_in=sum([len(df) for df in inputs])) as record:
+                self.results[component] = self.results_modules[component].calculate_component(*inputs)
+                record['RowsOut'] = len(self.results[component])
+        return run_summary()
+
+#%%
+# bench = BENCHMARK(2023, folder=r'H:\ACCT\ACCOUNTABILITY\2023\Yassin\benchmark data')
+# timings = bench.run_benchmark()
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:12:40 2026
+
+@author: YFahmy
+Bootstrap of school letter grades. Students are resampled with replacement within each school and model,
+Proficiency, Growth and EL points are recomputed for every replicate and the other components (AR, CCRI, grad rate, etc.)
+are held at their reported values. The result is the probability of each letter grade per school.
+
+The recomputation follows the component business rules with these simplifications:
+    - Proficiency uses the regular equation with the 95% tested multiplier held at the reported value
+    - EL statewide mean and std are held at their reported values (they are statewide and barely move on resampling)
+"""
+
+from COMPONENTS import COMPONENTS
+from GROWTH import GROWTH
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+## replicates run in worker processes, so they are module level functions of the payload only (arrays and a few constants),
+## nothing of the BOOTSTRAP or ADEConnect instance is pickled to the workers
+
+def sum_units(payload, draws):
+    ## sum every student column per unit for the drawn rows
+    unit = payload['unit_of_row']
+    n_units = len(payload['unit_size'])
+    return {col: np.bincount(unit, weights=payload['values'][draws, i], minlength=n_units) for i, col in enumerate(payload['student_cols'])}
+
+def get_el_points(pct, mean, std, decimals):
+    ## same point bands as EL, 5 at or above the statewide mean down to 1 at 3 std below it
+    pct = np.round(pct, decimals)
+    conditions = [pct >= np.round(mean, decimals)
+                  ,pct == 0
+                  ,pct >= np.round(mean - std*0.5, decimals)
+                  ,pct >= np.round(mean - std, decimals)
+                  ,pct >= np.round(mean - std*2, decimals)
+                  ,pct >= np.round(mean - std*3, decimals)]
+    return np.select(conditions, [5, 0, 4, 3, 2, 1], default=np.nan)
+
+def get_unit_points(sums, payload):
+    n_count = payload['n_count']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ##------------------- proficiency
+        prof_weight = payload['prof_weight']
+        pct_prof = sums['ProfNum'] / sums['ProfTests'] * 100 * payload['multiplier']
+        prof = np.minimum(prof_weight, pct_prof/100 * prof_weight)
+        prof[sums['ProfFAY'] < n_count] = np.nan
+
+        ##------------------- growth, points per subject capped at the subject weight
+        max_points = payload['growth_half_weight'] * 100
+        growth = np.zeros(len(max_points))
+        for subject in payload['growth_subjects']:
+            subject_points = np.minimum(max_points, max_points * sums['GrowthBW'+subject] / sums['GrowthN'+subject])
+            growth += np.nan_to_num(subject_points)
+        growth[(sums['GrowthStudent'] < n_count) | np.isnan(max_points)] = np.nan
+
+        ##------------------- EL
+        el_prof = get_el_points(sums['ELReclass']/sums['ELTested'], payload['ELProfMean'], payload['ELProfSTD'], 4)
+        el_prof[sums['ELTested'] < n_count] = np.nan
+        el_growth = get_el_points(sums['ELGrowth']/sums['ELHasGrowth'], payload['ELGrowthMean'], payload['ELGrowthSTD'], 2)
+        el_growth[sums['ELHasGrowth'] < n_count] = np.nan
+
+    return {'Proficiency': prof
+            ,'Growth': growth
+            ,'ELProficiencyandGrowth': el_prof + el_growth}
+
+def get_total_points(points, payload):
+    ## swap the replicate's points into the summary rows (rows without students keep their reported points)
+    row_unit = payload['row_unit']
+    has_unit = row_unit >= 0
+    idx = np.where(has_unit, row_unit, 0)
+    point_sum = payload['other_points'].copy()
+    eligible = payload['other_eligible'].copy()
+    for component in payload['observed'].keys():
+        rep = np.where(has_unit, points[component][idx], payload['observed'][component])
+        point_sum += np.nan_to_num(rep)
+        eligible += np.where(np.isnan(rep), 0, np.nan_to_num(payload['weights'][component]))
+    eligible[eligible <= 0] = np.nan
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = np.round(np.round(point_sum, 2) * 100 / eligible, 2)
+    return np.round(pct + payload['bonus'], 2), eligible
+
+def run_replicates(payload, n_replicates, seed):
+    ## runs in the worker processes, each replicate is a handful of array operations over all students
+    rng = np.random.default_rng(seed)
+    unit = payload['unit_of_row']
+    start = payload['unit_start'][unit]
+    size = payload['unit_size'][unit]
+    n_rows = len(payload['row_unit'])
+    earned = np.empty((n_replicates, n_rows))
+    eligible = np.empty((n_replicates, n_rows))
+    for r in range(n_replicates):
+        ## every student slot draws a student from its own unit
+        draws = start + (rng.random(len(unit)) * size).astype(np.int64)
+        points = get_unit_points(sum_units(payload, draws), payload)
+        earned[r], eligible[r] = get_total_points(points, payload)
+    return earned, eligible
+
+class BOOTSTRAP(COMPONENTS):
+    def __init__(self,  fiscal_year=None, run='Prelim', cuts=None, threshold=None, **kwargs):
+        super().__init__(fiscal_year=fiscal_year, run=run, **kwargs)
+        ## growth instance holds the growth band names and weights per model
+        self.growth = GROWTH(fiscal_year=self.fiscal_year, run=self.run, **kwargs)
+        ## components that are recomputed for every replicate
+        self.bootstrap_components = ['Proficiency', 'Growth', 'ELProficiencyandGrowth']
+        ## key of a school-model unit
+        self.unit_cols = ['SchoolCode', 'Model']
+        ## student level columns summed per unit in every replicate
+        self.student_cols = ['ProfNum', 'ProfTests', 'ProfFAY', 'GrowthStudent', 'ELTested', 'ELReclass', 'ELGrowth', 'ELHasGrowth']
+        self.student_cols += ['GrowthBW'+subject for subject in self.growth_subjects] + ['GrowthN'+subject for subject in self.growth_subjects]
+
+        self.grade_labels = ['A', 'B', 'C', 'D', 'F', 'NR']
+        ## same cuts and threshold as ADEConnect unless provided
+        if cuts is None:
+            self.cuts = {'Alt 9-12': {'A': [130, 83],
+                                      'B': [82.99, 65],
+                                      'C': [64.99, 47],
+                                      'D': [46.99, 29],
+                                      'F': [28.99, 0]},
+                         '9-12': {'A': [130, 82],
+                                  'B': [81.99, 65],
+                                  'C': [64.99, 48],
+                                  'D': [47.99, 31],
+                                  'F': [30.99, 0]},
+                         'k-8': {'A': [130, 84],
+                                'B': [83.99, 72],
+                                'C': [71.99, 60],
+                                'D': [59.99, 47],
+                                'F': [46.99, 0]}}
+        else:
+            self.cuts = cuts
+        if threshold is None:
+            self.threshold = {'Alt 9-12':60
+                              ,'9-12':50
+                              ,'k-8':80}
+        else:
+            self.threshold = threshold
+
+    def calculate_component(self, staticfile, summary, n_replicates=1000, n_workers=1, seed=None):
+        '''
+        Parameters
+        ----------
+        staticfile : pandas DF
+            current year staticfile
+        summary : pandas DF
+            summary data after ADEConnect.calculate_total_points (one row per EntityID and Model with component points,
+            TotalPointSum, TotalPointsEligible and TotalBonusPoints)
+        n_replicates : int
+            number of bootstrap replicates. The default is 1000.
+        n_workers : int
+            number of processes to split the replicates on. The default is 1 (runs in process), None uses all cores.
+            With more than one process the calling script must start the run under if __name__ == '__main__': (windows starts
+            the workers by importing the script again)
+        seed : int
+            seed for reproducible replicates. The default is None.
+
+        Returns
+        -------
+        pandas DF with one row per school and model holding the bootstrap interval of TotalPointsEarned and
+        the probability of each letter grade
+
+        '''
+        payload, rows = self.prepare_payload(staticfile, summary)
+
+        ##------------------- split the replicates between the workers, each gets an independent random stream
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        n_workers = max(1, min(n_workers, n_replicates))
+        chunks = [len(i) for i in np.array_split(np.arange(n_replicates), n_workers)]
+        seeds = np.random.SeedSequence(seed).spawn(n_workers)
+
+        if n_workers == 1:
+            results = [run_replicates(payload, chunks[0], seeds[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = [executor.submit(run_replicates, payload, n, s) for n, s in zip(chunks, seeds)]
+                results = [f.result() for f in futures]
+        earned = np.concatenate([r[0] for r in results], axis=0)
+        eligible = np.concatenate([r[1] for r in results], axis=0)
+
+        ##------------------- grade every replicate and get grade probabilities per school
+        codes = self.get_grade_codes(earned, eligible, rows.Model.to_numpy())
+        for code, grade in enumerate(self.grade_labels):
+            rows['Prob'+grade] = (codes==code).mean(axis=0)
+        prob_cols = ['Prob'+grade for grade in self.grade_labels]
+        rows['MostLikelyGrade'] = np.array(self.grade_labels)[rows[prob_cols].to_numpy().argmax(axis=1)]
+
+        with np.errstate(all='ignore'):
+            rows['BootstrapMean'] = np.nanmean(earned, axis=0)
+            rows['BootstrapLower'] = np.nanpercentile(earned, 2.5, axis=0)
+            rows['BootstrapUpper'] = np.nanpercentile(earned, 97.5, axis=0)
+        rows['Replicates'] = n_replicates
+
+        rows = self.round_numeric_cols(rows, sigfigs=4)[0]
+        return rows
+
+    def prepare_payload(self, staticfile, summary):
+        ## one row per student per unit with everything needed to total points
+        students = self.get_student_data(staticfile)
+        ## sort by unit so each unit's students are one contiguous block
+        students = students.sort_values(self.unit_cols).reset_index(drop=True)
+        units = students[self.unit_cols].drop_duplicates().reset_index(drop=True)
+        units['Unit'] = np.arange(len(units))
+        unit_of_row = pd.merge(students[self.unit_cols], units, on=self.unit_cols, how='left')['Unit'].to_numpy(dtype=np.int64)
+        unit_size = np.bincount(unit_of_row, minlength=len(units))
+        unit_start = np.concatenate([[0], np.cumsum(unit_size)[:-1]])
+
+        ##------------------- unit level constants
+        units = pd.merge(units, self.get_percent_multiplier(staticfile), on=self.unit_cols, how='left')
+        weights = units.Model.map(self.models_component_weights)
+        units['ProfWeight'] = weights.map(lambda x: x.get('Proficiency', np.nan) if isinstance(x, dict) else np.nan)
+        units['GrowthHalfWeight'] = units.Model.map(self.growth.growth_half_weights)
+
+        payload = {'unit_of_row': unit_of_row
+                   ,'unit_start': unit_start
+                   ,'unit_size': unit_size
+                   ,'values': students[self.student_cols].to_numpy(dtype=float)
+                   ,'multiplier': units.PercentMultiplier.to_numpy(dtype=float)
+                   ,'prof_weight': units.ProfWeight.to_numpy(dtype=float)
+                   ,'growth_half_weight': units.GrowthHalfWeight.to_numpy(dtype=float)
+                   ,'student_cols': self.student_cols
+                   ,'growth_subjects': list(self.growth_subjects)
+                   ,'n_count': self.n_count}
+
+        ## statewide EL stats from the observed (not resampled) data
+        observed = sum_units(payload, np.arange(len(unit_of_row)))
+        units = pd.concat([units, self.get_el_state_stats(units, observed)], axis=1)
+        for col in ['ELProfMean', 'ELProfSTD', 'ELGrowthMean', 'ELGrowthSTD']:
+            payload[col] = units[col].to_numpy(dtype=float)
+
+        ##------------------- summary rows that get a grade, and the points held fixed
+        rows = summary[summary.Model.isin(list(self.cuts.keys()))].copy()
+        rows = self.columns_to_numeric(rows, ['EntityID', 'TotalPointSum', 'TotalPointsEligible', 'TotalBonusPoints'] + self.bootstrap_components)
+        unit_keys = units[self.unit_cols+['Unit']].rename({'SchoolCode':'EntityID'}, axis=1)
+        rows = pd.merge(rows, unit_keys, on=['EntityID', 'Model'], how='left')
+        payload['row_unit'] = rows.Unit.fillna(-1).to_numpy(dtype=np.int64)
+        other_points = rows.TotalPointSum.fillna(0).to_numpy(dtype=float)
+        other_eligible = rows.TotalPointsEligible.fillna(0).to_numpy(dtype=float)
+        payload['observed'] = {}
+        payload['weights'] = {}
+        for component in self.bootstrap_components:
+            weight = rows.Model.map(lambda m: self.models_component_weights[m].get(component, np.nan)).to_numpy(dtype=float)
+            obs = rows[component].to_numpy(dtype=float)
+            ## take the reported component out of the totals, it is added back from each replicate
+            other_points = other_points - np.nan_to_num(obs)
+            other_eligible = other_eligible - np.where(np.isnan(obs), 0, np.nan_to_num(weight))
+            payload['observed'][component] = obs
+            payload['weights'][component] = weight
+        payload['other_points'] = other_points
+        payload['other_eligible'] = other_eligible
+        payload['bonus'] = rows.TotalBonusPoints.fillna(0).to_numpy(dtype=float)
+
+        rows = rows[['EntityID', 'Model', 'TotalPointsEligible', 'PercentageEarned', 'TotalPointsEarned']].copy()
+        return payload, rows
+
+    def get_student_data(self, staticfile):
+        cols = ['SchoolCode', 'Model', 'SAISID']
+        sf = staticfile[staticfile.ADMIntegrity==1].copy()
+
+        ##------------------- proficiency (grades corrected by cohort, models by alternative status)
+        prof = self.correct_high_school_grades(sf)
+        prof = prof[prof.FiscalYear==self.fiscal_year].copy()
+        prof['Model'] = self.assign_models(prof.StudentGrade, {0:self.proficiency_grade_map['Trad'], 1:self.proficiency_grade_map['Alt']}, keys=(prof.Alternative==1).astype(int))
+        prof = prof[prof.Model.notnull()]
+        rael_ela = (prof.Subject=='ELA') & (prof.RAEL.isin([1,2]))
+        tested = (prof.FAY>0) & (prof.Subject.isin(['Math', 'ELA'])) & (prof.Performance.notnull()) & (~rael_ela)
+        prof = prof.assign(ProfNum = prof.Performance.map(self.proficiency_weights).where(tested, 0)
+                           ,ProfTests = tested.astype(int)
+                           ,ProfFAY = ((prof.FAY>0) & (~rael_ela)).astype(int))
+        prof = prof.groupby(cols).agg(ProfNum=('ProfNum', 'sum'), ProfTests=('ProfTests', 'sum'), ProfFAY=('ProfFAY', 'max')).reset_index()
+
+        ##------------------- growth (same filters as GROWTH)
+        gr = sf[(sf.FAY>0) & (sf.Subject.isin(self.growth_subjects)) & (sf.SGP_CCR_Category.notnull())].copy()
+        gr.loc[gr.StudentGrade==self.act_grade, 'StudentGrade'] = 111
+        gr.loc[gr.Cohort==self.cy_act_cohort, 'StudentGrade'] = self.act_grade
+        gr['Model'] = self.assign_models(gr.StudentGrade, {model:self.growth_grade_map[model] for model in self.growth.growth_half_weights.keys()})
+        growth = gr[gr.Model.notnull()].copy()
+        bands = 'PY' + growth.PYPerformance.map(self.growth.prior_perf_map) + 'CY' + growth.SGP_CCR_Category.map(self.growth.summmary_growth_category)
+        growth['BandWeight'] = bands.map(self.growth_band_weights)
+        for subject in self.growth_subjects:
+            mask = (growth.Subject==subject) & (bands.notnull())
+            growth['GrowthBW'+subject] = growth.BandWeight.where(mask, 0).fillna(0)
+            growth['GrowthN'+subject] = mask.astype(int)
+        growth_cols = ['GrowthBW'+subject for subject in self.growth_subjects] + ['GrowthN'+subject for subject in self.growth_subjects]
+        growth = growth.groupby(cols)[growth_cols].sum().reset_index()
+        growth['GrowthStudent'] = 1
+
+        ##------------------- EL (one record per student per school, same as EL)
+        el = sf[(sf.EL==1) & (sf.ELFAY==1)].copy()
+        el.sort_values(['SAISID', 'SchoolCode', 'StudentGrade', 'ELProf'], ascending=False, inplace=True)
+        el = el[~el.duplicated(['SAISID', 'SchoolCode'])]
+        el = el.assign(Model=self.assign_models(el.StudentGrade, self.el_grade_map))
+        el_data = el[el.Model.notnull()].copy()
+        alt_mask = el_data.Alternative==1
+        el_data.loc[alt_mask, 'Model'] = 'Alt ' + el_data.loc[alt_mask, 'Model']
+        el_data = el_data.assign(ELTested = el_data.ELTested.fillna(0)
+                                 ,ELReclass = (el_data.ELProf==4).astype(int)
+                                 ,ELHasGrowth = el_data.ELGrowth.notnull().astype(int)
+                                 ,ELGrowth = el_data.ELGrowth.fillna(0))
+        el_data = el_data[cols + ['ELTested', 'ELReclass', 'ELGrowth', 'ELHasGrowth']]
+
+        ##------------------- combine to one row per student per unit
+        students = pd.merge(prof, growth, on=cols, how='outer').merge(el_data, on=cols, how='outer')
+        students[self.student_cols] = students[self.student_cols].fillna(0)
+        return students
+
+    def get_percent_multiplier(self, staticfile):
+        ## 95% tested multiplier per unit as reported by proficiency, held fixed in every replicate
+        sf = self.correct_high_school_grades(staticfile)
+        sf = sf[(sf.FiscalYear==self.fiscal_year) & (sf.ADMIntegrity==1) & (sf.ELAMathWindow==1)].copy()
+        sf['Model'] = self.assign_models(sf.StudentGrade, {0:self.proficiency_grade_map['Trad'], 1:self.proficiency_grade_map['Alt']}, keys=(sf.Alternative==1).astype(int))
+        sf = sf[sf.Model.notnull()]
+        enrolled = sf.groupby(self.unit_cols).SAISID.nunique()
+        tested = sf[(sf.Performance.notnull()) & (sf.Subject.isin(['Math', 'ELA']))].groupby(self.unit_cols).SAISID.count() / 2
+        multiplier = (tested / (self.percent_tested_expected/100 * enrolled)).rename('PercentMultiplier')
+        return multiplier.reset_index()
+
+    def get_el_state_stats(self, units, observed):
+        ## statewide mean and std per model with outliers removed (same as EL)
+        def state_stats(pct, counts):
+            stats = pd.DataFrame(index=units.index, columns=['Mean', 'STD'], dtype=float)
+            for m in units.Model.unique():
+                model_mask = (units.Model==m).to_numpy()
+                dist = pct[model_mask & (pct>0) & (counts>=self.n_count)]
+                if len(dist) == 0:
+                    continue
+                q1 = np.percentile(dist, 25, interpolation = 'midpoint')
+                q3 = np.percentile(dist, 75, interpolation = 'midpoint')
+                iqr_out = (q3 - q1) * 1.5
+                no_outliers = pd.Series(dist[(dist > q1-iqr_out) & (dist < q3+iqr_out)])
+                stats.loc[model_mask, 'Mean'] = no_outliers.mean()
+                stats.loc[model_mask, 'STD'] = no_outliers.std()
+            return stats
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            prof = state_stats(observed['ELReclass']/observed['ELTested'], observed['ELTested'])
+            growth = state_stats(observed['ELGrowth']/observed['ELHasGrowth'], observed['ELHasGrowth'])
+        return pd.DataFrame({'ELProfMean': prof.Mean, 'ELProfSTD': prof.STD
+                             ,'ELGrowthMean': growth.Mean, 'ELGrowthSTD': growth.STD})
+
+    def get_grade_codes(self, earned, eligible, models):
+        ## grade codes (0=A ... 4=F, 5=NR) for every replicate and summary row
+        codes = np.full(earned.shape, len(self.grade_labels)-1, dtype=np.int8)
+        for model, cuts in self.cuts.items():
+            model_mask = models==model
+            ## lower bounds of D, C, B, A in ascending order
+            bounds = np.sort([cuts[grade][1] for grade in self.grade_labels[:4]])
+            model_earned = earned[:, model_mask]
+            model_codes = 4 - np.searchsorted(bounds, np.nan_to_num(model_earned, nan=-1), side='right')
+            not_rated = np.isnan(model_earned) | ~(eligible[:, model_mask] >= self.threshold[model])
+            codes[:, model_mask] = np.where(not_rated, len(self.grade_labels)-1, model_codes)
+        return codes
+
+
+# #%% bootstrap grades from ADEConnect results
+# from ADEConnect import ADEConnect
+# ade = ADEConnect(2023, run='PrelimV6')
+# ade.retrieve_results()
+# grades = ade.bootstrap_grades(n_replicates=1000, seed=2023)
+# ## on several processes, with the script run as a whole under a main guard
+# if __name__ == '__main__':
+#     grades = ade.bootstrap_grades(n_replicates=1000, n_workers=8, seed=2023)
@@ -30,41 +30,29 @@ class CCRI(COMPONENTS):
 
     def calculate_component(self, trad, alt, schooltype):
         #====================== Some Data Wrangling ===========================
+        ## stack both sources once, tagged by the school type they report for
+        data = pd.concat([trad.assign(Alternative=False), alt.assign(Alternative=True)], axis=0, ignore_index=True)
+        #change col names and convert cols to numeric
+        data = data.rename(self.naming_convention, axis=1)
+        data = self.columns_to_numeric(data, self.numeric_cols)
         if self.include_late_submissions:
-            trad, alt= self.update_ccri_raw_data(trad, alt)
-            
-        data = pd.DataFrame()
-        for df, schooltypes in zip([trad, alt], [0, 1]):
-            #change col names
-            df_temp = df.rename(self.naming_convention, axis=1).copy()
-            #add bonus point col for alt schools and fill it with zeros (they don't get bonus points)
-            if schooltypes ==1:
-                df_temp[self.naming_convention['BonusPoint']] = np.nan
-            #convert cols to numeric
-            df_temp = self.columns_to_numeric(df_temp, self.numeric_cols)
-            
-            #keep relevant cols only
-            df_temp = df_temp[list(self.naming_convention.values())]
-            # add type indicator
-            if schooltypes ==1:
-                mask = schooltype.Alternative==True
-                df_temp = pd.merge(df_temp, schooltype.loc[mask,['SchoolCode', 'Alternative']], left_on ='EntityID', right_on='SchoolCode')
-                df_temp['Model'] ='Alt 9-12'
-            else:
-                mask = schooltype.Alternative==False
-                df_temp = pd.merge(df_temp, schooltype.loc[mask,['SchoolCode', 'Alternative']], left_on ='EntityID', right_on='SchoolCode')
-                df_temp['Model'] = '9-12'
-            
-            #convert all missing eligibility (those who did not submit) to eligible
-            df_temp.loc[df_temp.Eligible.isnull(), 'Eligible'] = True
-            # convert eligibility col to bool
-            df_temp['Eligible'] = df_temp.Eligible.astype('bool')
-            #keep current fiscalyear data only
-            df_temp = df_temp[df_temp.FiscalYear==self.fiscal_year].copy()
-            #drop fiscalyear
-            df_temp.drop('FiscalYear', inplace=True, axis=1)
-            #concat to data
-            data = pd.concat([data, df_temp], axis=0)
+            data = self.add_late_ccri_submissions(data)
+        
+        #keep relevant cols only
+        data = data[list(self.naming_convention.values()) + ['Alternative']].copy()
+        #alt schools don't get bonus points
+        data.loc[data.Alternative, self.naming_convention['BonusPoint']] = np.nan
+        # keep schools whose type matches the source they reported in (one join for both sources), schools with no Alternative flag are dropped
+        alternative = schooltype.Alternative==True
+        known_type = alternative | (schooltype.Alternative==False)
+        school_types = pd.DataFrame({'SchoolCode':schooltype.SchoolCode[known_type], 'Alternative':alternative[known_type]})
+        data = pd.merge(data, school_types, left_on=['EntityID', 'Alternative'], right_on=['SchoolCode', 'Alternative'])
+        data['Model'] = np.where(data.Alternative, self.str_alt_912, self.str_912)
+        
+        #convert all missing eligibility (those who did not submit) to eligible and convert eligibility col to bool
+        data['Eligible'] = data.Eligible.fillna(True).astype('bool')
+        #keep current fiscalyear data only
+        data = data[data.FiscalYear==self.fiscal_year].drop('FiscalYear', axis=1)
         #======================================================================
 
         ##-----------------------------------------------------get summary cols
@@ -75,10 +63,10 @@ class CCRI(COMPONENTS):
         didnt_submit_mask = (data.Eligible==True) & (data.CollegeandCareerReady_SRSS.isnull())
         data.loc[didnt_submit_mask, 'CollegeandCareerReady_SRSS'] = 0
         
-        ##cap points
-        for model, cap in self.points_cap.items():
-            mask = (data.Model.str.lower() == model.lower()) & (data.CollegeandCareerReady_SRSS > cap)
-            data.loc[mask, 'CollegeandCareerReady_SRSS'] = cap
+        ##cap points at the weight of the model
+        cap = data.Model.str.lower().map({model.lower():cap for model, cap in self.points_cap.items()})
+        mask = data.CollegeandCareerReady_SRSS > cap
+        data.loc[mask, 'CollegeandCareerReady_SRSS'] = cap[mask]
 
         
         ##make SelfReportCCRPoints col
@@ -90,66 +78,38 @@ class CCRI(COMPONENTS):
         return data
         
     def add_suffices(self, data):
-        ## add suffices
-        trad_cols = ['CCRIBonusPoint']
-        extra_cols = ['Eligible', 'Alternative']
-        new_names=[]
-        for col in data.columns:
-            added=0
-            for tcol in trad_cols:
-                if tcol.lower() in col.lower():
-                    new_names.append(col+'_Trad')
-                    added =1
-                    break
-            #check if they are in extra col list
-            for ecol in extra_cols:
-                if ecol.lower() in col.lower():
-                    new_names.append(col+'_Extra')
-                    added =1
-                    break
-            #check if name has been added already, if so skip to next iteration
-            if added ==1:
-                continue
-            else:
-                new_names.append(col+'_All')
-        ##assign names to data
-        data.columns = new_names
+        ## add suffices: columns containing a trad name get _Trad, then those containing an extra name get _Extra, all others _All
+        suffix_spec = {'_Trad':['CCRIBonusPoint'], '_Extra':['Eligible', 'Alternative']}
+        suffixes = pd.Series('_All', index=data.columns)
+        for suffix, names in reversed(suffix_spec.items()):
+            suffixes[data.columns.str.lower().str.contains('|'.join(names).lower())] = suffix
+        data.columns = data.columns + suffixes.to_numpy()
         return data
     
+    def get_input_fingerprint(self):
+        ## late CCRI submissions are read inside calculate_component
+        if not self.include_late_submissions:
+            return ''
+        return self.get_frame_fingerprint(self.fetch_late_ccri_submissions())
+    
     def fetch_late_ccri_submissions(self):
-        db = DATABASE(fiscal_year=self.fiscal_year, database='AccountabilityArchive', schema='dbo', run='', server_name='AACTASTPDDBVM02')
-        sql = f"""Select [FiscalYear]
-                  ,[SchoolID]
-                  ,[IsEligible]
-                  ,[Points]
-                  ,[BonusPoint]
-                  ,[StateModel]
-                  ,[CreatedBy]
-                  ,[LastModifiedByEmail]
-                  ,[LastModifiedDate]
-                  FROM [AccountabilityArchive].[dbo].[LateLateSelfReportedData]
-                 Where FiscalYear={self.fiscal_year} and type='CCRI'"""
-        late_ccri = db.read_sql_query(sql=sql)
-        return late_ccri
+        late_ccri = self.get_late_submissions('CCRI')
+        return late_ccri[['FiscalYear', 'SchoolID', 'IsEligible', 'Points', 'BonusPoint', 'StateModel', 'CreatedBy', 'LastModifiedByEmail', 'LastModifiedDate']]
     
-    def update_ccri_raw_data(self, trad, alt):
-        
-        late_ccri = self.fetch_late_ccri_submissions()
-        late_ccri['IsEligible'] = late_ccri['IsEligible'].apply(lambda x: True if x==1 else False)
-        
-        late_trad = late_ccri[late_ccri.StateModel.str.contains('trad', regex=True, case=False)].copy()
-        late_alt = late_ccri[late_ccri.StateModel.str.contains('alt', regex=True, case=False)].copy()
+    def add_late_ccri_submissions(self, data):
+        ## data is the stacked trad/alt table after renaming, the StateModel of a late submission decides which of the two it replaces
+        late_ccri = self.fetch_late_ccri_submissions().rename(self.naming_convention, axis=1)
+        late_ccri['Alternative'] = late_ccri.StateModel.str.contains('alt', case=False, na=False)
+        late_ccri = late_ccri[late_ccri.Alternative | late_ccri.StateModel.str.contains('trad', case=False, na=False)]
         
         #delete the late submission value from original table and add new data
-        trad = trad[~trad.SchoolID.isin(late_trad.SchoolID)].copy()
-        trad = pd.concat([trad, late_trad], axis=0)
-        
-        alt = alt[~alt.SchoolID.isin(late_alt.SchoolID)].copy()
-        alt = pd.concat([alt, late_alt], axis=0)
-        return trad, alt
+        keys = ['EntityID', 'Alternative']
+        replaced = pd.MultiIndex.from_frame(data[keys]).isin(pd.MultiIndex.from_frame(late_ccri[keys]))
+        data = pd.concat([data[~replaced], late_ccri], axis=0, ignore_index=True)
+        return data
                     
             
-self = CCRI(2023, 'prelimv6')
+# self = CCRI(2023, 'prelimv6')
 
 #%% bring in data
 # fy = 2023
@@ -5,7 +5,18 @@ Created on Thu Feb 16 15:07:51 2023
 @author: yfahmy
 """
 from datetime import date
+from HISTORY import HISTORY
+from DATABASE import DATABASE
 import pandas as pd
+import numpy as np
+import hashlib
+import json
+
+## lookup arrays of assign_models, built once per grade map
+_model_lookups = {}
+
+## late self reported submissions of every type, read once per run (cleared by clear_late_submissions) and shared by GTG and CCRI
+_late_submissions = {}
 
 
 class COMPONENTS:
@@ -45,11 +56,15 @@ class COMPONENTS:
         self.act_aspire_grade = act_aspire_grade
         self.cy_grad_cohort = self.fiscal_year-1
         self.include_late_submissions = include_late_submissions
+        self.late_submission_types = ['OTG', 'CE', 'CCRI']
         
         #set run type
         self.run = run.capitalize()
         # print(F'Run Type set to----> {self.run}')
         
+        ## prior year tables are read once per run through the historical results store
+        self.history = HISTORY(fiscal_year=self.fiscal_year, run=self.run)
+        
         ##define server name
         self.server_name = 'AACTASTPDDBVM02'
         
@@ -181,6 +196,26 @@ class COMPONENTS:
     def calculate_component(self):
         pass
     
+    def get_config_fingerprint(self):
+        ## hash of the configuration attributes (weights, maps, n_count etc.), any change in them changes the hash
+        config_types = (str, int, float, bool, list, tuple, dict, type(None))
+        config = {name:value for name, value in vars(self).items() if isinstance(value, config_types)}
+        config['Module'] = type(self).__name__
+        return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+    
+    def get_input_fingerprint(self):
+        '''
+        Hash of the data calculate_component reads from the server itself (not passed in as arguments).
+        '' if it reads nothing, None if its reads are not fingerprinted, then its results are never reused from the results cache.
+        '''
+        return ''
+    
+    def get_frame_fingerprint(self, df):
+        ## content hash of a df (values, column names and dtypes), independent of the index
+        data_hash = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        header = '|'.join([f'{col}:{dtype}' for col, dtype in df.dtypes.items()])
+        return hashlib.sha256(data_hash.tobytes() + header.encode()).hexdigest()
+    
     def columns_to_numeric(self, df, columns):
         ## confirm numeric cols are numeric
         t = ['float', 'int']
@@ -217,14 +252,168 @@ class COMPONENTS:
         return df
     
 
+    def build_wide_table(self, df, index, columns, names, column_order=None):
+        '''
+        Long to wide without a MultiIndex round trip: the values of every (index, columns) record are written straight into a
+        preallocated block of the wide table, and the columns are named from a spec instead of renaming MultiIndex tuples.
+
+        Parameters
+        ----------
+        df : pandas.DataFrame
+            DESCRIPTION: long data, one record per index and columns
+        index : list of str
+            DESCRIPTION: columns identifying a row of the wide table (sorted like pd.pivot)
+        columns : list of str
+            DESCRIPTION: columns whose values name the wide columns
+        names : dict
+            DESCRIPTION: {value column: name template}, templates use the columns, e.g. {'NumGraduates': '{Subgroup}NG'}
+        column_order : list, The default is None
+            DESCRIPTION: final order of the named columns (missing ones are added empty), value then sorted key order if None
+
+        Returns
+        -------
+        pandas.DataFrame with the index columns followed by the named columns
+        '''
+        index, columns = list(index), list(columns)
+        if df.duplicated(index + columns).any():
+            raise ValueError('Index contains duplicate entries, cannot reshape')
+        row_codes = df.groupby(index, sort=True, dropna=False).ngroup().to_numpy()
+        key_codes = df.groupby(columns, sort=True, dropna=False).ngroup().to_numpy()
+        rows = df[index].iloc[np.unique(row_codes, return_index=True)[1]]
+        keys = df[columns].iloc[np.unique(key_codes, return_index=True)[1]]
+        key_names = [dict(zip(columns, key)) for key in keys.itertuples(index=False, name=None)]
+
+        wide = {column: rows[column].to_numpy() for column in index}
+        for value, template in names.items():
+            dtype = float if pd.api.types.is_numeric_dtype(df[value]) and not pd.api.types.is_bool_dtype(df[value]) else object
+            block = np.full((len(rows), len(keys)), np.nan, dtype=dtype)
+            block[row_codes, key_codes] = df[value].to_numpy()
+            for position, key in enumerate(key_names):
+                wide[template.format(**key)] = block[:, position]
+        wide = pd.DataFrame(wide)
+        if column_order is not None:
+            wide = wide.reindex(columns=index + list(column_order))
+        return wide
+
+    def get_model_lookup(self, key_grade_map):
+        '''
+        Builds (once per map) the lookup array used by assign_models.
+
+        Parameters
+        ----------
+        key_grade_map : dict
+            DESCRIPTION: {key: {model: [grades]}}, e.g. {0: trad grade map, 1: alt grade map} keyed by Alternative
+
+        Returns
+        -------
+        tuple of (keys index, lowest grade, models array (last item is missing), lookup array of shape (keys, grades) holding model positions)
+        '''
+        cache_key = json.dumps(key_grade_map, default=str)
+        if cache_key not in _model_lookups:
+            keys = pd.Index(list(key_grade_map.keys()))
+            models = list(dict.fromkeys([model for grade_map in key_grade_map.values() for model in grade_map.keys()]))
+            grades = [grade for grade_map in key_grade_map.values() for grade_list in grade_map.values() for grade in grade_list]
+            min_grade = int(min(grades))
+            lookup = np.full((len(keys), int(max(grades)) - min_grade + 1), -1, dtype=np.int16)
+            for key_position, grade_map in enumerate(key_grade_map.values()):
+                for model, grade_list in grade_map.items():
+                    positions = np.array(grade_list, dtype=int) - min_grade
+                    ## a grade can only belong to one model for the same key
+                    overlap = lookup[key_position, positions] >= 0
+                    if overlap.any():
+                        raise ValueError(f'Grades {list(np.array(grade_list)[overlap])} are assigned to more than one model in {key_grade_map}')
+                    lookup[key_position, positions] = models.index(model)
+            _model_lookups[cache_key] = (keys, min_grade, np.array(models + [np.nan], dtype=object), lookup)
+        return _model_lookups[cache_key]
+
+    def assign_models(self, grades, key_grade_map, keys=None):
+        '''
+        Assigns the model of every record with one integer-indexed gather on the (key, grade) lookup array instead of one scan per model.
+
+        Parameters
+        ----------
+        grades : pandas.Series
+            DESCRIPTION: student grades
+        key_grade_map : dict
+            DESCRIPTION: {key: {model: [grades]}}, or {model: [grades]} when keys is None
+        keys : pandas.Series, The default is None
+            DESCRIPTION: key of every record (Alternative, SchoolTypeF...), same index as grades
+
+        Returns
+        -------
+        pandas.Series of models, missing where the grade is not in the map of the record's key
+        '''
+        if keys is None:
+            key_grade_map = {0: key_grade_map}
+            key_positions = np.zeros(len(grades), dtype=int)
+        key_index, min_grade, models, lookup = self.get_model_lookup(key_grade_map)
+        if keys is not None:
+            key_positions = key_index.get_indexer(keys)
+
+        grade_values = pd.to_numeric(grades, errors='coerce').to_numpy(dtype=float)
+        grade_positions = grade_values - min_grade
+        valid = (key_positions >= 0) & (grade_positions >= 0) & (grade_positions < lookup.shape[1]) & (grade_values == np.floor(grade_values))
+        grade_positions = np.where(valid, grade_positions, 0).astype(int)
+        model_positions = np.where(valid, lookup[np.where(valid, key_positions, 0), grade_positions], -1)
+        return pd.Series(models[model_positions], index=grades.index)
+
+    def clear_late_submissions(self):
+        ## late submissions change on the server between runs, they are read again by the next get_late_submissions
+        _late_submissions.pop(self.fiscal_year, None)
+    
+    def get_late_submissions(self, submission_type, school_codes=None):
+        '''
+        Late self reported submissions of one type. All types are read from LateLateSelfReportedData in one parameterized query
+        the first time a component asks for them, then typed frames are handed out from memory for the rest of the run.
+
+        Parameters
+        ----------
+        submission_type : str
+            DESCRIPTION: one of late_submission_types ('OTG', 'CE' or 'CCRI'), case insensitive
+        school_codes : list, The default is None
+            DESCRIPTION: schools to keep (joined in memory), all schools if None
+
+        Returns
+        -------
+        pandas DataFrame with FiscalYear, SchoolID, Type, IsEligible (bool), n_stu_elig, n_stu_met, Points, BonusPoint, StateModel, CreatedBy, LastModifiedByEmail, LastModifiedDate
+        '''
+        if self.fiscal_year not in _late_submissions:
+            db = DATABASE(fiscal_year=self.fiscal_year, database='AccountabilityArchive', schema='dbo', run='', server_name=self.server_name)
+            sql = f"""Select [FiscalYear]
+                      ,[SchoolID]
+                      ,UPPER([Type]) AS Type
+                      ,[IsEligible]
+                      ,n_stu_elig
+                      ,n_stu_met
+                      ,[Points]
+                      ,[BonusPoint]
+                      ,[StateModel]
+                      ,[CreatedBy]
+                      ,[LastModifiedByEmail]
+                      ,[LastModifiedDate]
+                      FROM [AccountabilityArchive].[dbo].[LateLateSelfReportedData]
+                     Where FiscalYear = ? and type IN ({', '.join(['?']*len(self.late_submission_types))})"""
+            late = db.read_sql_query(sql=sql, params=[self.fiscal_year] + self.late_submission_types)
+            ## type once here so every consumer gets the same dtypes
+            late = self.columns_to_numeric(late, ['FiscalYear', 'SchoolID', 'n_stu_elig', 'n_stu_met', 'Points', 'BonusPoint'])
+            late['IsEligible'] = late['IsEligible'] == 1
+            _late_submissions[self.fiscal_year] = late
+
+        late = _late_submissions[self.fiscal_year]
+        late = late[late.Type == submission_type.upper()]
+        if school_codes is not None:
+            late = late[late.SchoolID.isin(pd.to_numeric(pd.Series(list(school_codes)), errors='coerce'))]
+        return late.reset_index(drop=True)
+
     """
     This function adjusts the StudentGrade column of the StaticFile. It re-assigns grades 9-12 based on Cohort. 
         It does not change any StudentGrade values that are less than 9 as these should not have a Cohort.
     """
     def correct_high_school_grades(self, static_file:pd.DataFrame):
         sf = static_file.copy() # don't overwrite the dataframe provided
-        for i, yr in enumerate(range(self.fiscal_year+3, self.fiscal_year-1,-1)):
-            sf.loc[sf["StudentGrade"]==i+9, "StudentGrade"] = 111
-            sf.loc[(sf["Cohort"]==yr) & (sf["StudentGrade"]>=9), "StudentGrade"] = i+9
+        # grades 9-12 become 111 unless the student is in one of the four current cohorts, which sets the grade (cohort fiscal_year+3 is grade 9)
+        in_cohort = (sf["StudentGrade"]>=9) & sf["Cohort"].between(self.fiscal_year, self.fiscal_year+3)
+        sf.loc[sf["StudentGrade"].isin([9, 10, 11, 12]), "StudentGrade"] = 111
+        sf.loc[in_cohort, "StudentGrade"] = self.fiscal_year + 12 - sf.loc[in_cohort, "Cohort"]
         return sf
         
\ No newline at end of file
@@ -9,11 +9,7 @@ from DATABASE import DATABASE
 from COMPONENTS import COMPONENTS
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import plotly.graph_objects as go
-import plotly.express as px
-import plotly.io as pio
-from dash.dash_table.Format import Format, Scheme, Sign
+## matplotlib and plotly are only imported by the methods that draw (they are slow to import and not needed to calculate)
 
 
 class CutScores(COMPONENTS):
@@ -61,15 +57,16 @@ class CutScores(COMPONENTS):
                               'C': [79.99, 70],
                               'D': [69.99, 60],
                               'F': [59.99, 0]}
-        
+        ## letter grades in order, the position in this list is the grade code used in the cuts search (0=A ... 4=F)
+        self.grade_labels = ['A', 'B', 'C', 'D', 'F']
+        ## holds the cleaned cy data and py grades once loaded for the cuts search
+        self.search_data = None
+
         
     def calculate_component(self, staticfile_raw, schooltype):
-        data, schooltype = self.get_data()
-        data_22 = self.get_data(py_data=True)
-        
-        data_cln, schooltype = self.process_cy_data(data, schooltype)
-        grades_py = self.process_py_data(data_22)
-        
+        ## summary tables are read and cleaned once and shared with the cuts search
+        data_cln, grades_py = self.load_search_data()
+
         # #------------------- Assign grades based on SD cuts
         sd_cuts = self.get_sd_cuts(data_cln)
         grades_sd_cuts = self.assign_grades(data_cln, sd_cuts)
@@ -100,6 +97,7 @@ class CutScores(COMPONENTS):
         grades_22_23 = self.generate_parrallel_categories( grades_norm_cuts, grades_py_cuts, grades_sd_cuts, grades_py)
             
     def generate_cuts_table(self, sd_cuts, norm_cuts):
+        import plotly.graph_objects as go
         #put cuts in a plotly table format
         cuts_all = {}
         for m in norm_cuts.keys():
@@ -133,6 +131,8 @@ class CutScores(COMPONENTS):
         return table
     
     def generate_cuts_counts(self, long_data):
+        import matplotlib.pyplot as plt
+        import plotly.express as px
         # # Generate a plot to compare cuts distributions accross the 3 methods using ****** PLOTLY
         cuts_dist_overlayed={}
         for m in long_data.keys():
@@ -162,6 +162,8 @@ class CutScores(COMPONENTS):
         return cuts_dist_overlayed
             
     def generate_faceted_cuts_counts(self, long_data):
+        import matplotlib.pyplot as plt
+        import plotly.express as px
         # # Generate a plot to compare cuts distributions accross the 3 methods using ****** PLOTLY
         cuts_side_by_side={}
         for m in long_data.keys():
@@ -193,6 +195,7 @@ class CutScores(COMPONENTS):
         return cuts_side_by_side
             
     def generate_differential_analysis(self, long_data):
+        import plotly.express as px
         ##------------------------------------calculate the differential data
         diff_data={}
         for m, df in long_data.items():
@@ -295,6 +298,7 @@ class CutScores(COMPONENTS):
         return lolipop
     
     def generate_parrallel_categories(self, grades_norm_cuts, grades_py_cuts, grades_sd_cuts, grades_py):  
+        import plotly.express as px
         #merge 22 to 2023 data
         combined = {}
         for i in grades_sd_cuts.keys():
@@ -406,7 +410,11 @@ class CutScores(COMPONENTS):
         else:
             fiscal_year = self.fiscal_year
         
-        db = DATABASE(fiscal_year=fiscal_year, database='REDATA_UAT', schema='grading', run=self.run, server_name='AACTASTPDDBVM02')
+        if py_data:
+            ## last year's summaries come from the historical results store
+            db = self.history.connection(fiscal_year=fiscal_year, database='REDATA_UAT', schema='grading', run=self.run)
+        else:
+            db = DATABASE(fiscal_year=fiscal_year, database='REDATA_UAT', schema='grading', run=self.run, server_name='AACTASTPDDBVM02')
         #setup a dict with model-table name
         sources = {'Alternative':'ALTSummary9Thru12'
                   ,'912':'Summary9Thru12'
@@ -453,6 +461,7 @@ class CutScores(COMPONENTS):
         return cutscores
     
     def plot_distributions(self, data_cln, *cuts):
+        import matplotlib.pyplot as plt
         for m,df in data_cln.items():
             df.PercentageEarned.plot.hist(title=m, bins=40)
             for j in cuts:
@@ -470,4 +479,148 @@ class CutScores(COMPONENTS):
             for grade, bounds in cuts[m].items():
                 df.loc[df.PercentageEarned.between(bounds[1], bounds[0]), 'Grades'] = grade
             output[m] = df
-        return output
\ No newline at end of file
+        return output    
+    #============================================================================ Cut scores search
+    def load_search_data(self, reload=False):
+        ## read and clean the summary tables only once, every candidate cut is evaluated against the same data
+        if (self.search_data is None) or reload:
+            data, schooltype = self.get_data()
+            data_py = self.get_data(py_data=True)
+            data_cln, schooltype = self.process_cy_data(data, schooltype)
+            grades_py = self.process_py_data(data_py)
+            self.search_data = (data_cln, grades_py)
+        return self.search_data
+    
+    def build_cut_grid(self, a_lower, b_lower, c_lower, d_lower):
+        '''
+        Parameters
+        ----------
+        a_lower, b_lower, c_lower, d_lower : array like
+            candidate lower bounds of PercentageEarned for A, B, C and D. Anything below d_lower is an F
+
+        Returns
+        -------
+        numpy array of shape (n_candidates, 4) with every strictly descending combination of the bounds
+
+        '''
+        grid = np.array(np.meshgrid(a_lower, b_lower, c_lower, d_lower, indexing='ij'), dtype=float).reshape(4, -1).T
+        descending = (np.diff(grid, axis=1) < 0).all(axis=1)
+        return grid[descending]
+    
+    def cuts_to_grid(self, cuts):
+        ## turn a cuts dict (like self.generic_cuts) into a single candidate row of lower bounds
+        return np.array([[cuts[grade][1] for grade in self.grade_labels[:-1]]], dtype=float)
+    
+    def get_grade_codes(self, pct, cut_grid):
+        ## returns a (n_candidates, n_schools) array of grade codes (0=A ... 4=F)
+        ## a school gets the best grade whose lower bound is at or below its PercentageEarned (same as assign_grades)
+        n_candidates, n_bounds = cut_grid.shape
+        ## shift all values to start at zero then give each candidate its own band so that the bounds of all
+        ## candidates make one sorted array and every score is placed with a single searchsorted call
+        low = min(cut_grid.min(), pct.min())
+        band = max(cut_grid.max(), pct.max()) - low + 1
+        offsets = np.arange(n_candidates)[:, None] * band
+        bounds = (np.sort(cut_grid, axis=1) - low + offsets).ravel()
+        scores = (pct[None, :] - low + offsets).ravel()
+        bounds_cleared = np.searchsorted(bounds, scores, side='right').reshape(n_candidates, -1)
+        ## remove the bounds of the candidates in the bands below
+        bounds_cleared -= np.arange(n_candidates)[:, None] * n_bounds
+        return (n_bounds - bounds_cleared).astype(np.int8)
+    
+    def count_grades(self, codes):
+        ## count of schools in each grade per candidate, one bincount for all candidates
+        n_candidates = codes.shape[0]
+        n_grades = len(self.grade_labels)
+        flat = (np.arange(n_candidates)[:, None] * n_grades + codes).ravel()
+        return np.bincount(flat, minlength=n_candidates*n_grades).reshape(n_candidates, n_grades)
+    
+    def evaluate_cut_grid(self, df, grades_py, cut_grid, chunk_size=1000):
+        ## schools without a score never recieve a grade
+        df = df[df.PercentageEarned.notnull()]
+        pct = df.PercentageEarned.to_numpy(dtype=float)
+        if len(pct) == 0:
+            return pd.DataFrame()
+        
+        ##------------------- school type flags for the differential analysis
+        charter = pd.to_numeric(df.Charter, errors='coerce').to_numpy()
+        aoi = pd.to_numeric(df.AOI, errors='coerce').to_numpy()
+        school_types = {'Charter': charter==1
+                        ,'District': charter==0
+                        ,'AOI': aoi==1
+                        ,'BrickMorter': aoi==0}
+        
+        ##------------------- prior year grade codes aligned to current year schools (-1 if not graded last year)
+        grade_codes = {grade: code for code, grade in enumerate(self.grade_labels)}
+        py = grades_py[grades_py.Grades.notnull()].drop_duplicates('EntityID').set_index('EntityID').Grades.map(grade_codes)
+        py_codes = df.EntityID.map(py).fillna(-1).to_numpy(dtype=int)
+        matched = py_codes >= 0
+        
+        results = []
+        ## candidates are evaluated in chunks to keep the (candidates x schools) array bounded in memory
+        for start in range(0, cut_grid.shape[0], chunk_size):
+            grid = cut_grid[start:start+chunk_size]
+            codes = self.get_grade_codes(pct, grid)
+            
+            columns = {'Cut'+grade: grid[:, i] for i, grade in enumerate(self.grade_labels[:-1])}
+            ##------------------- grade distribution
+            counts = self.count_grades(codes)
+            for i, grade in enumerate(self.grade_labels):
+                columns[grade] = counts[:, i]
+                columns[grade+'Pct'] = counts[:, i]*100/len(pct)
+            
+            ##------------------- charter/AOI differential
+            for school_type, mask in school_types.items():
+                type_counts = self.count_grades(codes[:, mask])
+                for i, grade in enumerate(self.grade_labels):
+                    columns[school_type+grade+'Pct'] = type_counts[:, i]*100/max(mask.sum(), 1)
+            for i, grade in enumerate(self.grade_labels):
+                columns['CharterGap'+grade] = columns['Charter'+grade+'Pct'] - columns['District'+grade+'Pct']
+                columns['AOIGap'+grade] = columns['AOI'+grade+'Pct'] - columns['BrickMorter'+grade+'Pct']
+            
+            ##------------------- movement vs prior year grades (a lower code is a better grade)
+            cy_matched = codes[:, matched]
+            py_matched = py_codes[matched][None, :]
+            columns['PYMatched'] = np.full(grid.shape[0], matched.sum())
+            columns['MovedUp'] = (cy_matched < py_matched).sum(axis=1)
+            columns['MovedDown'] = (cy_matched > py_matched).sum(axis=1)
+            columns['Unchanged'] = (cy_matched == py_matched).sum(axis=1)
+            columns['PctChanged'] = (columns['MovedUp'] + columns['MovedDown'])*100/max(matched.sum(), 1)
+            
+            results.append(pd.DataFrame(columns))
+        
+        return pd.concat(results, axis=0, ignore_index=True).round(2)
+    
+    def search_cuts(self, cut_grid, chunk_size=1000, reload=False):
+        '''
+        Evaluate many candidate cuts at once against the same cy and py data.
+
+        Parameters
+        ----------
+        cut_grid : numpy array (n_candidates, 4) or dict of model: array
+            lower bounds for A, B, C and D (see build_cut_grid). A single array is applied to all models
+        chunk_size : int
+            number of candidates evaluated per array operation. The default is 1000.
+        reload : bool
+            re-read the summary tables from the server. The default is False.
+
+        Returns
+        -------
+        dict of model: DataFrame with one row per candidate holding the grade distribution,
+        charter/AOI differentials and movement vs prior year grades
+
+        '''
+        data_cln, grades_py = self.load_search_data(reload=reload)
+        output = {}
+        for m, df in data_cln.items():
+            if isinstance(cut_grid, dict):
+                grid = cut_grid[m]
+            else:
+                grid = cut_grid
+            output[m] = self.evaluate_cut_grid(df, grades_py[m], np.asarray(grid, dtype=float), chunk_size)
+        return output
+
+# #%% search cuts
+# self = CutScores(2023, 'PrelimV6')
+# grid = self.build_cut_grid(np.arange(80, 95, 0.5), np.arange(65, 85, 0.5), np.arange(50, 75, 0.5), np.arange(30, 65, 0.5))
+# search = self.search_cuts(grid)
+# search['K8'].sort_values('PctChanged').head(20)
@@ -5,13 +5,13 @@ Created on Thu Feb 16 15:55:55 2023
 @author: yfahmy
 """
 
-import pyodbc
 import pandas as pd
+from TIMING import timed, count_round_trip
 from termcolor import colored
 import traceback
 import numpy as np
-import math
 from datetime import date
+from UPLOAD import UPLOAD
 
 class DATABASE:
     
@@ -67,6 +67,8 @@ class DATABASE:
         return cnxn
     
     def  connect_with_pyodbc(self):
+        ## imported here so the module loads without the ODBC driver (offline benchmarks, worker processes)
+        import pyodbc
         # setup a connection using pyODBC
         cnxn_str = (f'''Driver=ODBC Driver 17 for SQL Server;
                     Server={self.server_name};
@@ -79,6 +81,15 @@ class DATABASE:
         sql_statment = F'DROP TABLE {table_name}'
         return sql_statment
 
+    def table_exists(self, cursor, table_name):
+        ## True if the table is on the server, also True if that can't be checked (its upload journal is then kept)
+        try:
+            cursor.execute(F"SELECT OBJECT_ID('{table_name}')")
+            count_round_trip()
+            return cursor.fetchone()[0] is not None
+        except Exception:
+            return True
+
     def drop_tables_in_run(self, *tables):
         # setup a connection to db
         cnxn = self.connect_to_db()
@@ -91,11 +102,17 @@ class DATABASE:
             sql_statment = self.drop_tables_syntax(table_name)
             try:
                 cursor.execute(sql_statment)
+                count_round_trip()
                 cnxn.commit()
+                ## an unfinished upload to the dropped table can't be resumed any more
+                UPLOAD(server_name=self.server_name, sql_table_name=table_name).clear_journal()
                 print(F'{table_name} was successfully deleted')
             except Exception:
                 print(f'{table_name} NOT found or could not be deleted')
                 traceback.print_exc()
+                ## no table left to resume into, so an unfinished upload journal of it is stale
+                if not self.table_exists(cursor, table_name):
+                    UPLOAD(server_name=self.server_name, sql_table_name=table_name).clear_journal()
         cnxn.close()
         
     def create_new_table_syntax(self, df, new_table_name, all_nvarchar=False):
@@ -142,7 +159,8 @@ class DATABASE:
         
         return sql_create_table
     
-    def upload_table_to_db (self, df, table_name, suffix_fy=True, all_nvarchar=False):
+    @timed(label='table_name')
+    def upload_table_to_db (self, df, table_name, suffix_fy=True, all_nvarchar=False, raise_errors=False):
         '''
         This is the right method to use from outside of class
         Parameters
@@ -153,6 +171,8 @@ class DATABASE:
             DESCRIPTION: The table name in the server without prefix or suffix
         all_nvarchar : bool
             DESCRIPTION. The default is False.
+        raise_errors : bool, The default is False
+            DESCRIPTION: raise when the table can't be created or uploaded instead of only printing the error (background publishing)
 
         Returns
         -------
@@ -173,23 +193,32 @@ class DATABASE:
         # start an instance of cursor object
         cursor = cnxn.cursor()
         try:
-            # execute sql statment
-            cursor.execute(sql_create_table)
-            cnxn.commit()
-            print(colored(f'\n{new_table_name} Created Successfully', 'green'))
+            if UPLOAD(server_name=self.server_name, sql_table_name=new_table_name).is_unfinished():
+                ## the table was created by the upload being resumed
+                print(colored(f'\nResuming the unfinished upload to {new_table_name}', 'green'))
+            else:
+                # execute sql statment
+                cursor.execute(sql_create_table)
+                count_round_trip()
+                cnxn.commit()
+                print(colored(f'\n{new_table_name} Created Successfully', 'green'))
         except Exception:
             # print satus statment
             print(colored(f'\033[1mWARNING: \n{sql_create_table} FAILED\033[0m', 'red'))
             traceback.print_exc()
+            if raise_errors:
+                cnxn.close()
+                raise
         else:
             if all_nvarchar:
-                df.fillna('.', inplace=True)
+                df = df.fillna('.')
             else:
                 #convert nan to none (because sql server doesnt accept nan values)
                 df = df.replace({np.nan:None})
             # upload the new table
-            self.upload_to_server(df, new_table_name, cnxn)
+            self.upload_to_server(df, new_table_name, cnxn, raise_errors=raise_errors)
             
+    @timed(label='table_name')
     def fill_table (self, dataframe, table_name, clear_table=True, all_data=False, copy=False, cols_to_ignore=None):
         '''
         This is the right method to use from outside of class
@@ -214,6 +243,10 @@ class DATABASE:
         cnxn =  self.connect_to_db()
         cursor = cnxn.cursor()
         #clear table if indicated
+        ## a resumed upload keeps the rows its committed chunks already inserted
+        if clear_table and UPLOAD(server_name=self.server_name, sql_table_name=table_name).is_unfinished():
+            print(colored(f'Resuming the unfinished upload to {table_name}, the table is not cleared', 'green'))
+            clear_table = False
         if clear_table:
             try:
                 if all_data is False:
@@ -222,6 +255,9 @@ class DATABASE:
                     delete_cy = ''
                 sql_clear = f'Delete {table_name} {delete_cy}'
                 cursor.execute(sql_clear)
+                count_round_trip()
+                ## committed before the chunks so a retried chunk on a new connection does not roll the delete back
+                cnxn.commit()
                 print(colored(f'"{sql_clear}" ==> Executed Successfully', 'green'))
             except Exception as ex:
                 print(ex)
@@ -231,6 +267,7 @@ class DATABASE:
             ## read empty table cols
             sql_read = f'SELECT top(1)* FROM {table_name}'
             target_table = pd.read_sql_query(sql_read, cnxn)
+            count_round_trip()
             print(colored(f'"{table_name}" ==> read Successfully', 'green'))
         except Exception as ex:
             print(colored(f'"{sql_read}" ==> Failed to read target table', 'red'))
@@ -262,12 +299,13 @@ class DATABASE:
             df = df.loc[:, df.columns.astype(str).str.lower().isin(target_table.columns.astype(str).str.lower())].copy()
             #convert nan to '.'
             # df = df.replace({np.nan:'.'})
-            df.fillna('.', inplace=True)
+            df = df.fillna('.')
             df = df.astype(str)
             # upload the new table
             self.upload_to_server(df, table_name, cnxn)
             
             
+    @timed(label='table_name')
     def read_table(self, table_name, cy_data_only=False, suffix_fy=True, prefix_run=True):
         '''
         Parameters
@@ -301,6 +339,7 @@ class DATABASE:
             cnxn =  self.connect_to_db()
             #read data
             df = pd.read_sql(sql,cnxn)
+            count_round_trip()
             # close Connection
             cnxn.close()
             # print satus statement
@@ -312,13 +351,15 @@ class DATABASE:
             traceback.print_exc()
         return df
     
-    def read_sql_query(self, sql):
-
+    @timed()
+    def read_sql_query(self, sql, params=None):
+        ## params are passed to the driver for the ? placeholders in sql
         try:
             # setup a connection to db
             cnxn =  self.connect_to_db()
             #read data
-            df = pd.read_sql(sql, cnxn)
+            df = pd.read_sql(sql, cnxn, params=params)
+            count_round_trip()
             # close Connection
             cnxn.close()
             # print satus statement
@@ -330,9 +371,8 @@ class DATABASE:
             traceback.print_exc()
         return df
             
-    def upload_to_server(self, df, sql_table_name, cnxn):
-        cursor = cnxn.cursor()
-        cursor.fast_executemany = True
+    @timed(label='sql_table_name')
+    def upload_to_server(self, df, sql_table_name, cnxn, raise_errors=False):
         ### get the column names in the data frame
         ### also make a list of '?' with same len as column names
         names = ''
@@ -346,11 +386,9 @@ class DATABASE:
                 values = values+'?,'
         try:
             print(f'Uploading {sql_table_name} to {self.server_name}')
-            chunksize=100000
-            for n in range(0,math.ceil(df.shape[0]/chunksize)):
-                cursor.executemany(F'''INSERT INTO {sql_table_name} ({names}) values ({values})'''
-                                   , df.iloc[n*chunksize:(n+1)*chunksize, :].values.tolist())
-                print(f"Total cumulative rows uploaded up to: {(n+1)*chunksize:,}")
+            ## chunks are committed one at a time and journaled, a failed upload resumes from the first chunk not committed
+            upload = UPLOAD(server_name=self.server_name, sql_table_name=sql_table_name)
+            cnxn = upload.upload(df, cnxn, connect=self.connect_to_db, names=names, values=values)
                 
             # print satus statement
             print(colored(f'{sql_table_name} uploaded successfully', 'green'))
@@ -358,12 +396,13 @@ class DATABASE:
             ### insert our dataframe into the table with fast excution
             # df =list(df.itertuples(index=False))
             # cursor.executemany(f'''INSERT INTO {sql_table_name} ({names}) values ({values})''', df)
-            cnxn.commit()
             cnxn.close()
         except Exception as ex:
             print(colored(f'\033[1mWARNING: \n{sql_table_name} upload FAILED\033[0m', 'red'))
             print(ex)
             print('******************************************\n')
+            if raise_errors:
+                raise
             ## insert our dataframe into the table
             # for row in df.itertuples(index=False):
             #     cursor.execute(f'''INSERT INTO {sql_table_name} ({names}) values ({values})''', row)
\ No newline at end of file
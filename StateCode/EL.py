@@ -36,16 +36,11 @@ class EL(COMPONENTS):
         staticfile.sort_values(['SAISID', 'EntityID', 'StudentGrade', 'ELProf'], ascending =False, inplace=True)
         staticfile = staticfile [~staticfile.duplicated(['SAISID', 'EntityID'])].copy()
         ## select relevant grades for EL according to buissness rules
-        sf = pd.DataFrame()
         ## EL point for k8 and 912 are calculated separetly
-        for i in self.el_grade_map.keys():
-            sf_temp = staticfile [staticfile.StudentGrade.isin(self.el_grade_map[i])].copy()
-            sf_temp['Model'] = i
-            # create reclassified bool indic
-            sf_temp['ReClassified'] = (sf_temp.ELProf==4)
-            sf = pd.concat([sf, sf_temp], axis=0)
-        #clean up cached variables
-        del sf_temp
+        staticfile['Model'] = self.assign_models(staticfile.StudentGrade, self.el_grade_map)
+        sf = staticfile[staticfile.Model.notnull()].copy()
+        # create reclassified bool indic
+        sf['ReClassified'] = (sf.ELProf==4)
         
         #get proficiency
         el_prof = self.calculate_el_prof(sf)
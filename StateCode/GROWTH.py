@@ -62,14 +62,8 @@ class GROWTH(COMPONENTS):
         staticfile.loc[staticfile.StudentGrade==self.act_grade, 'StudentGrade']=111
         staticfile.loc[staticfile.Cohort==self.cy_act_cohort, 'StudentGrade']=self.act_grade
         ## select relevant grades for Growth according to buissness rules
-        sf = pd.DataFrame()
-        for model in self.growth_half_weights.keys():
-            grades_list = self.growth_grade_map[model]
-            sf_temp = staticfile [staticfile.StudentGrade.isin(grades_list)].copy()
-            sf_temp['Model'] = model
-            sf = pd.concat([sf, sf_temp], axis=0)
-        #clean up cached variables
-        del sf_temp
+        staticfile = staticfile.assign(Model=self.assign_models(staticfile.StudentGrade, {model:self.growth_grade_map[model] for model in self.growth_half_weights.keys()}))
+        sf = staticfile[staticfile.Model.notnull()].copy()
         
         ##---------------------------------- covert numeric to str values to match SQL col names
         ## establish needed cols for calculation and sql naming convention for summary tables
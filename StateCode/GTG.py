@@ -177,24 +177,24 @@ class GTG(COMPONENTS):
 
         return on_track_to_graduate
     
+    """
+    Persistence, credits earned and on track to graduate results (and their late submissions) are read from the server inside 
+    calculate_component, so GTG results are always recalculated
+    """
+    def get_input_fingerprint(self):
+        return None
+
     def fetch_late_otg_submissions(self, alternative_schools):
-        db = DATABASE(fiscal_year=self.fiscal_year, database='AccountabilityArchive', schema='dbo', run='', server_name='AACTASTPDDBVM02')
-        sql = f"""select 
-                [SchoolID] AS EntityID
-                , n_stu_elig AS GTGOnTrackToGradDen
-                , n_stu_met AS GTGOnTrackToGradNum
-                , [Points] AS GTGOnTrackToGradTotalpoints
-                , [IsEligible]
-                  FROM [AccountabilityArchive].[dbo].[LateLateSelfReportedData]
-                 Where FiscalYear={self.fiscal_year} and type='otg'
-                     AND SchoolID IN {tuple(alternative_schools)}"""
-        late_otg = db.read_sql_query(sql=sql)
-        return late_otg
+        late_otg = self.get_late_submissions('OTG', alternative_schools)
+        late_otg = late_otg.rename(columns={'SchoolID':'EntityID'
+                                            ,'n_stu_elig':'GTGOnTrackToGradDen'
+                                            ,'n_stu_met':'GTGOnTrackToGradNum'
+                                            ,'Points':'GTGOnTrackToGradTotalpoints'})
+        return late_otg[['EntityID', 'GTGOnTrackToGradDen', 'GTGOnTrackToGradNum', 'GTGOnTrackToGradTotalpoints', 'IsEligible']]
     
     def add_late_otg_submissions(self, on_track_to_graduate, alternative_schools):
         
         late_otg = self.fetch_late_otg_submissions(alternative_schools)
-        late_otg['IsEligible'] = late_otg['IsEligible'].apply(lambda x: True if x==1 else False)
         
         #delete the late submission value from original table and add new data
         on_track_to_graduate = on_track_to_graduate[~on_track_to_graduate.EntityID.isin(late_otg.EntityID)].copy()
@@ -203,23 +203,16 @@ class GTG(COMPONENTS):
         return on_track_to_graduate
     
     def fetch_late_ce_submissions(self, alternative_schools):
-        db = DATABASE(fiscal_year=self.fiscal_year, database='AccountabilityArchive', schema='dbo', run='', server_name='AACTASTPDDBVM02')
-        sql = f"""select 
-                [SchoolID] AS EntityID
-                , n_stu_elig AS GTGCreditsEarnedDen
-                , n_stu_met AS GTGCreditsEarnedNum
-                , [Points] AS GTGCreditsEarnedTotalpoints
-                , [IsEligible]
-                  FROM [AccountabilityArchive].[dbo].[LateLateSelfReportedData]
-                 Where FiscalYear={self.fiscal_year} and type='CE'
-                     AND SchoolID IN {tuple(alternative_schools)}"""
-        late_ce = db.read_sql_query(sql=sql)
-        return late_ce
+        late_ce = self.get_late_submissions('CE', alternative_schools)
+        late_ce = late_ce.rename(columns={'SchoolID':'EntityID'
+                                          ,'n_stu_elig':'GTGCreditsEarnedDen'
+                                          ,'n_stu_met':'GTGCreditsEarnedNum'
+                                          ,'Points':'GTGCreditsEarnedTotalpoints'})
+        return late_ce[['EntityID', 'GTGCreditsEarnedDen', 'GTGCreditsEarnedNum', 'GTGCreditsEarnedTotalpoints', 'IsEligible']]
     
     def add_late_ce_submissions(self, credits_earned, alternative_schools):
         
         late_ce = self.fetch_late_ce_submissions(alternative_schools)
-        late_ce['IsEligible'] = late_ce['IsEligible'].apply(lambda x: True if x==1 else False)
         
         #delete the late submission value from original table and add new data
         credits_earned = credits_earned[~credits_earned.EntityID.isin(late_ce.EntityID)].copy()
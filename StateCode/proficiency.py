@@ -69,10 +69,8 @@ class PROFICIENCY(COMPONENTS):
         
         # assign model based on alternative status and grade in the static file
         alt_mask = filtered_static_file["Alternative"]==1
-        for grade_model, grades in self.proficiency_grade_map["Trad"].items(): # add model type to dataframe for future groupby operations
-            filtered_static_file.loc[(~alt_mask) & (filtered_static_file["Grade"].isin(grades)), "Model"] = grade_model
-        for grade_model, grades in self.proficiency_grade_map["Alt"].items(): # add model type to dataframe for future groupby operations
-            filtered_static_file.loc[(alt_mask) & (filtered_static_file["Grade"].isin(grades)), "Model"] = grade_model
+        filtered_static_file["Model"] = self.assign_models(filtered_static_file["Grade"], {0:self.proficiency_grade_map["Trad"], 1:self.proficiency_grade_map["Alt"]}, 
+            keys=alt_mask.astype(int)) # add model type to dataframe for future groupby operations
 
         # remove records with grades that are not included in the Proficiency component
         filtered_static_file = filtered_static_file[filtered_static_file["Model"].notnull()]
@@ -207,33 +205,11 @@ class PROFICIENCY(COMPONENTS):
         if fay_tested_static_k8.empty: return fay_tested_static_k8 # skip if there are no K-8 records
 
         # for all students with FAY > 0, combine subjects and change fay values so that each tested FAY group meets the n-count
-        combined_subjects = fay_tested_static_k8.copy()
-        combined_subjects["NumberFAYTested"] = combined_subjects.groupby(by=["SchoolCode", "FAY"])["SAISID"].transform("count")
+        fay_map = self._consolidate_fay_groups(fay_tested_static_k8)
 
-        # combine 3 & 2 year FAY-level counts when the 3-year FAY is less than the n_count
-        combined_subjects.loc[(~(combined_subjects["NumberFAYTested"] >= (self.n_count*2))) & (combined_subjects["FAY"]==3), "FAY"] = 2
-        combined_subjects["NumberFAYTested"] = combined_subjects.groupby(by=["SchoolCode", "FAY"])["SAISID"].transform("count")
-
-        # combine 2 & 1 year FAY-level counts when the resulting 2-year FAY is less than the n_count
-        combined_subjects.loc[(~(combined_subjects["NumberFAYTested"] >= (self.n_count*2))) & (combined_subjects["FAY"]==2), "FAY"] = 1
-        combined_subjects["NumberFAYTested"] = combined_subjects.groupby(by=["SchoolCode", "FAY"])["SAISID"].transform("count")
-
-        # aggregate by school and model to get counts of groups that meet the n-count
-        combined_subjects["FAYGroups"] = combined_subjects.groupby(by=["SchoolCode"])["FAY"].transform(lambda x: sum(x.value_counts()>=(self.n_count*2)))
-        combined_subjects["FAY_MAX"] = combined_subjects.groupby(by=["SchoolCode"])["FAY"].transform("max")
-
-        temp_df = combined_subjects.copy() # define temporary dataframe to avoid overwriting in the next step.
-
-        # If 1 fay-level meets the n-count, combine all groups into 1
-        combined_subjects.loc[(temp_df["FAYGroups"]==1), "FAY"] = 1
-
-        # if 2 fay-levels meet the n-count, and 3-year fay is one of them, set 3 -> 2 and 2 -> 1
-        combined_subjects.loc[(temp_df["FAYGroups"]==2) & (temp_df["FAY_MAX"]==3) & (temp_df["FAY"]==3), "FAY"] = 2
-        combined_subjects.loc[(temp_df["FAYGroups"]==2) & (temp_df["FAY_MAX"]==3) & (temp_df["FAY"]==2), "FAY"] = 1
-        # if 2 fay-levels meet the n-count, and 3-year fay is NOT one of them, then we are good to go
-
-        # combine fay-levels and drop the temporary columns added in the process above
-        combined_subjects = combined_subjects.drop(columns=["NumberFAYTested", "FAYGroups", "FAY_MAX"])
+        # map the adjusted fay back onto the students with a single join
+        combined_subjects = pd.merge(fay_tested_static_k8, fay_map, on=["SchoolCode", "FAY"], how="left")
+        combined_subjects["FAY"] = combined_subjects.pop("AdjustedFAY")
 
         combined_subjects["Subject"] = "All" # assign subject as all. These records are used to calculate the final stability points
 
@@ -250,6 +226,55 @@ class PROFICIENCY(COMPONENTS):
 
         return proficiencies_by_fay
 
+    """
+    This protected method decides the adjusted FAY-year group of every FAY value at each school, working on the FAY counts of each school 
+        (at most 3 rows per school) instead of on the student records
+    """
+    def _consolidate_fay_groups(self, fay_tested_static_k8:pd.DataFrame):
+        """
+        Parameters:
+        ----------
+        fay_tested_static_k8 (pd.DataFrame): tested FAY records of the K-8 model (both subjects)
+
+        Returns:
+        ----------
+        pd.DataFrame: a dataframe with columns SchoolCode, FAY, and AdjustedFAY (one row per FAY value present at each school)
+        """
+        min_group = self.n_count*2
+        fay_counts = fay_tested_static_k8.groupby(by=["SchoolCode", "FAY"]).size().unstack(fill_value=0).reindex(columns=[1, 2, 3], fill_value=0)
+        count_1, count_2, count_3 = [fay_counts[fay].to_numpy() for fay in [1, 2, 3]]
+
+        # combine 3 & 2 year FAY-level counts when the 3-year FAY is less than the n_count
+        combine_3 = count_3 < min_group
+        count_2 = count_2 + np.where(combine_3, count_3, 0)
+        count_3 = np.where(combine_3, 0, count_3)
+
+        # combine 2 & 1 year FAY-level counts when the resulting 2-year FAY is less than the n_count
+        combine_2 = count_2 < min_group
+        count_1 = count_1 + np.where(combine_2, count_2, 0)
+        count_2 = np.where(combine_2, 0, count_2)
+
+        # fay value each original fay value ends up in after the two steps above
+        fay_2 = np.where(combine_2, 1, 2)
+        fay_3 = np.where(combine_3, fay_2, 3)
+
+        # count groups that meet the n-count and the highest remaining fay-level
+        fay_groups = (count_1 >= min_group).astype(int) + (count_2 >= min_group) + (count_3 >= min_group)
+        fay_max = np.select([count_3 > 0, count_2 > 0, count_1 > 0], [3, 2, 1], default=0)
+
+        # If 1 fay-level meets the n-count, combine all groups into 1
+        # if 2 fay-levels meet the n-count, and 3-year fay is one of them, set 3 -> 2 and 2 -> 1
+        # if 2 fay-levels meet the n-count, and 3-year fay is NOT one of them, then we are good to go
+        one_group = fay_groups == 1
+        shift_down = (fay_groups == 2) & (fay_max == 3)
+        adjust = lambda fay: np.where(one_group, 1, np.where(shift_down & (fay > 1), fay - 1, fay))
+
+        fay_map = pd.DataFrame({1:adjust(np.ones(len(fay_counts), dtype=int)), 2:adjust(fay_2), 3:adjust(fay_3)}, index=fay_counts.index)
+        fay_map = fay_map.stack().rename("AdjustedFAY").reset_index().rename(columns={"level_1":"FAY"})
+        fay_map["FAY"] = fay_map["FAY"].astype(fay_tested_static_k8["FAY"].dtype)
+
+        return fay_map
+
     """ 
     This protected method combines the Proficiency level results grouped by grade and by FAY-year group 
         at each school.
@@ -6,17 +6,26 @@ By: Yassin Fahmy assessments = azm2.copy()
 """
 
 import pandas as pd
+from TIMING import timed, count_round_trip
 pd.options.display.max_columns=200
 from CONNECTION import CONNECTION as con
 import os
+import hashlib
 from termcolor import colored
 from SOURCES import SOURCES
 
+## aspire participation loaded in this python session, keyed by file name
+_aspire_participation = {}
+
 class ASSESSMENTS(SOURCES):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         
+        ## bump when the aspire participation query or its fix changes so older local copies are not reused
+        self.aspire_participation_version = 1
+        self.aspire_participation_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'AspireParticipationCache')
+        
     def __call__(self):
         return self.format_assessments()
     
@@ -55,6 +64,7 @@ class ASSESSMENTS(SOURCES):
         try:
             cnxn = con().__call__(server_name= self.server_name)
             assessments = pd.read_sql(sql_statment, cnxn)
+            count_round_trip()
             # print(colored('\033[1mRetrieved data from database successfully\033[0m', 'green'))
             cnxn.close()
         except Exception as ex:
@@ -67,6 +77,7 @@ class ASSESSMENTS(SOURCES):
         
         return assessments
     
+    @timed()
     def format_assessments(self, raw_data_assessments=None):
         if raw_data_assessments is None:
             
@@ -144,9 +155,8 @@ class ASSESSMENTS(SOURCES):
         ###### if student took same assessment more than once we only keep the entry with his highest score
         #sort by 'SAISID', 'SchoolCode', 'AssessmentGrade', 'Subject' in descending order (de-duplicating)
         size_0 =  assessments.shape[0]
-        assessments.sort_values(['SAISID','Subject', 'AssessmentGrade', 'ScaleScore'], inplace=True, ascending=False)
-        # keep the first duplicate to keep highest scale score
-        assessments = assessments [~assessments[['SAISID', 'Subject', 'AssessmentGrade']].duplicated(keep='first')]
+        # keep the entry with the highest scale score
+        assessments = self.keep_top_per_key(assessments, ['SAISID', 'Subject', 'AssessmentGrade'], priority=['ScaleScore'], label='Assessments')
         print(F'''Student entries where de-duplicated to keep entries with highest score in the same school for each student for each subject/grade
               Excluded entries = {size_0 - assessments.shape[0]}
               Total records left = {assessments.shape[0]}\n''')
@@ -258,6 +268,7 @@ AND soa.ObjectiveAssessmentKey in (7163,7165, 7167)'''
         try:
             cnxn = con().__call__(server_name= 'AACTASTPDDBVM01')
             aspire = pd.read_sql(sql_statment, cnxn)
+            count_round_trip()
             # print(colored('\033[1mRetrieved data from database successfully\033[0m', 'green'))
             cnxn.close()
         except Exception as ex:
@@ -265,31 +276,70 @@ AND soa.ObjectiveAssessmentKey in (7163,7165, 7167)'''
             print(ex)
         
         return aspire
+    def get_aspire_snapshot(self):
+        '''
+        Fingerprint of the source tables of the aspire participation query (record counts, highest key and checksums of the results and
+        of the enrollment), it changes whenever a record the query reads is added, removed, rescored, regraded or re-enrolled.
+        Every checksum is aggregated twice (xor and sum of a case sensitive checksum) so rows that cancel or swap in one still change the other.
+        '''
+        sql_statment = F'''SELECT COUNT_BIG(*) AS Records
+            ,MAX(soa.StudentObjectiveAssessmentKey) AS MaxObjectiveKey
+            ,CHECKSUM_AGG(CHECKSUM(sa.StateStudentID, sa.TestSchoolKey, sa.assessmentkey, sa.whenassessedgradeleveltypekey, soa.ObjectiveAssessmentKey, sasr.result)) AS ResultChecksum
+            ,SUM(CAST(BINARY_CHECKSUM(sa.StateStudentID, sa.TestSchoolKey, sa.assessmentkey, sa.whenassessedgradeleveltypekey, soa.ObjectiveAssessmentKey, sasr.result) AS BIGINT)) AS ResultSum
+            ,(SELECT COUNT_BIG(*) FROM Accountability.dbo.FiscalYearEnrollment (nolock) WHERE FiscalYear = {self.fiscal_year}) AS EnrollmentRecords
+            ,(SELECT CHECKSUM_AGG(CHECKSUM(SAISID, Grade, EntryDate)) FROM Accountability.dbo.FiscalYearEnrollment (nolock) WHERE FiscalYear = {self.fiscal_year}) AS EnrollmentChecksum
+            ,(SELECT SUM(CAST(BINARY_CHECKSUM(SAISID, Grade, EntryDate) AS BIGINT)) FROM Accountability.dbo.FiscalYearEnrollment (nolock) WHERE FiscalYear = {self.fiscal_year}) AS EnrollmentSum
+FROM [AccountabilityAssessmentDataMart].[ACTASPIRE ].[StudentAssessment] sa (nolock)
+JOIN [AccountabilityAssessmentDataMart].[ACTASPIRE ].StudentObjectiveAssessment soa (nolock)
+  ON sa.StudentAssessmentKey =soa.StudentAssessmentKey
+JOIN [AccountabilityAssessmentDataMart].[ACTASPIRE ].StudentObjectiveAssessmentScoreResult sasr (nolock)
+  ON soa.StudentObjectiveAssessmentKey = sasr.StudentObjectiveAssessmentKey
+WHERE  sa.fiscalyear = {self.fiscal_year}
+AND soa.ObjectiveAssessmentKey in (7163,7165, 7167)'''
+        cnxn = con().__call__(server_name= 'AACTASTPDDBVM01')
+        snapshot = pd.read_sql(sql_statment, cnxn)
+        count_round_trip()
+        cnxn.close()
+        return hashlib.sha1(snapshot.to_csv(index=False).encode()).hexdigest()[:12]
+    
+    @timed()
     def fix_aspire_participation(self):
-        #get math reading and english for aspire
-        aspire = self.get_aspire_participation()
-        #identify those that have recieved a non-scorable response on writing and take them and any other record for the same kid at the same school.
+        '''
+        Aspire ELA records built from the english, reading and writing objective scores of students with a non-scorable writing response.
+        The result is kept in memory and in AspireParticipationCache under the snapshot of its source tables, so the large participation
+        query only runs again when those tables change.
+        '''
+        file_name = f'AspireParticipation_v{self.aspire_participation_version}_{self.fiscal_year}_{self.get_aspire_snapshot()}.pkl'
+        if file_name not in _aspire_participation:
+            file_path = os.path.join(self.aspire_participation_folder, file_name)
+            if os.path.exists(file_path):
+                _aspire_participation[file_name] = pd.read_pickle(file_path)
+            else:
+                aspire_objective = self.format_aspire_participation(self.get_aspire_participation())
+                os.makedirs(self.aspire_participation_folder, exist_ok=True)
+                aspire_objective.to_pickle(file_path)
+                _aspire_participation[file_name] = aspire_objective
+        return _aspire_participation[file_name].copy()
+    
+    def format_aspire_participation(self, aspire):
+        #identify those that have recieved a non-scorable response on writing and take them and any other record for the same kid.
         non_scorable_values = ['BL','NE','IL','OT']
-        non_scorable = aspire.loc[aspire.ScaleScoreResult.isin(non_scorable_values),['SAISID']].copy()
-        aspire = pd.merge(aspire, non_scorable, on=['SAISID'], how='inner')
-        #make sure each kid has an english, writing and reading record
-        #replace non-scorable responses with lowest scale score possible (400)
-        aspire.loc[aspire.ScaleScoreResult.isin(non_scorable_values), 'ScaleScoreResult'] = 400
-        #convert scaleScoreresults to numeric
-        aspire['ScaleScoreResult'] = pd.to_numeric(aspire['ScaleScoreResult'], errors='coerce')
-        cols=['SAISID', 'ObjectiveAssessmentKey', 'ScaleScoreResult']
-        aspire.sort_values(cols, ascending=False, inplace=True)
-        #deduplicate to keep one of English, reading and writing per kid
-        aspire = aspire[~aspire.duplicated(cols)].copy()
-        # agg count of records and only keep the records were kid took all 3 tests
+        non_scorable = aspire.ScaleScoreResult.isin(non_scorable_values)
+        aspire = aspire[aspire.SAISID.isin(aspire.loc[non_scorable, 'SAISID'])].copy()
+        #replace non-scorable responses with lowest scale score possible (400) and convert scaleScoreresults to numeric
+        aspire['ScaleScoreResult'] = pd.to_numeric(aspire['ScaleScoreResult'].mask(aspire.ScaleScoreResult.isin(non_scorable_values), 400), errors='coerce')
+        #deduplicate to keep one of English, reading and writing score per kid
+        aspire = aspire.drop_duplicates(['SAISID', 'ObjectiveAssessmentKey', 'ScaleScoreResult'])
+        # count of tests and mean score per record, only keep the records were kid took all 3 tests
         cols_to_keep = ['FiscalYear', 'SAISID', 'SchoolCode', 'AssessmentGrade', 'StudentGrade']
-        aspire_objective = aspire.groupby(cols_to_keep).agg(NumberOfTests=('ObjectiveAssessmentKey', 'nunique')
-                                                        ,ScaleScore=('ScaleScoreResult', 'mean')).reset_index()
-        aspire_objective = aspire_objective[aspire_objective.NumberOfTests==3].copy()
+        aspire_objective = aspire.groupby(cols_to_keep, sort=False).agg(ScaleScore=('ScaleScoreResult', 'mean'))
+        aspire_objective['NumberOfTests'] = aspire.drop_duplicates(cols_to_keep + ['ObjectiveAssessmentKey']).groupby(cols_to_keep, sort=False).size()
+        aspire_objective = aspire_objective[aspire_objective.NumberOfTests==3].reset_index()
         aspire_objective['ScaleScore'] = aspire_objective['ScaleScore'].round(0)
         ## add in assessmentfamily and academic subject
         aspire_objective['AssessmentFamily'] = 'ACTASPIRE'
         aspire_objective['AcademicSubject'] = 'English Language Arts'
+        aspire_objective = aspire_objective[cols_to_keep + ['NumberOfTests', 'ScaleScore', 'AssessmentFamily', 'AcademicSubject']]
 
         return aspire_objective
         
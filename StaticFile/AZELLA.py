@@ -6,6 +6,8 @@ Created on Mon Sep 26 09:31:01 2022
 
 """
 import pandas as pd
+import numpy as np
+from TIMING import timed, count_round_trip
 import os
 from SOURCES import SOURCES
 from CONNECTION import CONNECTION as con
@@ -44,6 +46,7 @@ class AZELLA(SOURCES):
                           WHERE FiscalYear IN ({self.fiscal_year}, {self.previous_fiscal_year})'''
         cnxn = con().__call__(server_name = self.server_name)
         azella = pd.read_sql(sql_statment,cnxn)
+        count_round_trip()
         cnxn.close()
         
         if self.raw_folder is not None:
@@ -52,6 +55,7 @@ class AZELLA(SOURCES):
         
         return azella
         
+    @timed()
     def format_azella(self, raw_data_azella=None):
         '''
         self.end_window
@@ -100,10 +104,8 @@ class AZELLA(SOURCES):
         eligible_mask = (azella_py.AssessmentDate > py_end_window)
         azella_py['PriorToEndWindow'] = eligible_mask
         
-        # order records by SAISID, AssessmentDate and ProfLevel
-        azella_py.sort_values(['SAISID', 'PriorToEndWindow', 'AssessmentDate', 'ProfLevel'], inplace=True, ascending=False)
-        # remove entries of duplicate 'SAISID' to keep  the latest records before and after the py_end_window if exists
-        azella_py = azella_py [~azella_py[['SAISID', 'PriorToEndWindow']].duplicated(keep='first')]
+        # remove entries of duplicate 'SAISID' to keep  the latest records (then highest ProfLevel) before and after the py_end_window if exists
+        azella_py = self.keep_top_per_key(azella_py, ['SAISID', 'PriorToEndWindow'], priority=['AssessmentDate', 'ProfLevel'], label='PYAzella')
         # pivot table to wide
         azella_py = pd.pivot(azella_py, index='SAISID', columns='PriorToEndWindow', values='ProfLevel').reset_index()
         # True column holds scores taken last year prior to last years' testing window
@@ -126,12 +128,12 @@ class AZELLA(SOURCES):
         not_eligible_mask = (azella_long.AssessmentDate > end_window)
         azella_long = azella_long[~not_eligible_mask].copy()
         try:
-            # sort by date to label earliest test and latest tests
-            azella_long.sort_values(['SAISID', 'AssessmentDate'], inplace=True, ascending=True)
-            azella_long.loc[(~azella_long['SAISID'].duplicated(keep='first')), 'TestType'] = 'earliest_test'
-            
-            azella_long.sort_values(['SAISID', 'AssessmentDate'], inplace=True, ascending=False)
-            azella_long.loc[(~azella_long['SAISID'].duplicated(keep='first')), 'TestType'] = 'latest_test'
+            # label earliest test and latest tests, both found in one grouped pass
+            azella_long.reset_index(drop=True, inplace=True)
+            tests = self.get_earliest_latest_tests(azella_long)
+            azella_long['TestType'] = None
+            azella_long.loc[tests.Earliest, 'TestType'] = 'earliest_test'
+            azella_long.loc[tests.Latest, 'TestType'] = 'latest_test'
         
             ### at this point if student had more than one test we have different labels for them
             ## and if student has only one test then it will be called the lates_test
@@ -197,4 +199,27 @@ class AZELLA(SOURCES):
             
           
     
+    def get_earliest_latest_tests(self, azella_long):
+        '''
+        Finds the earliest and latest test of every student with one grouped arg-min/arg-max over integer encoded test timestamps
+        (full precision, so same day retests are ordered by time as the sort was) instead of sorting the whole test table twice.
+        Tests with a missing date are only picked when a student has no dated test, ties keep the first row.
+        Tests with a missing SAISID are one group, as duplicated() treated them after the sort.
+
+        Parameters
+        ----------
+        azella_long : DataFrame
+            DESCRIPTION: tests with SAISID and AssessmentDate, with a unique index
+
+        Returns
+        -------
+        DataFrame indexed by SAISID with the index labels of the Earliest and Latest tests (the same row if the student took one test)
+        '''
+        timestamps = azella_long['AssessmentDate'].to_numpy(dtype='datetime64[ns]')
+        missing = np.isnat(timestamps)
+        latest_key = np.where(missing, np.iinfo(np.int64).min, timestamps.astype(np.int64))
+        earliest_key = np.where(missing, np.iinfo(np.int64).max, latest_key)
+        keys = pd.DataFrame({'SAISID':azella_long['SAISID'].to_numpy(), 'Earliest':earliest_key, 'Latest':latest_key}, index=azella_long.index)
+        return keys.groupby('SAISID', sort=False, dropna=False).agg({'Earliest':'idxmin', 'Latest':'idxmax'})
+    
 # self = AZELLA(2023, 'PrelimV6')
\ No newline at end of file
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Jun 26 10:02:41 2023
+
+@author: YFahmy
+"""
+import os
+import pandas as pd
+from TIMING import span, reset_run, set_run_log, run_summary
+from STATIC import STATIC
+from SYNTHETIC import SYNTHETIC
+
+
+class BENCHMARK:
+    '''
+    Builds the staticfile from synthetic data with no server access and times every formatting stage.
+    The db helpers used inside the formatting stages are swapped on the instances for the synthetic tables.
+
+    Parameters
+    ----------
+    fiscal_year : int
+        DESCRIPTION: fiscal year of the synthetic data
+    n_students : int, The default is 100000
+        DESCRIPTION: statewide number of students (10k to 5M)
+    folder : str, The default is None
+        DESCRIPTION: folder to save the synthetic tables and the resulting staticfile/school type for the StateCode and FederalCode benchmarks
+    run_log : str, The default is None
+        DESCRIPTION: path of the jsonl file to append stage timings to
+    seed : int, The default is 0
+        DESCRIPTION: seed of the synthetic generator
+    '''
+    def __init__(self, fiscal_year=2023, run='Prelim', n_students=100000, folder=None, run_log=None, seed=0, **kwargs):
+        self.fiscal_year = fiscal_year
+        self.run = run
+        self.n_students = n_students
+        self.folder = folder
+        self.run_log = run_log
+        self.seed = seed
+        self.kwargs = kwargs
+
+    def build_staticfile(self, fiscal_year, cohort_year=None):
+        syn = SYNTHETIC(fiscal_year=fiscal_year, run=self.run, n_students=self.n_students, seed=self.seed, cohort_year=cohort_year)
+        with span('GenerateSyntheticData', n_students=self.n_students):
+            data = syn.generate()
+
+        stat = STATIC(fiscal_year=fiscal_year, run=self.run, server_name='AACTASTPDDBVM02', **self.kwargs)
+        ##---------------- replace the db helpers that are called from inside the formatting stages
+        stat.fye.el_fep_fix = lambda year: syn.make_fep_list(year)
+        stat.assess.fix_aspire_participation = lambda: data['AspireParticipation'].copy()
+        stat.ed_org.get_first_year_schools = lambda: data['Year1Schools'].copy()
+        stat.ed_org.get_model_corrections = lambda: data['ModelCorrections'].copy()
+
+        ##---------------- same order as format_basefiles, raw frames are copied since some stages format in place
+        stat.jted = stat.ed_org.format_jteds(schools_raw=data['EdOrg'].copy())
+        stat.enrollment = stat.fye.format_enrollment(jted_file=stat.jted, raw_data_stlist=data['FiscalYearEnrollment'].copy())
+        stat.py_enrollment = stat.fye.format_enrollment(raw_data_stlist=data['PYFiscalYearEnrollment'].copy(), for_k2=True)
+        stat.school_type = stat.ed_org.format_school_type(enrollment=stat.enrollment, raw_data_schools=data['EdOrg'].copy()
+                                                          , remove_jteds=stat.remove_jteds, remove_private_schools=stat.remove_private_schools)
+        stat.assessments = stat.assess.format_assessments(raw_data_assessments=data['Assessments'].copy())
+        stat.el = stat.azella.format_azella(raw_data_azella=data['Azella'].copy())
+        stat.sped = stat.census.format_census(census_raw=data['Census'].copy())
+        stat.k2_sf = stat.k2.format_data(stat.py_enrollment, stat.school_type, stat.assessments)
+        stat.chronic_absenteeisim = data['ChronicAbsenteeisim'].copy()
+        stat.sgp = stat.growth.format_sgp(data['SGP'].copy())
+        stat.format_staticfile()
+
+        if self.folder is not None:
+            syn.save({name: data[name] for name in ['GradRate', 'DropOut']}, self.folder)
+            syn.save({'StaticFile': stat.staticfile, 'SchoolType': stat.school_type}, self.folder)
+        return stat
+
+    def run_benchmark(self, prior_year=True):
+        '''
+        Builds the current year staticfile (and the prior year one used by AR and SGI) and returns the stage timings.
+        '''
+        reset_run()
+        if self.run_log is not None:
+            set_run_log(self.run_log)
+        self.stat = self.build_staticfile(self.fiscal_year)
+        if prior_year:
+            ##same students one grade lower
+            self.py_stat = self.build_staticfile(self.fiscal_year-1, cohort_year=self.fiscal_year)
+        return run_summary()
+
+#%%
+# bench = BENCHMARK(2023, n_students=100000, folder=r'H:\ACCT\ACCOUNTABILITY\2023\Yassin\benchmark data')
+# timings = bench.run_benchmark()
@@ -5,6 +5,7 @@ Created on Fri Oct  7 10:31:56 2022
 @author: yfahmy
 """
 import pandas as pd
+from TIMING import timed, count_round_trip
 from CONNECTION import CONNECTION as con
 import os
 from datetime import date
@@ -42,6 +43,7 @@ class CENSUS(SOURCES):
                         WHERE FiscalYear = {self.fiscal_year}'''
         cnxn = con().__call__(server_name)
         census = pd.read_sql(sql_statment, cnxn)
+        count_round_trip()
         cnxn.close()
         
         if self.raw_folder is not None:
@@ -50,6 +52,7 @@ class CENSUS(SOURCES):
             
         return census
         
+    @timed()
     def format_census(self, census_raw=None):
         
         if census_raw is None:
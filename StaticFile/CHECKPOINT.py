@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 22 09:48:13 2026
+
+@author: YFahmy
+Stage checkpoints for long runs. The output frames of every completed stage are kept in a folder together with a fingerprint
+of the stage inputs (the settings of the run and the output fingerprints of its upstream stages). When the run is started again
+a stage whose inputs did not change is loaded from its checkpoint instead of being run, so a failure late in the run
+(an upload timing out) only costs the stages after the last checkpoint. A stage that is rerun and produces the same data
+does not invalidate the stages downstream of it.
+
+Usage:
+    checkpoint = CHECKPOINT(folder=r'H:\\path\\to\\checkpoints', rerun=['enrollment'])
+    settings = checkpoint.get_settings({'fiscal_year':2023, 'run':'Prelim', 'passed_integrity':True})
+    outputs = checkpoint.run_stage('enrollment', lambda: {'enrollment': fye.format_enrollment()}, settings=settings)
+    outputs = checkpoint.run_stage('school_type', lambda: {'school_type': ...}, upstream=['enrollment'], settings=settings)
+"""
+from datetime import datetime
+import pandas as pd
+import hashlib
+import json
+import os
+
+
+class CHECKPOINT:
+    '''
+    Parameters
+    ----------
+    folder : str
+        DESCRIPTION: folder holding the checkpoint frames and manifest.json of the run
+    rerun : list of str or 'all', The default is []
+        DESCRIPTION: stages that are run even if their checkpoint is valid (source stages read the server, so a change in the
+                     server data is only picked up if the stage is rerun)
+    '''
+    def __init__(self, folder, rerun=[]):
+        self.folder = folder
+        self.rerun = rerun
+        self.manifest_file = os.path.join(self.folder, 'manifest.json')
+        os.makedirs(self.folder, exist_ok=True)
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file) as file:
+                self.manifest = json.load(file)
+        else:
+            self.manifest = {}
+        ## output fingerprint of every stage run or resumed in this run
+        self.fingerprints = {}
+
+    def get_settings(self, settings):
+        ## hash of an explicit dict of the settings the stages depend on (str, numbers, lists, dicts, dates)
+        return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get_input_fingerprint(self, name, upstream, settings):
+        inputs = {'Stage':name, 'Settings':settings, 'Upstream':{stage:self.fingerprints[stage] for stage in upstream}}
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get_output_fingerprint(self, outputs):
+        ## content hash of the output frames (column names and values, not the index)
+        sha = hashlib.sha256()
+        for name in sorted(outputs.keys()):
+            df = outputs[name]
+            sha.update(name.encode())
+            if df is not None:
+                sha.update(json.dumps([str(col) for col in df.columns]).encode())
+                sha.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        return sha.hexdigest()
+
+    def get_file_path(self, name, output):
+        return os.path.join(self.folder, f'{name}.{output}.pkl')
+
+    def is_valid(self, name, input_fingerprint):
+        ## checkpoint of the stage exists, was made from the same inputs and all of its frames are on disk
+        entry = self.manifest.get(name)
+        if (entry is None) or (entry['InputFingerprint'] != input_fingerprint):
+            return False
+        if (self.rerun == 'all') or (name in self.rerun):
+            return False
+        return all([os.path.exists(self.get_file_path(name, output)) for output, saved in entry['Outputs'].items() if saved])
+
+    def run_stage(self, name, stage, upstream=[], settings=''):
+        '''
+        Parameters
+        ----------
+        name : str
+            DESCRIPTION: name of the stage, unique in the run
+        stage : callable
+            DESCRIPTION: runs the stage and returns a dict of output name: DataFrame (or None), {} for stages with no output (uploads)
+        upstream : list of str, The default is []
+            DESCRIPTION: stages (already run or resumed in this run) whose outputs the stage uses
+        settings : str, The default is ''
+            DESCRIPTION: fingerprint of the settings the stage depends on
+
+        Returns
+        -------
+        dict of output name: DataFrame, loaded from the checkpoint if it is valid
+        '''
+        input_fingerprint = self.get_input_fingerprint(name, upstream, settings)
+        if self.is_valid(name, input_fingerprint):
+            entry = self.manifest[name]
+            print(f'Resuming {name} from the checkpoint of {entry["CompletedAt"]}')
+            outputs = {output:(pd.read_pickle(self.get_file_path(name, output)) if saved else None) for output, saved in entry['Outputs'].items()}
+        else:
+            print(f'Running {name}')
+            outputs = stage()
+            for output, df in outputs.items():
+                if df is not None:
+                    ## written to a temporary file first so an interrupted save never leaves a partial checkpoint
+                    file_path = self.get_file_path(name, output)
+                    df.to_pickle(file_path + '.tmp')
+                    os.replace(file_path + '.tmp', file_path)
+            ## stages with no output (uploads) pass their input fingerprint downstream
+            output_fingerprint = self.get_output_fingerprint(outputs) if len(outputs) > 0 else input_fingerprint
+            entry = {'InputFingerprint':input_fingerprint, 'OutputFingerprint':output_fingerprint
+                     , 'Outputs':{output:(df is not None) for output, df in outputs.items()}
+                     , 'CompletedAt':datetime.now().isoformat(timespec='seconds')}
+            self.manifest[name] = entry
+            self.save_manifest()
+        self.fingerprints[name] = entry['OutputFingerprint']
+        return outputs
+
+    def save_manifest(self):
+        with open(self.manifest_file + '.tmp', 'w') as file:
+            json.dump(self.manifest, file, indent=1)
+        os.replace(self.manifest_file + '.tmp', self.manifest_file)
+
+    def clear(self, stages=None):
+        ## remove the checkpoints of the stages (all if None) so they are run again
+        if stages is None:
+            stages = list(self.manifest.keys())
+        for name in stages:
+            entry = self.manifest.pop(name, None)
+            if entry is not None:
+                for output in entry['Outputs'].keys():
+                    if os.path.exists(self.get_file_path(name, output)):
+                        os.remove(self.get_file_path(name, output))
+        self.save_manifest()
+
+#%%
+# checkpoint = CHECKPOINT(folder=r'H:\ACCT\ACCOUNTABILITY\2023\Yassin\checkpoints\PrelimV6')
+# outputs = checkpoint.run_stage('enrollment', lambda: {'enrollment': stat.fye.format_enrollment()}, settings=checkpoint.get_settings(stat.get_run_settings()))
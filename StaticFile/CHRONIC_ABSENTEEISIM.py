@@ -5,6 +5,7 @@ Created on Fri Jan 27 13:00:51 2023
 @author: yfahmy
 """
 import pandas as pd
+from TIMING import timed, count_round_trip
 from CONNECTION import CONNECTION as con
 import os
 from datetime import date
@@ -30,13 +31,16 @@ class CA(SOURCES):
         cursor = cnxn.cursor()
         ##get data
         bm_ca = pd.read_sql(bm_sql_statment, cnxn)
+        count_round_trip()
         #get online data in 2 steps
         ##first send execution statment to build temp tables
         ##then query the temp tables
         #then delete the temp tables
         cursor.execute(aoi_exec_sql_statment)
+        count_round_trip()
         cnxn.commit()
         aoi_ca = pd.read_sql(aoi_sql_statment, cnxn)
+        count_round_trip()
         cnxn.close()
         if aoi_ca.shape[0]==0:
             raise('Error in retrieving AOI Chronic Absenteeisim data')
@@ -48,6 +52,7 @@ class CA(SOURCES):
                 
         return aoi_ca, bm_ca 
          
+    @timed()
     def format_raw_ca(self):
         #get from db
         aoi_ca, bm_ca = self.get_ca_from_database()
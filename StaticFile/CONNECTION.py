@@ -4,7 +4,6 @@ Created on Thu Jan  5 13:13:51 2023
 
 @author: yfahmy
 """
-import pyodbc 
 
 class CONNECTION:
     '''setup a connection to the database of your choice over a server of your choice
@@ -29,6 +28,8 @@ class CONNECTION:
         Returns:
             connection object 'cnxn'
         '''
+        ## imported here so the module loads without the ODBC driver (offline benchmarks, worker processes)
+        import pyodbc
         # setup a connection using pyODBC
         cnxn_str = ('''Driver=ODBC Driver 17 for SQL Server;
                     Server={a};
@@ -5,12 +5,13 @@ Created on Thu Jan  5 11:13:11 2023
 @author: yfahmy
 """
 import pandas as pd
+from TIMING import timed, count_round_trip
 from datetime import date
 from termcolor import colored
 from CONNECTION import CONNECTION as con
 import traceback
 import numpy as np
-import math
+from UPLOAD import UPLOAD
 
 
 class DB:
@@ -68,6 +69,15 @@ class DB:
         sql_statment = F'DROP TABLE {table_name}'
         return sql_statment
 
+    def table_exists(self, cursor, table_name):
+        ## True if the table is on the server, also True if that can't be checked (its upload journal is then kept)
+        try:
+            cursor.execute(F"SELECT OBJECT_ID('{table_name}')")
+            count_round_trip()
+            return cursor.fetchone()[0] is not None
+        except Exception:
+            return True
+
     def drop_tables_in_run(self, *tables, table_prefix=None):
         if table_prefix is None:
             raise ValueError('Please provide Prefix of table name to "table_prefix" such as "Prelim" or "Final"')
@@ -82,13 +92,33 @@ class DB:
             sql_statment = self.drop_tables_syntax(table_name)
             try:
                 cursor.execute(sql_statment)
+                count_round_trip()
                 cnxn.commit()
+                ## an unfinished upload to the dropped table can't be resumed any more
+                UPLOAD(server_name=self.server_name, sql_table_name=table_name).clear_journal()
                 print(F'{table_name} was successfully deleted')
             except Exception:
                 print('Table not found or could not be deleted')
                 traceback.print_exc()
+                ## no table left to resume into, so an unfinished upload journal of it is stale
+                if not self.table_exists(cursor, table_name):
+                    UPLOAD(server_name=self.server_name, sql_table_name=table_name).clear_journal()
         cnxn.close()
         
+    def get_table_fingerprint(self, table_name):
+        ## row count and checksum of a table of the run, read on the server (cheap next to reading the table). None if the table is not there
+        full_table_name = F'{self.static_db}.{self.static_schema}.{self.run}{table_name}' + str(self.fiscal_year)
+        sql_statment = F'SELECT COUNT_BIG(*) AS Records, CHECKSUM_AGG(BINARY_CHECKSUM(*)) AS TableChecksum FROM {full_table_name} (nolock)'
+        try:
+            cnxn = con().__call__(server_name = self.server_name)
+            fingerprint = pd.read_sql(sql_statment, cnxn)
+            count_round_trip()
+            cnxn.close()
+        except Exception:
+            print(f'{full_table_name} not found, it is fingerprinted as missing')
+            return None
+        return fingerprint.iloc[0].tolist()
+    
     def excute_sql(self, sql_statment, new_table_name):
         try:
             # setup a connection to db
@@ -98,6 +128,7 @@ class DB:
             print(F'Uploading {new_table_name} to {self.server_name}')
             # execute sql statment
             cursor.execute(sql_statment)
+            count_round_trip()
             cnxn.commit()
             # close Connection
             cnxn.close()
@@ -263,6 +294,7 @@ class DB:
         cnxn =  con().__call__(server_name = finance_server)
         print(F'Retrieving data from {finance_server}')
         census = pd.read_sql(sql_statment, cnxn)
+        count_round_trip()
         #structure data and de-duplicate and re-upload
         census['FiscalYear'] = self.fiscal_year
         census['UploadDate'] = pd.Timestamp.today()
@@ -280,9 +312,14 @@ class DB:
             cnxn =  con().__call__(server_name = self.server_name)
             # start an instance of cursor object
             cursor = cnxn.cursor()
-            # execute sql statment
-            cursor.execute(sql_create_table)
-            cnxn.commit()
+            if UPLOAD(server_name=self.server_name, sql_table_name=new_table_name).is_unfinished():
+                ## the table was created by the upload being resumed
+                print(colored(f'Resuming the unfinished upload to {new_table_name}', 'green'))
+            else:
+                # execute sql statment
+                cursor.execute(sql_create_table)
+                count_round_trip()
+                cnxn.commit()
             print(F'Uploading {new_table_name} to {self.server_name}')
             # fill the new table
             self.upload_to_server(census, new_table_name, cnxn)
@@ -341,8 +378,9 @@ class DB:
         
         return sql_create_table
     
-    def upload_table_to_db (self, df, table_name, all_nvarchar=False):
-        
+    @timed(label='table_name')
+    def upload_table_to_db (self, df, table_name, all_nvarchar=False, raise_errors=False):
+        ## raise_errors: raise when the table can't be created or uploaded instead of only printing the error (checkpointed stages)
 
         # 
         #define the name of the table to create
@@ -354,13 +392,18 @@ class DB:
             cnxn =  con().__call__(server_name = self.server_name)
             # start an instance of cursor object
             cursor = cnxn.cursor()
-            # execute sql statment
-            cursor.execute(sql_create_table)
-            cnxn.commit()
+            if UPLOAD(server_name=self.server_name, sql_table_name=new_table_name).is_unfinished():
+                ## the table was created by the upload being resumed
+                print(colored(f'Resuming the unfinished upload to {new_table_name}', 'green'))
+            else:
+                # execute sql statment
+                cursor.execute(sql_create_table)
+                count_round_trip()
+                cnxn.commit()
             print(F'Uploading {new_table_name} to {self.server_name}')
 
             # upload the new table
-            self.upload_to_server(df, new_table_name, cnxn)
+            self.upload_to_server(df, new_table_name, cnxn, raise_errors=raise_errors)
             # close Connection
             cnxn.close()
             # print satus statement
@@ -370,7 +413,10 @@ class DB:
             # print satus statment
             print(colored(f'\033[1mWARNING: \n{table_name} upload to {new_table_name} FAILED\033[0m', 'red'))
             traceback.print_exc()
+            if raise_errors:
+                raise
             
+    @timed(label='table_name')
     def read_table(self, table_name):
         new_table_name =F'{self.static_db}.{self.static_schema}.{self.run}{table_name}' + str(self.fiscal_year)
         sql = F'SELECT * FROM {new_table_name}'
@@ -379,6 +425,7 @@ class DB:
             cnxn =  con().__call__(server_name = self.server_name)
             #read data
             df = pd.read_sql(sql,cnxn)
+            count_round_trip()
             # close Connection
             cnxn.close()
             # print satus statement
@@ -390,9 +437,8 @@ class DB:
             traceback.print_exc()
         return df
             
-    def upload_to_server(self, df, sql_table_name, cnxn):
-        cursor = cnxn.cursor()
-        cursor.fast_executemany = True
+    @timed(label='sql_table_name')
+    def upload_to_server(self, df, sql_table_name, cnxn, raise_errors=False):
         #convert nan to none (because sql server doesnt accept nan values)
         df = df.replace({np.nan:None})
         ### get the column names in the data frame
@@ -407,18 +453,20 @@ class DB:
                 names = names+'"'+i+'", '
                 values = values+'?,'
         try:
-            chunksize = 100000
-            for n in range(0,math.ceil(df.shape[0]/chunksize)):
-                cursor.executemany(F'''INSERT INTO {sql_table_name} ({names}) values ({values})'''
-                                   , df.iloc[n*chunksize:(n+1)*chunksize, :].values.tolist())
-                print(f"Total cumulative rows uploaded: {(n+1)*chunksize:,}")
+            ## chunks are committed one at a time and journaled, a failed upload resumes from the first chunk not committed
+            upload = UPLOAD(server_name=self.server_name, sql_table_name=sql_table_name)
+            new_cnxn = upload.upload(df, cnxn, connect=lambda: con().__call__(server_name = self.server_name), names=names, values=values)
+            ## the caller closes the connection it passed in, one opened on a retry is closed here
+            if new_cnxn is not cnxn:
+                new_cnxn.close()
             ### insert our dataframe into the table with fast excution
             # df =list(df.itertuples(index=False))
             # cursor.executemany(f'''INSERT INTO {sql_table_name} ({names}) values ({values})''', df)
-            cnxn.commit()
         except Exception:
             print('***ExcuteMany failed***')
             traceback.print_exc()
+            if raise_errors:
+                raise
             ## insert our dataframe into the table
             # for row in df.itertuples(index=False):
             #     cursor.execute(f'''INSERT INTO {sql_table_name} ({names}) values ({values})''', row)
\ No newline at end of file
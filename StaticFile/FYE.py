@@ -6,12 +6,16 @@ Import and Create Studlist
 By: Yassin Fahmy
 """
 import pandas as pd
+from TIMING import timed, count_round_trip
 from CONNECTION import CONNECTION as con
 import os
 from datetime import date
 from termcolor import colored
 from SOURCES import SOURCES
 
+## EL history read in this python session, keyed by file name, so the CY and K2 enrollment builds share one read
+_el_history = {}
+
 class FYE(SOURCES):
         
     def __init__(self, fiscal_year=None, run='Prelim', **kwargs):
@@ -36,6 +40,12 @@ class FYE(SOURCES):
         
         self.first_school_day = pd.Timestamp(self.previous_fiscal_year, 8, 1)
         
+        ## bump when the EL history query changes so older local copies are not reused
+        self.el_history_version = 1
+        self.el_history_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ELHistoryCache')
+        ## snapshot the EL history belongs to, set from the CY enrollment (today if the enrollment has no snapshot date)
+        self.el_history_date = None
+        
     def get_enrollment_from_database (self, year=None):
         '''Args:
             sql_statment (str): sql syntax to retrieve data from [Accountability].[dbo].[FiscalYearEnrollment] table for the current fiscal year
@@ -111,6 +121,7 @@ class FYE(SOURCES):
             # setup connection to db and read in data
             cnxn = con().__call__(server_name = self.server_name)
             stlist = pd.read_sql(sql_statment, cnxn)
+            count_round_trip()
             cnxn.close()
         except Exception as ex:
             print(colored('\033[1mFailed to retrieve data, error in "get_enrollment_from_database()"\033[0m', 'red'))
@@ -142,6 +153,7 @@ class FYE(SOURCES):
         return stlist
             
         
+    @timed()
     def format_enrollment(self, jted_file=None, raw_data_stlist=None, for_k2=False):
         ''' Method to format data of stlist as specified by historical code
         
@@ -356,8 +368,7 @@ class FYE(SOURCES):
         #----------------------------------------------------------------------remove duplicate records
         # then we need to make sure we have one record per student per school per grade.
         size_0 = stlist.shape[0]
-        stlist.sort_values(['SAISID','SchoolCode', 'StudentGrade', 'FAY', 'FTE'], ascending=False, inplace=True)
-        stlist = stlist[~stlist[['SAISID', 'SchoolCode', 'StudentGrade']].duplicated(keep='first')]
+        stlist = self.keep_top_per_key(stlist, ['SAISID', 'SchoolCode', 'StudentGrade'], priority=['FAY', 'FTE'], label='EnrollmentGrade')
         ## print an update of total records left
         print('''\nStudent records where de-duplicated to keep one grade enrollment per student. 
               Excluded records = {}
@@ -383,6 +394,10 @@ class FYE(SOURCES):
             year=self.previous_fiscal_year
         else:
             year= self.fiscal_year
+            ## the K2 build reuses the EL history of the CY snapshot
+            snapshot = pd.to_datetime(stlist['SnapShotDate'], errors='coerce').max() if 'SnapShotDate' in stlist.columns else pd.NaT
+            if pd.notna(snapshot):
+                self.el_history_date = snapshot.strftime('%Y%m%d')
             
         #implement temp el fep fix
         #get list of students who reclassified in the past 4 years
@@ -404,27 +419,58 @@ class FYE(SOURCES):
         
         return stlist     
     
+    def get_el_history(self):
+        '''
+        Distinct FiscalYear, SAISID, SchoolCode of every student who was FEP (ELLNeed 5) between fiscal_year-5 and fiscal_year,
+        which covers the 4 year windows of both the CY and the K2 (previous fiscal year) fixes.
+        Read from the server once per snapshot date and kept in memory and in ELHistoryCache, so reruns on the same snapshot do not query it again.
+        
+        Returns
+        -------
+        EL history dataframe
+        
+        '''
+        if self.el_history_date is None:
+            self.el_history_date = date.today().strftime('%Y%m%d')
+        file_name = f'ELHistory_v{self.el_history_version}_{self.fiscal_year}_{self.el_history_date}.pkl'
+        if file_name in _el_history:
+            return _el_history[file_name]
+        
+        file_path = os.path.join(self.el_history_folder, file_name)
+        if os.path.exists(file_path):
+            el_history = pd.read_pickle(file_path)
+        else:
+            ## retrieve the data
+            sql_statment = f'''SELECT Distinct FiscalYear, SAISID, SchoolId as SchoolCode
+                                FROM [Accountability].[dbo].[FiscalYearEnrollment]
+                                WHERE FiscalYear between {self.fiscal_year-5} AND {self.fiscal_year}
+                                    AND ELLNeed = 5'''
+            try:
+                # setup connection to db and read in data
+                cnxn = con().__call__(server_name = 'AACTASTPDDBVM01')
+                el_history  = pd.read_sql(sql_statment, cnxn)
+                count_round_trip()
+                cnxn.close()
+            except Exception as ex:
+                print(colored('\033[1mFailed to retrieve data\033[0m', 'red'))
+                print(ex)
+                raise
+            el_history['FiscalYear'] = el_history['FiscalYear'].astype('int16')
+            os.makedirs(self.el_history_folder, exist_ok=True)
+            el_history.to_pickle(file_path)
+        
+        _el_history[file_name] = el_history
+        return el_history
+    
+    @timed()
     def el_fep_fix(self, year):
-        ## retrieve the data
-        sql_statment = f'''SELECT Distinct FiscalYear, SAISID, SchoolId as SchoolCode
-                            FROM [Accountability].[dbo].[FiscalYearEnrollment]
-                            WHERE FiscalYear between {year-4} AND {year}
-                                AND ELLNeed = 5'''
-        try:
-            # setup connection to db and read in data
-            cnxn = con().__call__(server_name = 'AACTASTPDDBVM01')
-            fep_list  = pd.read_sql(sql_statment, cnxn)
-            cnxn.close()
-        except Exception as ex:
-            print(colored('\033[1mFailed to retrieve data\033[0m', 'red'))
-            print(ex)
-            
-        ## clean the data
+        ## students FEP at the school in any of the 4 years up to year, joined in memory from the cached EL history
+        if not (self.fiscal_year-5 <= year-4 and year <= self.fiscal_year):
+            raise ValueError(f'el_fep_fix covers {self.fiscal_year-5} to {self.fiscal_year}, {year} was requested')
+        el_history = self.get_el_history()
+        fep_list = el_history.loc[el_history.FiscalYear.between(year-4, year), ['SAISID', 'SchoolCode']].drop_duplicates()
         fep_list['ELFEP'] = 1
-        fep_list.sort_values(['SAISID', 'SchoolCode', 'FiscalYear'], ascending=False, inplace=True)
-        fep_list = fep_list[~fep_list.duplicated(['SAISID', 'SchoolCode'], keep='first')]
-        fep_list.drop('FiscalYear', axis=1, inplace=True)
-        return fep_list
+        return fep_list.reset_index(drop=True)
             
             
             
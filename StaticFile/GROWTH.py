@@ -5,6 +5,7 @@ Created on Mon Oct  3 15:58:19 2022
 @author: yfahmy
 """
 import pandas as pd
+from TIMING import timed, count_round_trip
 
 from termcolor import colored
 
@@ -86,7 +87,9 @@ class GROWTH(SOURCES):
         try:
             cnxn = con().__call__(server_name= self.server_name)
             assessments = pd.read_sql(sql_assess, cnxn)
+            count_round_trip()
             enrollment = pd.read_sql(sql_enroll, cnxn)
+            count_round_trip()
             
             # print(colored('\033[1mRetrieved data from database successfully\033[0m', 'green'))
             cnxn.close()
@@ -100,6 +103,7 @@ class GROWTH(SOURCES):
         
         return assessments
           
+    @timed()
     def format_sgp(self, raw_sgp):
         data = raw_sgp
         # ### select columns of interest
@@ -200,9 +204,8 @@ class GROWTH(SOURCES):
         ### essentailly enrolled grade from fiscal year enrollment should match enrolled grade from assessments table
         #sort by 'StateStudentID','AcademicSubject','WhenAssessedGrade', 'EnrolledGrade', 'ScaleScoreResult' in descending order (de-duplicating)
         size_0 =  assessments.shape[0]
-        assessments.sort_values(['StateStudentID','AcademicSubject','WhenAssessedGrade', 'EnrolledGrade', 'ScaleScoreResult'], inplace=True, ascending=False)
-        # keep the first duplicate to keep highest scale score
-        assessments = assessments [~assessments[['StateStudentID','AcademicSubject', 'WhenAssessedGrade']].duplicated(keep='first')]
+        # keep the entry with the highest enrolled grade then highest scale score
+        assessments = self.keep_top_per_key(assessments, ['StateStudentID','AcademicSubject', 'WhenAssessedGrade'], priority=['EnrolledGrade', 'ScaleScoreResult'], label='GrowthAssessments')
         print('''\nStudents' entries where de-duplicated to keep entries with highest score for each subject/grade
               Excluded entries = {}
               Total entries left = {}\n'''.format(size_0 - assessments.shape[0], assessments.shape[0]))
@@ -316,9 +319,8 @@ class GROWTH(SOURCES):
         
         ### remove entries where the same student took the same test more than once (if any are present)
         size_0 =  growth_data.shape[0]
-        growth_data.sort_values(['ID','CONTENT_AREA','WhenAssessedGrade', 'GRADE', 'SCALE_SCORE'], inplace=True, ascending=False)
-        # keep the first duplicate to keep highest scale score
-        growth_data = growth_data [~growth_data[['ID','CONTENT_AREA','WhenAssessedGrade']].duplicated(keep='first')]
+        # keep the entry with the highest grade then highest scale score
+        growth_data = self.keep_top_per_key(growth_data, ['ID','CONTENT_AREA','WhenAssessedGrade'], priority=['GRADE', 'SCALE_SCORE'], label='GrowthData')
         print('''\nStudents' entries where de-duplicated to keep entries with highest score for each subject/grade
               Excluded entries = {}
               Total entries left = {}\n'''.format(size_0 - growth_data.shape[0], growth_data.shape[0]))
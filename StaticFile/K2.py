@@ -6,6 +6,7 @@ Created on Wed May 10 10:50:37 2023
 """
 
 import pandas as pd
+from TIMING import timed
 from SOURCES import SOURCES
 from DATABASE import DB
 from FYE import FYE
@@ -19,6 +20,7 @@ class K2(SOURCES):
         
         
         
+    @timed()
     def format_data(self, py_enrollment, school_type, assessments):
 # =============================================================================
 #         cy_db =  DB(fiscal_year=self.fiscal_year, run=self.run)
@@ -67,8 +69,7 @@ class K2(SOURCES):
             #de-duplicate to keep one record per kid per school enrollment per grade giving priority to tested records
             #Make a tested indicator to give priority to keep records with a test score 
             sub_static['Tested'] = sub_static.ScaleScore.notnull()
-            sub_static.sort_values(['SAISID','SchoolCode','Tested', window, 'FAY'], ascending=False, inplace=True)
-            sub_static = sub_static[~sub_static[['SAISID', 'SchoolCode']].duplicated(keep='first')]
+            sub_static = self.keep_top_per_key(sub_static, ['SAISID', 'SchoolCode'], priority=['Tested', window, 'FAY'], label=f'K2{sub}Enrollment')
             # if ScaleScore.isnull() mark record as NotTested
             sub_static.loc[sub_static.ScaleScore.isnull() , 'AssessmentFamily'] = 'NotTested'
             ## concat the inner joined temp static file to static file
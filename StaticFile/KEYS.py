@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 14:27:05 2026
+
+@author: YFahmy
+Run scoped key dictionaries. SAISID, SchoolCode and DistrictCode are factorized once to dense int32 codes that are shared by
+every frame of the run, so the merges and groupbys of the staticfile build work on integers instead of object keys.
+Codes are only valid in this python session and are decoded back to the key values before anything is saved or uploaded.
+Keys are cast to int64 before they are coded, so '1234567' and 1234567 get the same code whatever dtype a reader returned.
+
+Usage:
+    keys = KEYS(fiscal_year=2023, run='Prelim')
+    enrollment = keys.encode(enrollment)
+    assessments = keys.encode(assessments)
+    staticfile = pd.merge(enrollment, assessments, on='SAISID')
+    staticfile = keys.decode(staticfile)
+"""
+import pandas as pd
+import numpy as np
+
+## values seen in this python session per (fiscal_year, run, column), the position of a value is its code
+_dictionaries = {}
+
+
+class KEYS:
+    '''
+    Parameters
+    ----------
+    fiscal_year : int
+        DESCRIPTION: fiscal year of the run, every run has its own dictionaries
+    run : str, The default is 'Prelim'
+        DESCRIPTION: run of the staticfile being built
+    columns : list of str, The default is ['SAISID', 'SchoolCode', 'DistrictCode']
+        DESCRIPTION: key columns encoded when present in a frame
+    '''
+    def __init__(self, fiscal_year=None, run='Prelim', columns=['SAISID', 'SchoolCode', 'DistrictCode']):
+        self.fiscal_year = fiscal_year
+        self.run = run
+        self.columns = columns
+
+    def get_dictionary(self, column):
+        return _dictionaries.get((self.fiscal_year, self.run, column), pd.Index([], dtype=np.int64))
+
+    def to_canonical(self, keys, column):
+        ## keys as Int64 (NA where missing), raises if a key is not a whole number instead of leaving it unmatched
+        numeric = pd.to_numeric(keys, errors='coerce')
+        invalid = (numeric.isna() & keys.notna()) | (numeric.notna() & (numeric % 1 != 0))
+        if invalid.any():
+            raise ValueError(f'{column} has keys that are not whole numbers (e.g. {keys[invalid].iloc[0]!r}), they can not be encoded')
+        return numeric.astype('Int64')
+
+    def encode(self, df, columns=None):
+        '''
+        Returns a copy of df with the key columns replaced by their int32 codes. Values not seen before in the run are appended
+        to the dictionary, so codes never change once given. Missing keys are coded -1 (they still match each other in a merge, as NaN does).
+        Keys are decoded as int64 whatever their dtype in df.
+        '''
+        if columns is None:
+            columns = self.columns
+        df = df.copy()
+        for column in [col for col in columns if col in df.columns]:
+            keys = self.to_canonical(df[column], column)
+            missing = keys.isna().to_numpy()
+            keys = keys.fillna(0).to_numpy(dtype=np.int64)
+            dictionary = self.get_dictionary(column)
+            values = pd.Index(np.unique(keys[~missing]))
+            new_values = values[dictionary.get_indexer(values) < 0]
+            if len(new_values) > 0:
+                dictionary = dictionary.append(new_values)
+                _dictionaries[(self.fiscal_year, self.run, column)] = dictionary
+            codes = dictionary.get_indexer(keys).astype(np.int32)
+            codes[missing] = -1
+            df[column] = codes
+        return df
+
+    def decode(self, df, columns=None):
+        ## copy of df with the int64 key values back, -1 and missing codes (from outer merges) are decoded to NaN
+        if columns is None:
+            columns = self.columns
+        df = df.copy()
+        for column in [col for col in columns if col in df.columns]:
+            codes = df[column].fillna(-1).to_numpy(dtype=np.int64)
+            dictionary = self.get_dictionary(column).to_numpy()
+            if len(dictionary) == 0:
+                df[column] = np.nan
+                continue
+            ## gathered with a placeholder code, then missing codes set to NaN (int dictionaries can't take NA in Index.take)
+            values = dictionary[np.where(codes < 0, 0, codes)]
+            missing = codes < 0
+            ## int64 is kept when no code is missing, keys become float with NaN otherwise
+            if missing.any():
+                values = pd.Series(values, index=df.index).mask(missing)
+            df[column] = values
+        return df
+
+    def clear(self):
+        ## forget the dictionaries of the run (frames still encoded can no longer be decoded)
+        for key in [key for key in _dictionaries.keys() if key[:2] == (self.fiscal_year, self.run)]:
+            del _dictionaries[key]
+
+#%%
+# keys = KEYS(fiscal_year=2023, run='Prelim')
+# stat.enrollment = keys.encode(stat.enrollment)
+# stat.enrollment = keys.decode(stat.enrollment)
@@ -5,6 +5,7 @@ Created on Tue Sep 20 12:24:49 2022
 By: Yassin Fahmy
 """
 import pandas as pd
+from TIMING import timed, count_round_trip
 pd.options.display.max_columns=200
 from CONNECTION import CONNECTION as con
 
@@ -30,6 +31,7 @@ class EDORG(SOURCES):
                             having min (fiscalYear) = {self.fiscal_year}'''
         cnxn = con().__call__(server_name)
         year1_schools = pd.read_sql(sql_statment, cnxn)
+        count_round_trip()
         cnxn.close()
         return year1_schools
     
@@ -43,6 +45,7 @@ class EDORG(SOURCES):
                               Where FiscalYear={self.fiscal_year}'''
         cnxn = con().__call__(server_name)
         corrections = pd.read_sql(sql_statment, cnxn)
+        count_round_trip()
         cnxn.close()
         return corrections
     
@@ -73,6 +76,7 @@ class EDORG(SOURCES):
         
         cnxn = con().__call__(server_name=self.server_name)
         schools = pd.read_sql(sql_statment, cnxn)
+        count_round_trip()
         cnxn.close()
         
         if self.raw_folder is not None:
@@ -80,6 +84,7 @@ class EDORG(SOURCES):
             self.save_data(schools, self.raw_folder, file_name)
         return schools     
          
+    @timed()
     def format_school_type(self, enrollment, raw_data_schools=None, remove_jteds=False, remove_private_schools=False):
         if raw_data_schools is None:
             
@@ -251,8 +256,7 @@ class EDORG(SOURCES):
         studlist.loc[studlist.StudentGrade.between(9,12), 'ModelType'] = '9-12'
         
         ##count number of students enrolled on test window only taking highest grade into account
-        studlist.sort_values(['SchoolCode', 'SAISID', 'ELAMathWindow', 'StudentGrade'], ascending =False, inplace=True)
-        studlist = studlist[~studlist.duplicated(['SchoolCode', 'SAISID'])].copy()
+        studlist = self.keep_top_per_key(studlist, ['SchoolCode', 'SAISID'], priority=['ELAMathWindow', 'StudentGrade'], label='SchoolTypeEnrollment').copy()
 
 
         ## how to identify schooltype right
@@ -5,6 +5,7 @@ Created on Tue Apr 11 15:59:11 2023
 @author: yfahmy
 """
 import pandas as pd
+import numpy as np
 from datetime import date
 import os
 
@@ -256,6 +257,9 @@ class SOURCES:
                                         ,5:'k12'}
         
 
+        ## rows dropped by keep_top_per_key, by label
+        self.dedup_audit = {}
+
         ## to be able to print status if using individual classes outside of static
         if print_status:
             print(F'\nFiscal year defined as {self.fiscal_year}')
@@ -273,6 +277,54 @@ class SOURCES:
             print(F'AZELLA KG placement deadline set to --> {self.kg_placement}')
             print(F'All other placment deadlines set to --> {self.first_placement}')
     
+    def keep_top_per_key(self, df, keys, priority=[], ascending=False, na_position='last', label=None):
+        '''
+        Keeps one row per key, the row that would come first after df.sort_values(keys + priority, ascending, na_position),
+        without sorting df. Keys are factorized to integer group codes and the priority columns are reduced one at a time
+        (lexicographically): each pass keeps the rows holding the best value of their group among the rows still tied.
+
+        Parameters
+        ----------
+        df : DataFrame
+            DESCRIPTION: records to de-duplicate
+        keys : list of str
+            DESCRIPTION: columns identifying a duplicate (missing keys are one key, like duplicated)
+        priority : list of str, The default is []
+            DESCRIPTION: columns deciding the winning row, in order of priority. First row of the key if empty
+        ascending : bool or list of bool, The default is False
+            DESCRIPTION: False keeps the highest value of a priority column, True the lowest
+        na_position : str, The default is 'last'
+            DESCRIPTION: 'last' missing values never win unless the whole group is missing, 'first' they always win
+        label : str, The default is None
+            DESCRIPTION: name of the step in dedup_audit, where the number of dropped rows is recorded
+
+        Returns
+        -------
+        df with one row per key, in the original row order
+        '''
+        if isinstance(ascending, bool):
+            ascending = [ascending]*len(priority)
+        if df.shape[0] == 0:
+            return df
+        group = df.groupby(keys, sort=False, dropna=False).ngroup().to_numpy()
+        candidates = np.arange(df.shape[0])
+        for column, asc in zip(priority, ascending):
+            ## ordinal codes of the values still tied (only the distinct values are sorted), turned into a score to maximize
+            codes, uniques = pd.factorize(df[column].iloc[candidates], sort=True)
+            if asc:
+                codes = np.where(codes >= 0, len(uniques)-1-codes, codes)
+            if na_position == 'first':
+                codes = np.where(codes < 0, len(uniques), codes)
+            best = np.full(group.max()+1, -2, dtype=np.int64)
+            np.maximum.at(best, group[candidates], codes)
+            candidates = candidates[codes == best[group[candidates]]]
+        ## first of the rows still tied in every group
+        candidates = candidates[~pd.Series(group[candidates]).duplicated().to_numpy()]
+        
+        if label is not None:
+            self.dedup_audit[label] = df.shape[0] - len(candidates)
+        return df.iloc[candidates]
+    
     def save_data(self, df, path_to_save, file_name):
         try:
             path_to_save = os.path.join(path_to_save, file_name)
@@ -5,6 +5,7 @@ Created on Fri Oct  7 18:39:27 2022
 @author: yfahmy
 """
 import pandas as pd
+from TIMING import timed
 from datetime import date
 from termcolor import colored
 from GROWTH import GROWTH
@@ -20,6 +21,19 @@ import pyreadr
 import numpy as np
 from SOURCES import SOURCES
 from K2 import K2 as K2
+from KEYS import KEYS
+from CHECKPOINT import CHECKPOINT
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+def _merge_student_sources_shard(settings, frames):
+    ## runs on one SAISID partition of the student sources (in a worker process if asked), built from plain settings and frames only
+    shard = STATIC.__new__(STATIC)
+    shard.__dict__.update(settings)
+    shard.__dict__.update(frames)
+    shard.dedup_audit = {}
+    shard.merge_student_sources()
+    return shard.staticfile, shard.dedup_audit
 
 class STATIC(SOURCES):
     '''
@@ -112,11 +126,40 @@ class STATIC(SOURCES):
         self.growth = GROWTH(fiscal_year=self.fiscal_year, run=self.run, print_status=False,**kwargs)
 
         self.k2 = K2(fiscal_year=self.fiscal_year, run=self.run, print_status=False, **kwargs)
+        
+        ## student level sources partitioned by SAISID when the staticfile is built in shards, and the accessors the shards don't need
+        self.shard_sources = ['enrollment', 'assessments', 'el', 'sped', 'chronic_absenteeisim', 'sgp']
+        self.accessors = ['fye', 'ed_org', 'azella', 'assess', 'census', 'db', 'ca', 'growth', 'k2', 'keys']
+        
+        ## SAISID, SchoolCode and DistrictCode as int32 codes shared by every frame of the run (decoded before saving/uploading)
+        self.keys = KEYS(fiscal_year=self.fiscal_year, run=self.run)
+        self.encoded_frames = []
     def format_schooltype(self):
         self.enrollment = self.fye.format_enrollment()
         self.school_type = self.ed_org.format_school_type(enrollment=self.enrollment, remove_jteds=self.remove_jteds, remove_private_schools=self.remove_private_schools)
         
-    def format_basefiles(self):
+    def encode_keys(self, *frame_names):
+        ## replace the key columns of the frames (attribute names) with the run's int32 codes
+        for name in frame_names:
+            if (name not in self.encoded_frames) and isinstance(getattr(self, name, None), pd.DataFrame):
+                setattr(self, name, self.keys.encode(getattr(self, name)))
+                self.encoded_frames.append(name)
+    
+    def decode_keys(self):
+        ## original key values back in every encoded frame
+        for name in self.encoded_frames:
+            setattr(self, name, self.keys.decode(getattr(self, name)))
+        self.encoded_frames = []
+    
+    @timed()
+    def format_basefiles(self, encode_keys=False):
+        '''
+        Parameters
+        ----------
+        encode_keys : bool, The default is False
+            DESCRIPTION: if True, SAISID/SchoolCode/DistrictCode are int32 codes in the formatted frames until format_staticfile or an upload decodes them.
+                         Keys are decoded as int64, whatever dtype the readers returned
+        '''
         
         ## produce static folder components
         self.jted = self.ed_org.format_jteds()
@@ -133,23 +176,16 @@ class STATIC(SOURCES):
         
         self.sped = self.census.format_census()
         
+        if encode_keys:
+            self.encode_keys('enrollment', 'py_enrollment', 'school_type', 'assessments', 'el', 'sped')
+        
         self.k2_sf = self.k2.format_data(self.py_enrollment, self.school_type, self.assessments)
         
-        if self.server_name == 'AACTASTPDDBVM02':
-            self.chronic_absenteeisim = self.db.read_table(table_name='ChronicAbsenteeisim')
-            self.sgp = self.db.read_table(table_name='SGP')
-            print(f'SGP file shape: {self.sgp.shape}')
-            
-        elif self.server_name == 'AACTASTPDDBVM01':
-            try:
-                self.chronic_absenteeisim = self.db.read_table(table_name='ChronicAbsenteeisim')
-            except:
-                self.chronic_absenteeisim = self.ca.format_raw_ca()
-            try:
-                self.sgp = self.db.read_table(table_name='SGP')
-                print(f'SGP file shape: {self.sgp.shape}')
-            except:
-                print('SGP File table not found on 02')
+        self.chronic_absenteeisim = self.read_chronic_absenteeisim()
+        self.sgp = self.read_sgp()
+        
+        if encode_keys:
+            self.encode_keys('k2_sf', 'chronic_absenteeisim', 'sgp')
                 
         print(f'''
             Enrollment file shape: {self.enrollment.shape}
@@ -161,6 +197,125 @@ class STATIC(SOURCES):
             k2_staticfile shape: {self.k2_sf.shape}''')
         
         
+    def read_chronic_absenteeisim(self):
+        if self.server_name == 'AACTASTPDDBVM01':
+            try:
+                return self.db.read_table(table_name='ChronicAbsenteeisim')
+            except:
+                return self.ca.format_raw_ca()
+        return self.db.read_table(table_name='ChronicAbsenteeisim')
+    
+    def read_sgp(self):
+        ## None if the SGP table was not uploaded to 01 yet (the staticfile is then built without growth)
+        if self.server_name == 'AACTASTPDDBVM01':
+            try:
+                sgp = self.db.read_table(table_name='SGP')
+            except:
+                print('SGP File table not found on 02')
+                return None
+        else:
+            sgp = self.db.read_table(table_name='SGP')
+        print(f'SGP file shape: {sgp.shape}')
+        return sgp
+    
+    @timed()
+    def format_with_checkpoints(self, checkpoint_folder, keep_all_schools=False, rerun=[], snapshot=False, sgp_file=None, upload=False, encode_keys=False, **staticfile_kwargs):
+        '''
+        format_basefiles and format_staticfile (and optionally the snapshot, SGP upload and the uploads of the results) run as stages
+        that are checkpointed in checkpoint_folder. Running it again after a failure resumes from the last completed stage,
+        and only the stages whose settings or upstream data changed are run again.
+
+        Parameters
+        ----------
+        checkpoint_folder : str
+            DESCRIPTION: folder of the checkpoints, one per run (e.g. ...\checkpoints\PrelimV6)
+        keep_all_schools : bool, The default is False
+            DESCRIPTION: passed to format_staticfile
+        rerun : list of str or 'all', The default is []
+            DESCRIPTION: stages to run even if their checkpoint is valid. Source stages are run again on their own when the row count or
+                         checksum of their snapshot table changes, and always when they read the live server
+        snapshot : bool, The default is False
+            DESCRIPTION: if True, the raw tables are snapshot and chronic absenteeisim uploaded before the base files are formatted
+        sgp_file : str, The default is None
+            DESCRIPTION: path of the R-SGP file to format and upload, the SGP table on the server is read if None
+        upload : bool, The default is False
+            DESCRIPTION: if True, the school type and the staticfile are uploaded as the last stages
+        encode_keys : bool, The default is False
+            DESCRIPTION: if True, the staticfile is built on int32 key codes (see format_basefiles)
+        **staticfile_kwargs : passed to format_staticfile (n_shards, n_workers)
+        '''
+        ## tables of the run each source stage reads, fingerprinted on the server so a changed table invalidates the checkpoint
+        source_tables = {'jted':['EdOrg'], 'enrollment':['FiscalYearEnrollment'], 'py_enrollment':['FiscalYearEnrollment'], 'school_type':['EdOrg']
+                         , 'assessments':['Assessments'], 'el':['Azella'], 'sped':['Census'], 'chronic_absenteeisim':['ChronicAbsenteeisim'], 'sgp':['SGP']}
+        if (self.server_name == 'AACTASTPDDBVM01') and (rerun != 'all'):
+            ## the live tables are not fingerprinted, stages reading them always run (chronic absenteeisim and SGP are read from 02)
+            rerun = list(rerun) + ['jted', 'enrollment', 'py_enrollment', 'school_type', 'assessments', 'el', 'sped']
+        checkpoint = CHECKPOINT(folder=checkpoint_folder, rerun=rerun)
+        settings = checkpoint.get_settings(self.get_run_settings())
+        ## source stages read the snapshot, so they are downstream of it when it is part of the run
+        sources = ['snapshot'] if snapshot else []
+        
+        stages = []
+        if snapshot:
+            stages += [('snapshot', self.snapshot_sources, [])]
+        stages += [('jted', lambda: {'jted':self.ed_org.format_jteds()}, sources)
+                   ,('enrollment', lambda: {'enrollment':self.fye.format_enrollment()}, sources)
+                   ,('py_enrollment', lambda: {'py_enrollment':self.fye.format_enrollment(for_k2=True)}, sources)
+                   ,('school_type', lambda: {'school_type':self.ed_org.format_school_type(enrollment=self.enrollment, remove_jteds=self.remove_jteds
+                                                                                          , remove_private_schools=self.remove_private_schools)}, sources + ['enrollment'])
+                   ,('assessments', lambda: {'assessments':self.assess.format_assessments()}, sources)
+                   ,('el', lambda: {'el':self.azella.format_azella()}, sources)
+                   ,('sped', lambda: {'sped':self.census.format_census()}, sources)
+                   ,('k2_sf', lambda: {'k2_sf':self.k2.format_data(self.py_enrollment, self.school_type, self.assessments)}, ['py_enrollment', 'school_type', 'assessments'])
+                   ,('chronic_absenteeisim', lambda: {'chronic_absenteeisim':self.read_chronic_absenteeisim()}, sources)]
+        if sgp_file is None:
+            stages += [('sgp', lambda: {'sgp':self.read_sgp()}, sources)]
+        else:
+            ## the R file is part of the settings of the stage so a new file is formatted and uploaded again
+            sgp_settings = settings + json.dumps([sgp_file, os.path.getsize(sgp_file), os.path.getmtime(sgp_file)])
+            stages += [('sgp', lambda: self.format_upload_sgp(file_path=sgp_file, raise_errors=True) or {'sgp':self.sgp}, sources, sgp_settings)]
+            ## the stage writes the SGP table, so it is keyed by the R file only
+            source_tables.pop('sgp')
+        base_files = [stage[0] for stage in stages if stage[0] != 'snapshot']
+        stages += [('staticfile', lambda: self.checkpoint_staticfile(keep_all_schools, encode_keys, **staticfile_kwargs), base_files)]
+        if upload:
+            ## a failed upload raises, so it is not recorded as completed and runs again on the next call
+            stages += [('upload_school_type', lambda: self.upload_school_type(raise_errors=True) or {}, ['school_type'])
+                       ,('upload_staticfile', lambda: self.upload_staticfile(raise_errors=True) or {}, ['staticfile'])]
+        
+        for stage in stages:
+            name, run_stage, upstream = stage[:3]
+            stage_settings = stage[3] if len(stage) > 3 else settings
+            if name in source_tables:
+                ## read after the snapshot stage so a new snapshot is picked up
+                stage_settings = stage_settings + json.dumps([self.db.get_table_fingerprint(table) for table in source_tables[name]], default=str)
+            outputs = checkpoint.run_stage(name, run_stage, upstream=upstream, settings=stage_settings)
+            for attribute, df in outputs.items():
+                setattr(self, attribute, df)
+    
+    def get_run_settings(self):
+        ## settings the formatted files depend on, the key of the checkpoints of the run
+        names = ['fiscal_year', 'run', 'server_name', 'passed_integrity', 'exclude_tuittion_payer_code_2', 'remove_jteds', 'remove_private_schools'
+                 , 'count_fay_in_schooltype', 'federal_n_count', 'state_n_count', 'kg_placement', 'first_placement', 'end_window', 'last_school_day'
+                 , 'act_window', 'aasa_window', 'science_window', 'msaa_window', 'aspire_window', 'reg_assessement_types', 'alt_assessement_types'
+                 , 'academic_subjects', 'subject_grade_map', 'test_type_grade_map', 'not_eligible_testing_grades', 'performance_level_map'
+                 , 'azella_proficiency_map', 'federal_school_type_map']
+        return {name:getattr(self, name) for name in names}
+    
+    def snapshot_sources(self):
+        ## snapshot of the raw tables and the chronic absenteeisim upload (no frames to checkpoint)
+        self.snapshot_raw_data()
+        self.format_upload_chronic_absenteeisim(raise_errors=True)
+        return {}
+    
+    def checkpoint_staticfile(self, keep_all_schools=False, encode_keys=False, **staticfile_kwargs):
+        ## base files are kept with their original keys in the checkpoints, so they are encoded for the build only
+        if encode_keys:
+            self.encode_keys(*self.shard_sources, 'k2_sf', 'school_type')
+        self.format_staticfile(keep_all_schools=keep_all_schools, **staticfile_kwargs)
+        return {'staticfile':self.staticfile}
+    
+    @timed()
     def snapshot_raw_data(self):
         self.db.take_snapshot()
         
@@ -168,7 +323,7 @@ class STATIC(SOURCES):
         # get data from assessment and enrollment tables and produce raw growth
         pass
     
-    def format_upload_sgp(self, file_path, upload_to_db=True, all_nvarchar=False):
+    def format_upload_sgp(self, file_path, upload_to_db=True, all_nvarchar=False, raise_errors=False):
         #read r file
         print('Reading raw R-SGP File')
         result = pyreadr.read_r(file_path)
@@ -179,7 +334,7 @@ class STATIC(SOURCES):
         # upload SGP
         if upload_to_db:
             table_name = 'SGP'
-            self.db.upload_table_to_db(df = self.sgp, table_name=table_name, all_nvarchar=all_nvarchar)
+            self.db.upload_table_to_db(df = self.sgp, table_name=table_name, all_nvarchar=all_nvarchar, raise_errors=raise_errors)
         
 # =============================================================================
 #     def format_sgp(self):
@@ -208,33 +363,38 @@ class STATIC(SOURCES):
         table_name = 'StaticFile'
         self.db.drop_tables_in_run(table_name, table_prefix=table_prefix.capitalize())
     
-    def upload_staticfile(self):
+    def upload_staticfile(self, raise_errors=False):
         table_name = 'StaticFile'
-        self.db.upload_table_to_db(df = self.staticfile, table_name=table_name)
+        self.db.upload_table_to_db(df = self.staticfile, table_name=table_name, raise_errors=raise_errors)
     
-    def upload_school_type(self):
+    def upload_school_type(self, raise_errors=False):
+        self.decode_keys()
         table_name = 'SchoolType'
-        self.db.upload_table_to_db(df = self.school_type, table_name=table_name)
+        self.db.upload_table_to_db(df = self.school_type, table_name=table_name, raise_errors=raise_errors)
         
-    def format_upload_chronic_absenteeisim(self, upload_to_db=True):
+    def format_upload_chronic_absenteeisim(self, upload_to_db=True, raise_errors=False):
         chronic_absenteeisim = self.ca.format_raw_ca()
         
         ##upload CA to db
         if upload_to_db:
             table_name = 'ChronicAbsenteeisim'
-            self.db.upload_table_to_db(df = chronic_absenteeisim, table_name=table_name) 
+            self.db.upload_table_to_db(df = chronic_absenteeisim, table_name=table_name, raise_errors=raise_errors)
         ## return result if upload_to_db is false
         else:
             return chronic_absenteeisim
         
         
  
-    def format_staticfile(self, keep_all_schools=False):
+    @timed()
+    def merge_student_sources(self):
+        '''
+        Student level part of the staticfile (enrollment, assessments, growth, AZELLA, sped and chronic absence).
+        Every merge and de-duplication here is keyed on SAISID, so it can be built on any partition of the students.
+        '''
         ##-------------------------------------------------------------------- merge enrollment to assessments
         ##inner join on saisid and grade from enrollment and saisid and assessed grade from assessment.
         ## this allows to match enrollment record to assessment record in case kid got promoted between testing windows
         ## and also allows us to keep only the kids test record for a certain grade that corrosponds to a certain enrollment grade
-        print('Starting staticFile formatting')
         print('Merging in Assessments')
         self.staticfile = pd.DataFrame()
         for subject in self.subject_grade_map.keys():
@@ -262,8 +422,7 @@ class STATIC(SOURCES):
             #de-duplicate to keep one record per kid per school enrollment per grade giving priority to tested records
             #Make a tested indicator to give priority to keep records with a test score 
             sub_static['Tested'] = sub_static.ScaleScore.notnull()
-            sub_static.sort_values(['SAISID','SchoolCode','Tested', window, 'FAY'], ascending=False, inplace=True)
-            sub_static = sub_static[~sub_static[['SAISID', 'SchoolCode']].duplicated(keep='first')]
+            sub_static = self.keep_top_per_key(sub_static, ['SAISID', 'SchoolCode'], priority=['Tested', window, 'FAY'], label=f'{sub}Enrollment')
             # if ScaleScore.isnull() mark record as NotTested
             sub_static.loc[sub_static.ScaleScore.isnull() , 'AssessmentFamily'] = 'NotTested'
             ## concat the inner joined static file to enrollment records
@@ -275,9 +434,7 @@ class STATIC(SOURCES):
         grades_mask = self.enrollment.StudentGrade.isin(self.not_eligible_testing_grades)
         remainder_records = self.enrollment[grades_mask].copy()
         ## deduplicate enrollment records to keep one entry per student per school
-        remainder_records.sort_values(['SAISID','SchoolCode','FAY', 'StudentGrade', 'EntryDate', 'AOIFTE']
-                           ,ascending=False, inplace=True)
-        remainder_records = remainder_records[~remainder_records[['SAISID', 'SchoolCode']].duplicated(keep='first')]
+        remainder_records = self.keep_top_per_key(remainder_records, ['SAISID', 'SchoolCode'], priority=['FAY', 'StudentGrade', 'EntryDate', 'AOIFTE'], label='NotEligibleGrades')
         remainder_records.loc[:,'AssessmentFamily'] = 'NotEligible'
         
         ## Exclude records where kids is in 2 grades in same school by outer merging then taking records not in the staticfile already (vectorized method)
@@ -301,8 +458,7 @@ class STATIC(SOURCES):
         ##---------------------add growth and prior year test results
         try:
             print('Merging in Growth')
-            self.sgp.sort_values(['FiscalYear', 'SAISID', 'Subject', 'StudentGrade', 'ScaleScore'], inplace=True, ascending=False)
-            self.sgp = self.sgp [~self.sgp.duplicated(['FiscalYear', 'SAISID', 'Subject', 'StudentGrade'])]
+            self.sgp = self.keep_top_per_key(self.sgp, ['FiscalYear', 'SAISID', 'Subject', 'StudentGrade'], priority=['ScaleScore'], label='SGP')
             self.staticfile = pd.merge(self.staticfile, self.sgp, on=['FiscalYear', 'SAISID', 'Subject', 'StudentGrade'], how='left', suffixes=('','_sgp'))
         except:
             extra_cols = ['ScaleScore_sgp', 'Performance_sgp']
@@ -349,6 +505,68 @@ class STATIC(SOURCES):
         self.staticfile = pd.merge(self.staticfile, self.chronic_absenteeisim, on=['FiscalYear', 'SAISID', 'SchoolCode'], how='left', suffixes=('','_ca'))
         '''do we want to exclude chronic values for those that failed ADMIntegrityAttend?'''
         
+    def get_shard(self, saisid, n_shards):
+        ## shard of each SAISID, hashed from the numeric value so the same student falls in the same shard in every source
+        saisid = pd.to_numeric(saisid, errors='coerce').to_numpy(dtype='float64')
+        return pd.util.hash_array(saisid) % n_shards
+    
+    @timed()
+    def merge_student_sources_sharded(self, n_shards, n_workers=None, use_processes=False):
+        '''
+        merge_student_sources run on n_shards SAISID hash partitions of the student sources, on threads or (if use_processes) a process pool.
+        Rows are ordered by shard instead of by subject, the records are the same as the single frame build.
+        With use_processes the calling script must start the run under if __name__ == '__main__': (windows starts the workers by
+        importing the script again), see the Main Script.
+        '''
+        sources = [name for name in self.shard_sources if isinstance(getattr(self, name, None), pd.DataFrame)]
+        ## the shards only get the plain settings and their part of the student sources, not the accessors or the other frames
+        settings = {key:value for key, value in vars(self).items() if (key not in self.accessors) and (key != 'dedup_audit')
+                    and isinstance(value, (str, int, float, bool, list, tuple, dict, type(None), pd.Timestamp))}
+        settings['static_folder'] = None
+        shard_frames = [{} for i in range(n_shards)]
+        for name in sources:
+            df = getattr(self, name)
+            partition = self.get_shard(df.SAISID, n_shards)
+            for i in range(n_shards):
+                shard_frames[i][name] = df[partition == i]
+        
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        n_workers = max(1, min(n_workers, n_shards))
+        print(f'Building the student records in {n_shards} shards on {n_workers} {"processes" if use_processes else "threads"}')
+        if n_workers == 1:
+            results = [_merge_student_sources_shard(settings, frames) for frames in shard_frames]
+        else:
+            executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+            with executor_class(max_workers=n_workers) as executor:
+                results = list(executor.map(_merge_student_sources_shard, [settings]*n_shards, shard_frames))
+        
+        self.staticfile = pd.concat([staticfile for staticfile, dedup_audit in results], axis=0)
+        ## rows dropped by each de-duplication step, summed over the shards
+        for staticfile, dedup_audit in results:
+            for label, n_dropped in dedup_audit.items():
+                self.dedup_audit[label] = self.dedup_audit.get(label, 0) + n_dropped
+    
+    @timed()
+    def format_staticfile(self, keep_all_schools=False, n_shards=1, n_workers=None, use_processes=False):
+        '''
+        Parameters
+        ----------
+        keep_all_schools : bool, The default is False
+            DESCRIPTION: if True, schools in the school type file with no student records are kept
+        n_shards : int, The default is 1
+            DESCRIPTION: number of SAISID hash partitions the student level merges are built in (1 builds them in one frame)
+        n_workers : int, The default is None
+            DESCRIPTION: number of threads (or processes) building the shards, os.cpu_count() if None. Only used if n_shards > 1
+        use_processes : bool, The default is False
+            DESCRIPTION: if True, the shards are built in a process pool. The script has to run under if __name__ == '__main__': then
+        '''
+        print('Starting staticFile formatting')
+        if n_shards > 1:
+            self.merge_student_sources_sharded(n_shards=n_shards, n_workers=n_workers, use_processes=use_processes)
+        else:
+            self.merge_student_sources()
+        
         ##---------------------add K2 data
         print('Adding in k2 data')
         self.staticfile = pd.concat([self.staticfile, self.k2_sf], axis=0)
@@ -375,6 +593,11 @@ class STATIC(SOURCES):
         fill_na_cols_zeros = {col:0 for col in fill_na_cols_zeros}
         self.staticfile.fillna(fill_na_cols_zeros, inplace=True)
         
+        ## original key values back in the staticfile and the base files
+        if len(self.encoded_frames) > 0:
+            self.staticfile = self.keys.decode(self.staticfile)
+            self.decode_keys()
+        
         #rearrange cols
         self.staticfile = self.staticfile[ [ col for col in self.staticfile.columns if col != 'SnapShotDate' ] + ['SnapShotDate']]
         
@@ -0,0 +1,500 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:20:37 2026
+
+@author: YFahmy
+Synthetic statewide data in the shape of the raw tables the StaticFile is built from (FiscalYearEnrollment, StudentAssessment,
+AZELLA, EdOrg, Census, SGP, GradRate, DropOut and ChronicAbsenteeisim). No student data is used, every value is drawn from
+distributions close to the statewide ones so the tables can be used to benchmark the pipelines on any machine.
+
+Students have one latent achievement score that drives assessments, SGP and AZELLA so that the joins and the components
+behave like they do on real data (proficiency rates, growth bands, reclassification, etc.)
+"""
+import pandas as pd
+import numpy as np
+import os
+from SOURCES import SOURCES
+
+class SYNTHETIC(SOURCES):
+    '''
+    Parameters
+    ----------
+    fiscal_year : int
+        DESCRIPTION: fiscal year of the synthetic data
+    n_students : int, The default is 100000
+        DESCRIPTION: number of students statewide (10k to 5M)
+    students_per_school : int, The default is 450
+        DESCRIPTION: average school size, used to get the number of schools
+    seed : int, The default is 0
+        DESCRIPTION: seed of the random generator. Same seed and n_students give the same students in consecutive fiscal years
+    cohort_year : int, The default is fiscal_year
+        DESCRIPTION: the year in which the students are spread over k-12. Set it to the current year when generating the prior year
+                     so both years have the same students one grade apart
+    '''
+    def __init__(self, fiscal_year=None, run='Prelim', n_students=100000, students_per_school=450, seed=0, cohort_year=None, **kwargs):
+        super().__init__(fiscal_year=fiscal_year, run=run, print_status=False, **kwargs)
+        self.n_students = int(n_students)
+        self.n_schools = max(20, self.n_students // students_per_school)
+        self.n_districts = max(5, self.n_schools // 8)
+        self.seed = seed
+        if cohort_year is None:
+            self.cohort_year = self.fiscal_year
+        else:
+            self.cohort_year = cohort_year
+        self.snapshot_date = pd.Timestamp(self.fiscal_year, 6, 15)
+        self.first_school_day = pd.Timestamp(self.previous_fiscal_year, 8, 1)
+        ## grades served by each school type and the share of schools of that type
+        self.school_types = {'k-5': ([-1,1,2,3,4,5], 0.33)
+                             ,'6-8': ([6,7,8], 0.13)
+                             ,'k-8': ([-1,1,2,3,4,5,6,7,8], 0.20)
+                             ,'9-12': ([9,10,11,12], 0.17)
+                             ,'k-12': ([-1,1,2,3,4,5,6,7,8,9,10,11,12], 0.05)
+                             ,'k-2': ([-1,1,2], 0.03)
+                             ,'Alt 9-12': ([9,10,11,12], 0.09)}
+        self.ethnicities = {'Hispanic or Latino':0.46
+                            ,'White':0.36
+                            ,'Black/African American':0.06
+                            ,'American Indian or Alaska Native':0.04
+                            ,'Asian':0.03
+                            ,'Multiple Races':0.04
+                            ,'Native Hawaiian or Pacific Islander':0.01}
+        ## share of students per performance level (1 to 4) and the level names in the assessment table
+        self.performance_shares = [0.33, 0.28, 0.25, 0.14]
+        self.performance_names = {1:'Minimally Proficient', 2:'Partially Proficient', 3:'Proficient', 4:'Highly Proficient'}
+        ## subgroups in the GradRate and DropOut tables
+        self.rate_subgroups = ['All', 'SPED', 'Foster Care', 'Low SES', 'Military', 'ELL Fep', 'Homeless'] + list(self.ethnicities.keys())
+        ## schools, students and enrollment are reused by most tables so they are only drawn once
+        self.cache = {}
+
+    def rng(self, salt):
+        ## independent random stream per table, same stream for the same students across fiscal years
+        return np.random.default_rng([self.seed, self.n_students, salt])
+
+    def generate(self):
+        ## all tables in a dict keyed by the table name used in the db snapshot
+        print(f'Generating synthetic data for {self.n_students:,} students in {self.n_schools:,} schools')
+        data = {'EdOrg': self.make_edorg()
+                ,'FiscalYearEnrollment': self.make_enrollment()
+                ,'PYFiscalYearEnrollment': self.make_enrollment(year=self.previous_fiscal_year)
+                ,'Assessments': self.make_assessments()
+                ,'Azella': self.make_azella()
+                ,'Census': self.make_census()
+                ,'SGP': self.make_sgp()
+                ,'ChronicAbsenteeisim': self.make_chronic_absenteeisim()
+                ,'GradRate': self.make_gradrate()
+                ,'DropOut': self.make_dropout()
+                ,'FEPList': self.make_fep_list()
+                ,'AspireParticipation': self.make_aspire_participation()
+                ,'Year1Schools': self.make_first_year_schools()
+                ,'ModelCorrections': self.make_model_corrections()}
+        for name, df in data.items():
+            print(f'{name} shape: {df.shape}')
+        return data
+
+    def save(self, data, folder):
+        ## save every table as a pickle to be picked up by the benchmarks
+        os.makedirs(folder, exist_ok=True)
+        for name, df in data.items():
+            df.to_pickle(os.path.join(folder, f'{name}{self.fiscal_year}.pkl'))
+
+    #================================================================= schools and students
+    def get_schools(self):
+        if 'schools' in self.cache:
+            return self.cache['schools']
+        rng = self.rng(1)
+        types = list(self.school_types.keys())
+        shares = np.array([i[1] for i in self.school_types.values()])
+        schools = pd.DataFrame({'SchoolKey': 1000 + np.arange(self.n_schools)
+                                ,'SchoolModel': rng.choice(types, size=self.n_schools, p=shares/shares.sum())
+                                ,'DistrictKey': 100 + rng.integers(0, self.n_districts, self.n_schools)
+                                ,'Size': rng.lognormal(0, 0.5, self.n_schools)})
+        schools['IsCharterSchool'] = rng.random(self.n_schools) < 0.2
+        schools['IsAOI'] = rng.random(self.n_schools) < 0.05
+        schools['IsAlternativeSchoolAccountability'] = schools.SchoolModel=='Alt 9-12'
+        schools['Day1'] = self.first_school_day + pd.to_timedelta(rng.integers(0, 12, self.n_schools), unit='D')
+        self.cache['schools'] = schools
+        return schools
+
+    def get_students(self, year=None):
+        ## base students of the year, the same SAISID keeps its latent score and demographics across years
+        if year is None:
+            year = self.fiscal_year
+        if ('students', year) in self.cache:
+            return self.cache[('students', year)]
+        rng = self.rng(2)
+        n = self.n_students
+        students = pd.DataFrame({'SAISID': 100000000 + rng.permutation(n*2)[:n]
+                                 ,'Ability': rng.normal(0, 1, n)
+                                 ,'Ethnicity': rng.choice(list(self.ethnicities.keys()), size=n, p=list(self.ethnicities.values()))
+                                 ,'Gender': rng.choice(['F', 'M'], size=n)
+                                 ,'CohortYear': self.cohort_year + rng.integers(0, 14, n)
+                                 ,'SPED': (rng.random(n) < 0.13).astype(int)
+                                 ,'EconomicDisadvantage': (rng.random(n) < 0.45).astype(int)
+                                 ,'Homeless': (rng.random(n) < 0.03).astype(int)
+                                 ,'FosterCare': (rng.random(n) < 0.01).astype(int)
+                                 ,'Military': (rng.random(n) < 0.02).astype(int)
+                                 ,'Migrant': (rng.random(n) < 0.01).astype(int)
+                                 ,'ELStart': rng.random(n)
+                                 ,'SchoolDraw': rng.random(n)
+                                 ,'Mobile': rng.random(n) < 0.07})
+        ## cohorts are the graduation year so grade = 12 - (cohort - fiscal year), -1 is kindergarten
+        students['Grade'] = 12 - (students.CohortYear - year)
+        ## students outside k-12 in this year are not enrolled
+        students = students[students.Grade.between(-1,12)].copy()
+        ## EL students are mostly in the early grades and leave EL as they grow
+        el_rate = np.where(students.Grade <= 3, 0.2, np.where(students.Grade <= 8, 0.11, 0.06))
+        students['EL'] = (students.ELStart < el_rate).astype(int)
+        students['FEP'] = ((students.ELStart >= el_rate) & (students.ELStart < el_rate + 0.04)).astype(int)
+        self.cache[('students', year)] = students
+        return students
+
+    def assign_schools(self, students, schools, draw_col='SchoolDraw'):
+        ## pick a school that serves the student's grade, bigger schools get more students
+        school_code = np.zeros(len(students), dtype=np.int64)
+        for grade in range(-1, 13):
+            served = schools[schools.SchoolModel.map(lambda x: grade in self.school_types[x][0])]
+            if len(served)==0:
+                continue
+            mask = (students.Grade==grade).to_numpy()
+            weights = served.Size.to_numpy()
+            cum_weights = np.cumsum(weights) / weights.sum()
+            idx = np.searchsorted(cum_weights, students.loc[mask, draw_col].to_numpy(), side='right')
+            school_code[mask] = served.SchoolKey.to_numpy()[np.minimum(idx, len(served)-1)]
+        return school_code
+
+    #================================================================= raw tables
+    def make_edorg(self):
+        schools = self.get_schools()
+        n = len(schools)
+        edorg = pd.DataFrame({'FiscalYear': self.fiscal_year
+                              ,'SchoolKey': schools.SchoolKey
+                              ,'DistrictKey': schools.DistrictKey
+                              ,'SchoolName': 'Synthetic School ' + schools.SchoolKey.astype(str)
+                              ,'CTDS': (schools.DistrictKey*10000 + schools.SchoolKey).astype(str)
+                              ,'DistrictName': 'Synthetic District ' + schools.DistrictKey.astype(str)
+                              ,'DistrictCTDS': (schools.DistrictKey*10000).astype(str)
+                              ,'IsCharterSchool': schools.IsCharterSchool
+                              ,'IsAOI': schools.IsAOI
+                              ,'IsAlternativeSchoolAccountability': schools.IsAlternativeSchoolAccountability
+                              ,'JTEDTypeKey': 0
+                              ,'IsValidSchool': True
+                              ,'IsPublicSchool': True
+                              ,'IsPrivateSchool': False
+                              ,'IsExceptionalEducationFacility': False
+                              ,'CountyTypeDesc': 'Maricopa'
+                              ,'DistrictCounty': 'Maricopa'
+                              ,'UploadDate': self.snapshot_date})
+        ## a few jted campuses (excluded from grades)
+        jted = self.rng(3).random(n) < 0.01
+        edorg.loc[jted, 'JTEDTypeKey'] = 1
+        return edorg
+
+    def make_enrollment(self, year=None):
+        if year is None:
+            year = self.fiscal_year
+        if ('enrollment', year) in self.cache:
+            return self.cache[('enrollment', year)].copy()
+        rng = self.rng(4 + year)
+        schools = self.get_schools()
+        students = self.get_students(year).copy()
+        students['SchoolId'] = self.assign_schools(students, schools)
+
+        ##------------------- enrollment dates, most students enroll on day1 and stay
+        n = len(students)
+        first_day = pd.Timestamp(year-1, 8, 1)
+        late_entry = rng.random(n) < 0.12
+        entry_days = np.where(late_entry, rng.integers(15, 200, n), rng.integers(0, 10, n))
+        students['EntryDate'] = first_day + pd.to_timedelta(entry_days, unit='D')
+        exit_days = np.where(rng.random(n) < 0.1, rng.integers(60, 300, n), -1)
+        students['ExitDate'] = pd.NaT
+        exited = exit_days > entry_days
+        students.loc[exited, 'ExitDate'] = first_day + pd.to_timedelta(exit_days[exited], unit='D')
+
+        ##------------------- mobile students get a second record at another school that serves their grade
+        mobile = students[students.Mobile & students.ExitDate.isnull()].copy()
+        mobile['SwitchDraw'] = rng.random(len(mobile))
+        mobile['SchoolId'] = self.assign_schools(mobile, schools, draw_col='SwitchDraw')
+        switch_days = rng.integers(40, 250, len(mobile))
+        mobile['EntryDate'] = first_day + pd.to_timedelta(switch_days, unit='D')
+        students.loc[mobile.index, 'ExitDate'] = mobile.EntryDate - pd.Timedelta(days=1)
+        stlist = pd.concat([students, mobile], axis=0, ignore_index=True)
+
+        ##------------------- FAY, windows and program flags
+        n = len(stlist)
+        oct_1 = pd.Timestamp(year-1, 10, 1)
+        spring = pd.Timestamp(year, 4, 1)
+        fay = (stlist.EntryDate <= oct_1) & ((stlist.ExitDate >= spring) | stlist.ExitDate.isnull())
+        day1 = stlist.SchoolId.map(schools.set_index('SchoolKey').Day1)
+        grade = stlist.Grade.astype(int).astype(str).replace({'-1':'KG'})
+        ell_need = np.where(stlist.EL==1, rng.integers(1, 5, n), np.where(stlist.FEP==1, 5, 0))
+        enrollment = pd.DataFrame({'FiscalYear': year
+                                   ,'SAISID': stlist.SAISID
+                                   ,'FirstName': 'Synthetic'
+                                   ,'MiddleName': None
+                                   ,'LastName': 'Student'
+                                   ,'BirthDate': pd.to_datetime((stlist.CohortYear - 18).astype(str) + '-06-01')
+                                   ,'Gender': stlist.Gender
+                                   ,'SchoolId': stlist.SchoolId
+                                   ,'DistrictId': stlist.SchoolId.map(schools.set_index('SchoolKey').DistrictKey)
+                                   ,'Grade': grade
+                                   ,'EntryDate': stlist.EntryDate
+                                   ,'ExitDate': stlist.ExitDate
+                                   ,'YearEndExitCode': np.where(rng.random(n) < 0.005, 'CC', None)
+                                   ,'EthnicGroupID': stlist.Ethnicity
+                                   ,'CohortYear': stlist.CohortYear
+                                   ,'SPED': stlist.SPED
+                                   ,'EconomicDisadvantage': stlist.EconomicDisadvantage
+                                   ,'Homeless': stlist.Homeless
+                                   ,'FTE': np.where(rng.random(n) < 0.97, 1, 0.5)
+                                   ,'ELLNeed': ell_need
+                                   ,'FEPYears': np.where(ell_need==5, rng.integers(1, 5, n), np.nan)
+                                   ,'FosterCare': stlist.FosterCare
+                                   ,'ScienceFAY': fay.astype(int)
+                                   ,'AZELLAFAY': np.where(stlist.EL==1, fay.astype(int), 0)
+                                   ,'SchoolFAYStability': fay.astype(int)
+                                   ,'DistrictFAYStability': fay.astype(int)
+                                   ,'Military': stlist.Military
+                                   ,'Migrant': stlist.Migrant
+                                   ,'DRP': 0
+                                   ,'RALEP': np.where((stlist.FEP==1) & (rng.random(n) < 0.5), rng.integers(1, 4, n), 0)
+                                   ,'ADMIntegrity': (rng.random(n) < 0.98).astype(int)
+                                   ,'TuitionPayerCode': np.where(rng.random(n) < 0.99, 1, 2)
+                                   ,'SPEDCodeJ': 0
+                                   ,'Day1': day1
+                                   ,'UploadDate': self.snapshot_date})
+        self.cache[('enrollment', year)] = enrollment
+        return enrollment.copy()
+
+    def get_tested_students(self):
+        ## one row per student and the school they test in (their latest enrollment)
+        if 'tested' in self.cache:
+            return self.cache['tested']
+        enrollment = self.make_enrollment()
+        enrollment = enrollment.sort_values(['SAISID', 'EntryDate'], ascending=False)
+        enrollment = enrollment[~enrollment.SAISID.duplicated()]
+        students = self.get_students().set_index('SAISID')
+        students = students[['Ability', 'SPED', 'EL']].rename({'SPED':'SPED_student', 'EL':'EL_student'}, axis=1)
+        enrollment = enrollment.join(students, on='SAISID')
+        enrollment['GradeNum'] = pd.to_numeric(enrollment.Grade.replace({'KG':'-1'}), errors='coerce')
+        self.cache['tested'] = enrollment
+        return enrollment
+
+    def ability_to_performance(self, ability):
+        ## cut the latent score at the statewide performance level shares
+        cuts = np.quantile(np.random.default_rng(0).normal(0, 1, 100000), np.cumsum(self.performance_shares)[:-1])
+        return np.searchsorted(cuts, ability) + 1
+
+    def make_assessments(self):
+        rng = self.rng(20)
+        tested = self.get_tested_students()
+        family_by_grade = {3:'AASA',4:'AASA',5:'AASA',6:'AASA',7:'AASA',8:'AASA',9:'ACTASPIRE',11:'AZACT'}
+        subjects = {'English Language Arts':list(family_by_grade.keys())
+                    ,'Mathematics':list(family_by_grade.keys())
+                    ,'Science':[5,8,11]}
+        frames = []
+        for subject, grades in subjects.items():
+            sub = tested[tested.GradeNum.isin(grades)].copy()
+            n = len(sub)
+            ## 96% participation
+            sub = sub[rng.random(n) < 0.96].copy()
+            n = len(sub)
+            score = sub.Ability.to_numpy() + rng.normal(0, 0.45, n)
+            sub['Performance'] = self.ability_to_performance(score)
+            if subject == 'Science':
+                sub['AssessmentFamily'] = 'AZSCI'
+            else:
+                sub['AssessmentFamily'] = sub.GradeNum.map(family_by_grade)
+            ## the most significant cognitive disabilities take MSAA
+            msaa = (sub.SPED_student==1).to_numpy() & (rng.random(n) < 0.08)
+            sub.loc[msaa, 'AssessmentFamily'] = 'MSAA'
+            sub['ScaleScore'] = (3500 + sub.GradeNum*25 + score*30).round(0)
+            sub['AcademicSubject'] = subject
+            frames.append(sub)
+        assess = pd.concat(frames, axis=0, ignore_index=True)
+        ## 2% of tests have a retake with a different score
+        retakes = assess[rng.random(len(assess)) < 0.02].copy()
+        retakes['ScaleScore'] = retakes.ScaleScore - rng.integers(1, 20, len(retakes))
+        assess = pd.concat([assess, retakes], axis=0, ignore_index=True)
+        n = len(assess)
+        assessments = pd.DataFrame({'StateStudentID': assess.SAISID
+                                    ,'FiscalYear': self.fiscal_year
+                                    ,'AssessmentPeriodDescription': 'Spring'
+                                    ,'SchoolId': assess.SchoolId
+                                    ,'DistrictId': assess.DistrictId
+                                    ,'AssessmentFamily': assess.AssessmentFamily
+                                    ,'WhenAssessedGrade': assess.GradeNum.astype(int).astype(str)
+                                    ,'EnrolledGrade': assess.Grade
+                                    ,'AssessmentTitle': assess.AssessmentFamily + ' ' + assess.AcademicSubject
+                                    ,'AcademicSubject': assess.AcademicSubject
+                                    ,'AssessmentTestStatus': 'Attempted'
+                                    ,'AssessmentTestMode': 'Online'
+                                    ,'ScaleScoreResult': assess.ScaleScore.astype(int).astype(str)
+                                    ,'RawScoreResult': None
+                                    ,'PerformanceLevelDescription': assess.Performance.map(self.performance_names)
+                                    ,'MoveOnWhenReadingIndicator': None
+                                    ,'MoveOnWhenReadingScore': None
+                                    ,'Accommodation': rng.random(n) < 0.05
+                                    ,'UploadDate': self.snapshot_date})
+        return assessments
+
+    def make_aspire_participation(self):
+        ## already aggregated aspire english/reading/writing records (output of fix_aspire_participation)
+        rng = self.rng(21)
+        tested = self.get_tested_students()
+        aspire = tested[(tested.GradeNum==9) & (rng.random(len(tested)) < 0.01)]
+        return pd.DataFrame({'FiscalYear': self.fiscal_year
+                             ,'SAISID': aspire.SAISID
+                             ,'SchoolCode': aspire.SchoolId
+                             ,'AssessmentGrade': '9'
+                             ,'StudentGrade': aspire.Grade
+                             ,'NumberOfTests': 3
+                             ,'ScaleScore': 400.0
+                             ,'AssessmentFamily': 'ACTASPIRE'
+                             ,'AcademicSubject': 'English Language Arts'})
+
+    def make_azella(self):
+        rng = self.rng(30)
+        tested = self.get_tested_students()
+        el = tested[tested.EL_student==1].copy()
+        n = len(el)
+        ## azella level follows the latent score, last year one level lower on average
+        level_codes = np.array([3711, 3712, 3380, 3381])
+        cy_level = np.clip(np.round(1.6 + el.Ability.to_numpy()*0.9 + rng.normal(0.9, 0.6, n)), 1, 4).astype(int)
+        py_level = np.clip(cy_level - rng.integers(0, 2, n), 1, 4)
+        new_el = rng.random(n) < 0.15
+        frames = []
+        ## prior year annual test (not for new EL students)
+        py = el[~new_el]
+        frames.append(pd.DataFrame({'PublicSAISID': py.SAISID
+                                    ,'RefProficiencyLevelID': level_codes[py_level[~new_el]-1]
+                                    ,'AssessmentDate': pd.Timestamp(self.previous_fiscal_year, 2, 1) + pd.to_timedelta(rng.integers(0, 40, len(py)), unit='D')
+                                    ,'Grade': (py.GradeNum-1).clip(-1).astype(int).astype(str).replace({'-1':'KG'})
+                                    ,'Isplacement': 0
+                                    ,'EntityID': py.SchoolId
+                                    ,'FiscalYear': self.previous_fiscal_year}))
+        ## placement test for new EL students at the start of the year
+        new = el[new_el]
+        frames.append(pd.DataFrame({'PublicSAISID': new.SAISID
+                                    ,'RefProficiencyLevelID': level_codes[np.clip(py_level[new_el]-1, 1, 4)-1]
+                                    ,'AssessmentDate': pd.Timestamp(self.previous_fiscal_year, 8, 10) + pd.to_timedelta(rng.integers(0, 50, len(new)), unit='D')
+                                    ,'Grade': new.Grade
+                                    ,'Isplacement': 1
+                                    ,'EntityID': new.SchoolId
+                                    ,'FiscalYear': self.fiscal_year}))
+        ## current year annual test
+        frames.append(pd.DataFrame({'PublicSAISID': el.SAISID
+                                    ,'RefProficiencyLevelID': level_codes[cy_level-1]
+                                    ,'AssessmentDate': pd.Timestamp(self.fiscal_year, 2, 1) + pd.to_timedelta(rng.integers(0, 40, n), unit='D')
+                                    ,'Grade': el.Grade
+                                    ,'Isplacement': 0
+                                    ,'EntityID': el.SchoolId
+                                    ,'FiscalYear': self.fiscal_year}))
+        azella = pd.concat(frames, axis=0, ignore_index=True)
+        azella['Proficiency'] = azella.RefProficiencyLevelID.map({3711:'Pre-Emergent', 3712:'Emergent', 3380:'Basic', 3381:'Proficient'})
+        azella['IsReAssessment'] = 0
+        azella['UploadDate'] = self.snapshot_date
+        return azella
+
+    def make_census(self):
+        rng = self.rng(40)
+        tested = self.get_tested_students()
+        sped = tested[tested.SPED_student==1]
+        return pd.DataFrame({'FiscalYear': self.fiscal_year
+                             ,'ServiceType': rng.choice(['A', 'B', 'C'], size=len(sped), p=[0.65, 0.25, 0.1])
+                             ,'SAISID': sped.SAISID
+                             ,'DependentID': sped.SchoolId})
+
+    def make_sgp(self):
+        ## long R SGP file for math and ELA grades 4-8 and the ACT grade
+        rng = self.rng(50)
+        tested = self.get_tested_students()
+        grades = [4, 5, 6, 7, 8, self.act_grade]
+        frames = []
+        for content_area in ['MATHEMATICS', 'ELA']:
+            sub = tested[tested.GradeNum.isin(grades)]
+            n = len(sub)
+            cy_score = sub.Ability.to_numpy() + rng.normal(0, 0.45, n)
+            py_score = sub.Ability.to_numpy() + rng.normal(0, 0.45, n)
+            ## sgp is the percentile of this year's change
+            change = cy_score - py_score
+            sgp = np.clip(np.round(pd.Series(change).rank(pct=True).to_numpy()*99), 1, 99)
+            frames.append(pd.DataFrame({'ID': sub.SAISID.astype(str)
+                                        ,'GRADE_ENROLLED': sub.GradeNum.astype(int).astype(str)
+                                        ,'YEAR': str(self.fiscal_year)
+                                        ,'VALID_CASE': np.where(rng.random(n) < 0.99, 'VALID_CASE', 'INVALID_CASE')
+                                        ,'SGP': sgp
+                                        ,'SGP_BASELINE': sgp
+                                        ,'SCALE_SCORE_PRIOR': (3500 + (sub.GradeNum-1)*25 + py_score*30).round(0)
+                                        ,'SCALE_SCORE': (3500 + sub.GradeNum*25 + cy_score*30).round(0)
+                                        ,'CONTENT_AREA': content_area
+                                        ,'ACHIEVEMENT_LEVEL': pd.Series(self.ability_to_performance(cy_score)).map(self.performance_names).to_numpy()
+                                        ,'ACHIEVEMENT_LEVEL_PRIOR': pd.Series(self.ability_to_performance(py_score)).map(self.performance_names).to_numpy()}))
+        return pd.concat(frames, axis=0, ignore_index=True)
+
+    def make_chronic_absenteeisim(self):
+        rng = self.rng(60)
+        enrollment = self.make_enrollment()
+        ca = enrollment[rng.random(len(enrollment)) < 0.15]
+        return pd.DataFrame({'FiscalYear': self.fiscal_year
+                             ,'SchoolCode': ca.SchoolId
+                             ,'SAISID': ca.SAISID
+                             ,'ChronicAbsent': 1})
+
+    def make_fep_list(self, year=None):
+        ## students reclassified in the last 5 years (output of el_fep_fix)
+        if year is None:
+            year = self.fiscal_year
+        enrollment = self.make_enrollment(year)
+        fep = enrollment[enrollment.ELLNeed==5]
+        fep = fep[~fep[['SAISID', 'SchoolId']].duplicated()]
+        return pd.DataFrame({'SAISID': fep.SAISID, 'SchoolCode': fep.SchoolId, 'ELFEP': 1})
+
+    def make_first_year_schools(self):
+        schools = self.get_schools()
+        year1 = schools[self.rng(70).random(len(schools)) < 0.02]
+        return pd.DataFrame({'SchoolCode': year1.SchoolKey, 'Year1School': 1})
+
+    def make_model_corrections(self):
+        return pd.DataFrame(columns=['FiscalYear', 'SchoolCode', 'CorrectedModelType', 'AccountabilityModel'])
+
+    def get_high_schools(self):
+        schools = self.get_schools()
+        return schools[schools.SchoolModel.isin(['9-12', 'k-12', 'Alt 9-12'])].copy()
+
+    def make_gradrate(self):
+        ## 4 to 7 year grad rates by subgroup for the cohorts in the snapshot
+        rng = self.rng(80)
+        high_schools = self.get_high_schools()
+        latest_cohort = self.previous_fiscal_year
+        rows = pd.MultiIndex.from_product([high_schools.SchoolKey, range(latest_cohort-5, latest_cohort+1), [4,5,6,7], self.rate_subgroups]
+                                          ,names=['EntityId', 'CohortYear', 'GradRateType', 'Type']).to_frame(index=False)
+        school_size = rows.EntityId.map(high_schools.set_index('SchoolKey').Size).to_numpy()
+        alternative = rows.EntityId.isin(high_schools.loc[high_schools.SchoolModel=='Alt 9-12', 'SchoolKey']).to_numpy()
+        subgroup_share = np.where(rows.Type=='All', 1, rng.uniform(0.02, 0.5, len(rows)))
+        rows['NumCohort'] = np.maximum(1, np.round(110*school_size*subgroup_share)).astype(int)
+        rate = np.clip(rng.normal(np.where(alternative, 0.45, 0.8) + (rows.GradRateType-4)*0.02, 0.08), 0, 1)
+        rows['NumGraduates'] = np.round(rows.NumCohort*rate).astype(int)
+        rows['GradRate'] = (rows.NumGraduates*100 / rows.NumCohort).round(2)
+        rows['UploadDate'] = self.snapshot_date
+        return rows
+
+    def make_dropout(self):
+        rng = self.rng(90)
+        high_schools = self.get_high_schools()
+        rows = pd.MultiIndex.from_product([high_schools.SchoolKey, [self.previous_fiscal_year, self.fiscal_year], self.rate_subgroups]
+                                          ,names=['EntityId', 'FiscalYear', 'Type']).to_frame(index=False)
+        school_size = rows.EntityId.map(high_schools.set_index('SchoolKey').Size).to_numpy()
+        alternative = rows.EntityId.isin(high_schools.loc[high_schools.SchoolModel=='Alt 9-12', 'SchoolKey']).to_numpy()
+        subgroup_share = np.where(rows.Type=='All', 1, rng.uniform(0.02, 0.5, len(rows)))
+        rows['NumEnrolled'] = np.maximum(1, np.round(450*school_size*subgroup_share)).astype(int)
+        rate = np.clip(rng.normal(np.where(alternative, 0.12, 0.03), 0.015), 0, 1)
+        rows['NumDropouts'] = np.round(rows.NumEnrolled*rate).astype(int)
+        rows['DropoutRate'] = (rows.NumDropouts*100 / rows.NumEnrolled).round(2)
+        rows['UploadDate'] = self.snapshot_date
+        return rows
+
+
+# #%% generate a synthetic state of 1M students and save it for the benchmarks
+# syn = SYNTHETIC(fiscal_year=2023, n_students=1000000, seed=0)
+# data = syn.generate()
+# syn.save(data, folder=r'H:\ACCT\ACCOUNTABILITY\2023\Yassin\synthetic')
@@ -8,6 +8,7 @@ Created on Thu Jan 12 14:40:15 2023
 from STATIC import STATIC
 import pandas as pd
 from DATABASE import DB
+from TIMING import set_run_log, run_summary
 
 fiscal_year=2023
 previous_fiscal_year = fiscal_year-1
@@ -51,6 +52,10 @@ not_eligible_testing_grades = [66,77,-1,1,2,10,12]
 #define raw and staticfolders to save a copy of tables
 raw_folder = r'H:\ACCT\ACCOUNTABILITY\2023\Yassin\snapshot backup'
 
+#stage timings, rows, memory and db round-trips are logged here (one json line per stage)
+run_log = r'H:\ACCT\ACCOUNTABILITY\2023\Yassin\run logs\staticfile_run_log.jsonl'
+set_run_log(run_log)
+
 #%%
 stat = STATIC(fiscal_year= fiscal_year
               ,run= run
@@ -89,10 +94,22 @@ stat.format_upload_sgp(file_path=file_path)
 ##data is available as attributes of the STATIC object instance (stat in this case)
 stat.format_basefiles()
 stat.format_staticfile(keep_all_schools=False)
+## or build the student records in SAISID shards on several threads
+# stat.format_staticfile(keep_all_schools=False, n_shards=8, n_workers=4)
+## on several processes the script must be run as a whole (not cell by cell) with the run under a main guard, since windows
+## starts every worker by importing this script again:
+# if __name__ == '__main__':
+#     stat.format_staticfile(keep_all_schools=False, n_shards=8, n_workers=4, use_processes=True)
 
 #%%
 stat.upload_school_type()
 stat.upload_staticfile()
+#%% or run the snapshot, base files, staticfile and uploads as checkpointed stages
+## rerunning this cell after a failure resumes from the last completed stage, pass rerun=['enrollment'] etc. to force a stage
+checkpoint_folder = rf'H:\ACCT\ACCOUNTABILITY\2023\Yassin\checkpoints\{run}'
+# stat.format_with_checkpoints(checkpoint_folder, keep_all_schools=False, snapshot=True, sgp_file=file_path, upload=True)
+#%% stage timings summary for this run
+timings = run_summary()
 #%% Upload  growth based staticfile if made
 fy= 2023
 table_name='StaticFileData'